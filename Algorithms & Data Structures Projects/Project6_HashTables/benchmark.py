@@ -0,0 +1,500 @@
+"""
+Project 6
+Benchmarks for solution.py
+benchmark.py
+
+Run with `python benchmark.py [name ...]`; with no names every benchmark runs.
+"""
+
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import solution
+from solution import HashTable, ColumnarHashTable, RobinHoodHashTable, ConcurrentHashTable, DoubleHashing, LinearProbing, QuadraticProbing, \
+    PolynomialHash, BuiltinHash, FNV1aHash, XXHash, SeededHash
+
+
+def post_id_keys(n: int) -> List[str]:
+    """
+    Builds n keys shaped like DiscordDestroyer post ids, i.e. "user,hash".
+
+    :param n: [int] Number of keys.
+    :return: [List[str]] The keys.
+    """
+    return [f"user{i % 997},{hash(('post', i))}" for i in range(n)]
+
+
+def measure(build: Callable[[], object]) -> Tuple[float, int]:
+    """
+    Runs build twice, once timed and once while tracing the memory it leaves allocated
+    (tracing slows allocation down too much to time the same run).
+
+    :param build: [Callable] Builds and returns the structure to measure.
+    :return: [Tuple[float, int]] Seconds taken and bytes still allocated.
+    """
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, allocated
+
+
+def bench_layout(n: int = 200000) -> None:
+    """
+    Compares insert throughput and resident memory of the HashNode layout (HashTable)
+    against the columnar layout (ColumnarHashTable).
+
+    :param n: [int] Number of keys inserted.
+    """
+    keys = post_id_keys(n)
+
+    def fill(table_type):
+        def build():
+            table = table_type()
+            for i, key in enumerate(keys):
+                table[key] = i
+            return table
+        return build
+
+    print(f"layout: {n} inserts")
+    for name, table_type in (("HashNode", HashTable), ("columnar", ColumnarHashTable)):
+        elapsed, allocated = measure(fill(table_type))
+        print(f"  {name:>10}: {n / elapsed:12,.0f} inserts/s  {allocated / n:8.1f} bytes/key")
+
+
+def bench_bulk(n: int = 200000) -> None:
+    """
+    Compares loading n pairs one __setitem__ at a time against one bulk update().
+
+    :param n: [int] Number of pairs loaded.
+    """
+    pairs = [(key, i) for i, key in enumerate(post_id_keys(n))]
+
+    def one_by_one():
+        table = HashTable()
+        for key, value in pairs:
+            table[key] = value
+        return table
+
+    def bulk():
+        table = HashTable()
+        table.update(pairs)
+        return table
+
+    print(f"bulk: {n} pairs")
+    for name, build in (("setitem", one_by_one), ("update", bulk)):
+        elapsed, _ = measure(build)
+        print(f"  {name:>10}: {n / elapsed:12,.0f} inserts/s  {elapsed:8.3f} s")
+
+
+def bench_probing(n: int = 50000) -> None:
+    """
+    Reports insert throughput and probe length statistics of each probing strategy
+    and of Robin Hood hashing, on short keys and on long post-id keys.
+
+    :param n: [int] Number of keys inserted.
+    """
+    key_sets = (("short", [str(i) for i in range(n)]), ("post-id", post_id_keys(n)))
+    for key_name, keys in key_sets:
+        print(f"probing: {n} {key_name} keys")
+        tables = [(type(probing).__name__, HashTable(probing=probing))
+                  for probing in (DoubleHashing(), LinearProbing(), QuadraticProbing())]
+        tables.append(("RobinHood", RobinHoodHashTable()))
+        for name, table in tables:
+            start = time.perf_counter()
+            for i, key in enumerate(keys):
+                table[key] = i
+            elapsed = time.perf_counter() - start
+            stats = table.probe_stats()
+            print(f"  {name:>16}: {n / elapsed:12,.0f} inserts/s  "
+                  f"mean {stats.mean:6.3f}  max {stats.max:4}  histogram {stats.histogram[:8]}")
+
+
+def bench_batch(n: int = 100000, batch: int = 500) -> None:
+    """
+    Compares looking keys up one __getitem__ at a time against get_many() batches.
+
+    :param n: [int] Number of keys in the table, all of which are looked up.
+    :param batch: [int] Keys per get_many() call.
+    """
+    keys = post_id_keys(n)
+    table = HashTable()
+    table.update([(key, i) for i, key in enumerate(keys)])
+    batches = [keys[i:i + batch] for i in range(0, n, batch)]
+
+    print(f"batch: {n} lookups in batches of {batch}")
+    start = time.perf_counter()
+    for chunk in batches:
+        [table[key] for key in chunk]
+    elapsed = time.perf_counter() - start
+    print(f"  {'getitem':>10}: {n / elapsed:12,.0f} lookups/s")
+    start = time.perf_counter()
+    for chunk in batches:
+        table.get_many(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"  {'get_many':>10}: {n / elapsed:12,.0f} lookups/s")
+
+
+def bench_snapshot(n: int = 200000) -> None:
+    """
+    Compares restarting a table by replaying every insert against reopening a snapshot.
+
+    :param n: [int] Number of keys in the table.
+    """
+    pairs = [(key, i) for i, key in enumerate(post_id_keys(n))]
+    table = HashTable()
+    table.update(pairs)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "table.bin")
+        table.save(path)
+        print(f"snapshot: {n} keys, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        builds = (("replay", lambda: HashTable().update(pairs)),
+                  ("load", lambda: HashTable.load(path, mmap=False)),
+                  ("load mmap", lambda: HashTable.load(path)))
+        for name, build in builds:
+            start = time.perf_counter()
+            build()
+            print(f"  {name:>10}: {time.perf_counter() - start:8.3f} s")
+
+
+class LockedHashTable:
+    """
+    Single-lock baseline: one HashTable behind one global lock.
+    """
+
+    def __init__(self) -> None:
+        self.table = HashTable()
+        self.lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.table[key] = value
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.table[key]
+
+
+def bench_concurrent(n: int = 40000, threads: int = 8) -> None:
+    """
+    Compares multi-threaded throughput of ConcurrentHashTable against a single-lock HashTable.
+    Each thread writes then reads its own share of the keys.
+    Under the GIL, only one thread runs Python code at a time, so striping mostly
+    removes lock contention rather than adding parallelism.
+
+    :param n: [int] Total number of keys written and read.
+    :param threads: [int] Number of worker threads.
+    """
+    keys = post_id_keys(n)
+    shares = [keys[i::threads] for i in range(threads)]
+
+    def work(table, share):
+        for i, key in enumerate(share):
+            table[key] = i
+        for key in share:
+            table[key]
+
+    print(f"concurrent: {2 * n} operations on {threads} threads")
+    for name, table in (("one lock", LockedHashTable()), ("striped", ConcurrentHashTable(segments=32))):
+        workers = [threading.Thread(target=work, args=(table, share)) for share in shares]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        print(f"  {name:>10}: {2 * n / elapsed:12,.0f} ops/s")
+
+
+def bench_incremental(n: int = 500000) -> None:
+    """
+    Compares per-insert latency of stop-the-world grows against incremental grows.
+    The cyclic garbage collector is paused, its own pauses would hide the grows.
+
+    :param n: [int] Number of keys inserted.
+    """
+    keys = post_id_keys(n)
+    print(f"incremental: {n} inserts")
+    gc.disable()
+    for name, table in (("rehash", HashTable()), ("incremental", HashTable(incremental=True))):
+        latencies = []
+        clock = time.perf_counter
+        for i, key in enumerate(keys):
+            start = clock()
+            table[key] = i
+            latencies.append(clock() - start)
+        latencies.sort()
+        print(f"  {name:>11}: total {sum(latencies):.3f}s  p99 {latencies[int(n * 0.99)] * 1e6:7.2f}us"
+              f"  max {latencies[-1] * 1e3:8.2f}ms")
+    gc.enable()
+
+
+def bench_purge(n: int = 200000, kept: int = 1000) -> None:
+    """
+    Measures the memory left allocated after deleting all but kept of n keys,
+    with and without automatic shrinking.
+
+    :param n: [int] Number of keys inserted.
+    :param kept: [int] Number of keys left after the purge.
+    """
+    keys = post_id_keys(n)
+
+    def purge(shrink_ratio):
+        def build():
+            table = HashTable(shrink_ratio=shrink_ratio)
+            for i, key in enumerate(keys):
+                table[key] = i
+            for key in keys[kept:]:
+                del table[key]
+            return table
+        return build
+
+    print(f"purge: {n} keys inserted, {n - kept} deleted")
+    for name, shrink_ratio in (("no shrink", 0), ("shrink", 0.0625)):
+        elapsed, allocated = measure(purge(shrink_ratio))
+        print(f"  {name:>9}: {elapsed:.3f}s  {allocated / 2 ** 20:8.2f} MiB left allocated")
+
+
+def bench_window(n: int = 200000, page: int = 50, pages: int = 200) -> None:
+    """
+    Compares reading pages of items by materializing every item against
+    windowed items(start, stop), on a table with deleted entries.
+
+    :param n: [int] Number of keys inserted, every tenth of which is deleted.
+    :param page: [int] Items per page.
+    :param pages: [int] Number of pages read, spread across the table.
+    """
+    keys = post_id_keys(n)
+    table = HashTable()
+    for i, key in enumerate(keys):
+        table[key] = i
+    for key in keys[::10]:
+        del table[key]
+    starts = range(0, len(table) - page, (len(table) - page) // pages)
+
+    print(f"window: {len(starts)} pages of {page} items out of {len(table)}")
+    start = time.perf_counter()
+    for first in starts:
+        list(table.items())[first:first + page]
+    print(f"  {'list':>6}: {time.perf_counter() - start:.3f}s")
+    start = time.perf_counter()
+    for first in starts:
+        list(table.items(start=first, stop=first + page))
+    print(f"  {'window':>6}: {time.perf_counter() - start:.3f}s")
+
+
+def bench_hashing(n: int = 200000) -> None:
+    """
+    Compares hash functions on post id keys: raw hashing throughput, insert throughput,
+    full 64-bit collisions, and the share of keys that miss their home slot at the
+    table's final capacity (a perfectly uniform hash misses about 1 - (1 - e^-a) / a
+    at load a, ~21% at a = 0.5).
+
+    :param n: [int] Number of keys.
+    """
+    keys = post_id_keys(n)
+    functions = [PolynomialHash(), BuiltinHash(), FNV1aHash(), SeededHash()]
+    if solution.xxhash is not None:
+        functions.append(XXHash())
+
+    print(f"hashing: {n} post id keys")
+    for function in functions:
+        start = time.perf_counter()
+        hashes = [function(key) for key in keys]
+        hashing = time.perf_counter() - start
+        table = HashTable(hash_function=function)
+        start = time.perf_counter()
+        for i, key in enumerate(keys):
+            table[key] = i
+        inserting = time.perf_counter() - start
+        collisions = n - len({h & (1 << 64) - 1 for h in hashes})
+        homes = len({h % table.capacity for h in hashes})
+        print(f"  {type(function).__name__:>14}: hash {n / hashing:12,.0f} keys/s  "
+              f"insert {n / inserting:10,.0f} keys/s  64-bit collisions {collisions}  "
+              f"off home slot {1 - homes / n:6.2%}")
+
+
+def bench_ingest(n: int = 200000, batch: int = 5000) -> None:
+    """
+    Compares ingesting posts one post() call at a time against post_many batches,
+    with many users (few posts per user in a batch) and with few users.
+
+    :param n: [int] Number of posts.
+    :param batch: [int] Posts per post_many call.
+    """
+    print(f"ingest: {n} posts, batches of {batch}")
+    for users in (997, 31):
+        posts = [(f"user{i % users}", f"message {i}") for i in range(n)]
+        gc.collect()
+        app = solution.DiscordDestroyer()
+        start = time.perf_counter()
+        for user, message in posts:
+            app.post(user, message)
+        single = time.perf_counter() - start
+        del app
+        gc.collect()
+        app = solution.DiscordDestroyer()
+        start = time.perf_counter()
+        for first in range(0, n, batch):
+            app.post_many(posts[first:first + batch])
+        batched = time.perf_counter() - start
+        print(f"  {users:>4} users: post {n / single:10,.0f} posts/s  post_many {n / batched:10,.0f} posts/s")
+
+
+def bench_search(n: int = 100000, queries: int = 20) -> None:
+    """
+    Compares finding the 10 newest posts containing two words by scanning every post
+    against the full-text index, and reports the size of the posting lists.
+
+    :param n: [int] Number of posts, of 8 words each out of a vocabulary of 5000.
+    :param queries: [int] Number of queries.
+    """
+    words = [f"w{i}" for i in range(5000)]
+    state = 331
+
+    def word() -> str:
+        nonlocal state
+        state = state * 1103515245 + 12345 & 0x7FFFFFFF
+        return words[int((state / 0x80000000) ** 3 * len(words))]  # skewed towards the first words
+
+    app = solution.DiscordDestroyer(index=True)
+    app.post_many([(f"user{i % 997}", " ".join(word() for _ in range(8))) for i in range(n)])
+    pairs = [(word(), word()) for _ in range(queries)]
+
+    print(f"search: {queries} two-word queries over {n} posts")
+    start = time.perf_counter()
+    for first, second in pairs:
+        found = []
+        for node in reversed(app.posts_by_id.entries):
+            if len(found) == 10:
+                break
+            if node is not None:
+                tokens = solution.PostIndex.tokenize(node.value)
+                if first in tokens and second in tokens:
+                    found.append(node.value)
+    print(f"  {'scan':>5}: {(time.perf_counter() - start) / queries * 1e3:8.2f}ms/query")
+    start = time.perf_counter()
+    for first, second in pairs:
+        list(app.search(f"{first} {second}", limit=10))
+    print(f"  {'index':>5}: {(time.perf_counter() - start) / queries * 1e3:8.2f}ms/query")
+    postings = [node.value for node in app.index.tokens.entries if node is not None]
+    stored = sum(len(block) + 8 for postings in postings for block in postings.blocks)
+    print(f"  {sum(map(len, postings))} postings in {stored} bytes, "
+          f"{stored / sum(map(len, postings)):.2f} bytes/posting")
+
+
+def bench_sharded(n: int = 20000, shards: int = 4) -> None:
+    """
+    Compares a single DiscordDestroyer against a ShardedDiscordDestroyer: the cost of a
+    post, which adds a pipe round trip, and of merging the recent posts of every shard.
+
+    :param n: [int] Number of posts.
+    :param shards: [int] Number of shard processes.
+    """
+    posts = [(f"user{i % 997}", f"message {i}") for i in range(n)]
+    print(f"sharded: {n} posts, {shards} shards")
+    for name, app in (("single", solution.DiscordDestroyer()), ("sharded", solution.ShardedDiscordDestroyer(shards))):
+        start = time.perf_counter()
+        for user, message in posts:
+            app.post(user, message)
+        posting = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(100):
+            list(app.get_most_recent_posts(100))
+        recent = (time.perf_counter() - start) / 100
+        print(f"  {name:>7}: post {posting / n * 1e6:7.1f}us  recent(100) {recent * 1e3:6.2f}ms")
+        if name == "sharded":
+            app.close()
+
+
+def serve(ready, max_batch: int) -> None:
+    """
+    Runs a DiscordDestroyerServer until its process is terminated, for bench_server.
+
+    :param ready: [multiprocessing.Queue] Receives the address once the server listens.
+    :param max_batch: [int] max_batch of the server.
+    """
+    async def main():
+        server = solution.DiscordDestroyerServer(max_batch=max_batch)
+        ready.put(await server.start())
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+
+def bench_server(clients: int = 50, requests: int = 400, window: int = 8) -> None:
+    """
+    Load generator for DiscordDestroyerServer: many clients each keep up to window
+    requests in flight, 90% posts and 10% get_most_recent_posts(10), and report the
+    throughput and the p50 and p99 latency of a request, with and without micro-batching.
+    The server runs in its own process.
+
+    :param clients: [int] Number of concurrent connections.
+    :param requests: [int] Requests sent by each client.
+    :param window: [int] Largest number of requests a client has in flight.
+    """
+    async def client(address, latencies: List[float]) -> None:
+        reader, writer = await asyncio.open_connection(*address)
+        sent = {}
+        for i in range(requests):
+            if len(sent) == window:
+                answer = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - sent.pop(answer["id"]))
+            op, args = ("post", [f"user{i % 97}", f"message {i}"]) if i % 10 else ("get_most_recent_posts", [10])
+            sent[i] = time.perf_counter()
+            writer.write(json.dumps({"id": i, "op": op, "args": args}).encode() + b"\n")
+        while sent:
+            answer = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(answer["id"]))
+        writer.close()
+
+    async def load(address) -> Tuple[float, List[float]]:
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*[client(address, latencies) for _ in range(clients)])
+        return time.perf_counter() - start, sorted(latencies)
+
+    print(f"server: {clients} clients x {requests} requests, {window} in flight each")
+    for name, max_batch in (("unbatched", 1), ("batched", 1024)):
+        ready = multiprocessing.Queue()
+        process = multiprocessing.Process(target=serve, args=(ready, max_batch), daemon=True)
+        process.start()
+        elapsed, latencies = asyncio.run(load(ready.get()))
+        process.terminate()
+        process.join()
+        print(f"  {name:>9}: {len(latencies) / elapsed:10,.0f} requests/s  "
+              f"p50 {latencies[len(latencies) // 2] * 1e3:6.2f}ms  p99 {latencies[int(len(latencies) * 0.99)] * 1e3:6.2f}ms")
+
+
+BENCHMARKS = {
+    "layout": bench_layout,
+    "bulk": bench_bulk,
+    "probing": bench_probing,
+    "batch": bench_batch,
+    "snapshot": bench_snapshot,
+    "concurrent": bench_concurrent,
+    "incremental": bench_incremental,
+    "purge": bench_purge,
+    "window": bench_window,
+    "hashing": bench_hashing,
+    "ingest": bench_ingest,
+    "search": bench_search,
+    "sharded": bench_sharded,
+    "server": bench_server,
+}
+
+if __name__ == '__main__':
+    for bench in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[bench]()
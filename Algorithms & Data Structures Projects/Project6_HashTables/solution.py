@@ -5,7 +5,34 @@ Andrew McDonald and Aaron Jonckheere
 solution.py
 """
 
-from typing import TypeVar, List, Tuple, Generator
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import types
+from array import array
+from bisect import bisect_right
+from hashlib import blake2b
+from heapq import heapify, heappop, heappush, merge
+from itertools import accumulate, islice, repeat
+from mmap import mmap as memory_map, ACCESS_COPY
+from operator import is_not
+from typing import TypeVar, List, Tuple, Generator, Iterable, Union, Callable
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, batch lookups fall back to pure Python
+    np = None
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, only XXHash needs it
+    xxhash = None
 
 T = TypeVar("T")
 HashNode = TypeVar("HashNode")
@@ -19,22 +46,24 @@ class HashNode:
     Properties
     - key: [str] lookup key of hashnode
     - value: [T] lookup value associated to key
+    - hash: [int] base hash of key, computed once and reused by every probe and rehash
     """
-    __slots__ = ["key", "value"]
+    __slots__ = ["key", "value", "hash"]
 
-    def __init__(self, key: str, value: T) -> None:
+    def __init__(self, key: str, value: T, hashed_value: int = None) -> None:
         """
         Constructs a hashnode object.
-        DO NOT EDIT.
 
         Time: O(1)
         Space: O(1)
 
         :param key: [str] lookup key of hashnode.
         :param value: [T] lookup value associated to key.
+        :param hashed_value: [int] base hash of key, computed from key if not given.
         """
         self.key: str = key
         self.value: T = value
+        self.hash: int = HashTable._base_hash(key) if hashed_value is None else hashed_value
 
     def __str__(self) -> str:
         """
@@ -64,6 +93,498 @@ class HashNode:
         return self.key == other.key and self.value == other.value
 
 
+class CacheNode(HashNode):
+    """
+    Implements a hashnode carrying the bookkeeping of a BoundedHashTable entry.
+
+    Properties (in addition to those of HashNode)
+    - count: [int] number of times the entry was written or read
+    - tick: [int] when the entry was last used, in BoundedHashTable.ticks
+    - expires: [float] clock time at which the entry expires, None without a ttl
+    """
+    __slots__ = ["count", "tick", "expires"]
+
+    def __init__(self, key: str, value: T, hashed_value: int, tick: int, expires: float) -> None:
+        """
+        Constructs a cachenode object, used once.
+
+        :param key: [str] lookup key of cachenode.
+        :param value: [T] lookup value associated to key.
+        :param hashed_value: [int] base hash of key.
+        :param tick: [int] current tick of the table.
+        :param expires: [float] expiry time, None without a ttl.
+        """
+        super().__init__(key, value, hashed_value)
+        self.count: int = 1
+        self.tick: int = tick
+        self.expires: float = expires
+
+
+class ProbingStrategy:
+    """
+    Describes the probe sequence a HashTable walks for a key.
+    Starting from (slot, step) = start(...), each later probe moves to
+    slot = (slot + step) % capacity and then bumps step by increment.
+
+    Properties
+    - increment: [int] amount added to the step after every probe
+    """
+    __slots__ = []
+    increment = 0
+
+    def start(self, table: HashTable, key: str, hashed_value: int) -> Tuple[int, int]:
+        """
+        Returns the first slot and the first step of the probe sequence for a key.
+
+        :param table: [HashTable] Table being probed.
+        :param key: [str] Key being probed for.
+        :param hashed_value: [int] Cached base hash of key.
+        :return: [Tuple[int, int]] First slot and first step.
+        """
+        raise NotImplementedError
+
+
+class DoubleHashing(ProbingStrategy):
+    """
+    Double hashing with _hash_1 as the first slot and _hash_2 as the step size.
+    This is the default probing strategy of HashTable.
+    """
+    __slots__ = []
+
+    def start(self, table: HashTable, key: str, hashed_value: int) -> Tuple[int, int]:
+        """
+        Returns (_hash_1, _hash_2) of the key.
+        """
+        return table._hash_1(key, hashed_value), table._hash_2(key, hashed_value)
+
+
+class LinearProbing(ProbingStrategy):
+    """
+    Linear probing, stepping one slot at a time from the home slot.
+    """
+    __slots__ = []
+
+    def start(self, table: HashTable, key: str, hashed_value: int) -> Tuple[int, int]:
+        """
+        Returns (home slot, 1).
+        """
+        return hashed_value % table.capacity, 1
+
+
+class QuadraticProbing(ProbingStrategy):
+    """
+    Quadratic probing over triangular numbers, i.e. home + i * (i + 1) / 2.
+    This visits every slot only when capacity is a power of two, so HashTable
+    only takes it with a power of two capacity, which resizes keep by doubling or halving it.
+    """
+    __slots__ = []
+    increment = 1
+
+    def start(self, table: HashTable, key: str, hashed_value: int) -> Tuple[int, int]:
+        """
+        Returns (home slot, 1).
+        """
+        return hashed_value % table.capacity, 1
+
+
+class HashFunction:
+    """
+    Computes the base hash of a key, which a HashTable caches in HashNode.hash and
+    derives every probe from. Keys may be str, or bytes hashed as they are;
+    str keys are hashed through their UTF-8 encoding unless noted otherwise.
+
+    Properties
+    - seed: [bytes] secret mixed into every hash, empty for unseeded functions
+    """
+    __slots__ = []
+    seed = b""
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Hashes a key.
+
+        :param key: [Union[str, bytes]] Key to be hashed.
+        :return: [int] Base hash of the key.
+        """
+        raise NotImplementedError
+
+
+class PolynomialHash(HashFunction):
+    """
+    The polynomial hash 181 * h + c over the characters (or bytes) of a key,
+    computed one character at a time in Python. This is the default hash function of HashTable.
+    """
+    __slots__ = []
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Returns the polynomial hash of the key.
+        """
+        if isinstance(key, bytes):
+            hashed_value = 0
+            for byte in key:
+                hashed_value = 181 * hashed_value + byte
+            return hashed_value
+        return HashTable._base_hash(key)
+
+
+class BuiltinHash(HashFunction):
+    """
+    Python's built-in hash(). The fastest option, and it also accepts any hashable key.
+    Since Python salts the hash of str and bytes per process, tables using it cannot be saved.
+    """
+    __slots__ = []
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Returns hash(key).
+        """
+        return hash(key)
+
+
+class FNV1aHash(HashFunction):
+    """
+    64-bit FNV-1a over the bytes of a key.
+    """
+    __slots__ = []
+    OFFSET = 0xcbf29ce484222325
+    PRIME = 0x100000001b3
+    MASK = (1 << 64) - 1
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Returns the FNV-1a hash of the key.
+        """
+        hashed_value, prime, mask = self.OFFSET, self.PRIME, self.MASK
+        for byte in (key if isinstance(key, bytes) else key.encode()):
+            hashed_value = (hashed_value ^ byte) * prime & mask
+        return hashed_value
+
+
+class XXHash(HashFunction):
+    """
+    64-bit xxHash over the bytes of a key. Requires the optional xxhash package.
+    """
+    __slots__ = []
+
+    def __init__(self) -> None:
+        """
+        Checks that xxhash is installed.
+        """
+        if xxhash is None:
+            raise ImportError("XXHash requires the xxhash package")
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Returns the xxh64 hash of the key.
+        """
+        return xxhash.xxh64_intdigest(key)
+
+
+class SeededHash(HashFunction):
+    """
+    Keyed 64-bit BLAKE2b over the bytes of a key. Without the seed, colliding keys
+    cannot be precomputed, which protects tables fed untrusted keys against hash flooding.
+    """
+    __slots__ = ["seed"]
+
+    def __init__(self, seed: bytes = None) -> None:
+        """
+        Builds a seeded hash function.
+
+        :param seed: [bytes] Secret of at most 16 bytes, random if not given.
+        """
+        self.seed: bytes = os.urandom(16) if seed is None else seed
+        if len(self.seed) > 16:
+            raise ValueError("seed must be at most 16 bytes")
+
+    def __call__(self, key: Union[str, bytes]) -> int:
+        """
+        Returns the keyed BLAKE2b hash of the key.
+        """
+        data = key if isinstance(key, bytes) else key.encode()
+        return int.from_bytes(blake2b(data, digest_size=8, key=self.seed).digest(), "little")
+
+
+class ProbeStats:
+    """
+    Probe length statistics of a HashTable, counting the probes a successful
+    lookup of each live key takes (1 when the key sits in its first slot).
+
+    Properties
+    - mean: [float] mean probe length, 0.0 for an empty table
+    - max: [int] longest probe length, 0 for an empty table
+    - histogram: [List[int]] histogram[i] = number of keys found after i + 1 probes
+    """
+    __slots__ = ["mean", "max", "histogram"]
+
+    def __init__(self, histogram: List[int]) -> None:
+        """
+        Builds the statistics from a probe length histogram.
+
+        :param histogram: [List[int]] histogram[i] = number of keys found after i + 1 probes.
+        """
+        count = sum(histogram)
+        self.histogram: List[int] = histogram
+        self.max: int = len(histogram)
+        self.mean: float = sum((i + 1) * n for i, n in enumerate(histogram)) / count if count else 0.0
+
+    def __str__(self) -> str:
+        """
+        Represents the ProbeStats as a string.
+
+        :return: [str] String representation of the statistics.
+        """
+        return f"ProbeStats(mean={self.mean:.3f}, max={self.max}, histogram={self.histogram})"
+
+    __repr__ = __str__
+
+
+class MappedEntries:
+    """
+    Dense entries table of a HashTable reopened from a snapshot, decoding each
+    HashNode from the snapshot buffer the first time it is accessed.
+    Assigned and appended entries are held in memory, the snapshot itself is never written.
+
+    Properties
+    - buffer: [memoryview] snapshot bytes holding the encoded entries
+    - offsets: [memoryview] offsets[i] to offsets[i + 1] delimit the bytes of entry i in buffer
+    - nodes: [list] decoded entries, False where an entry has not been decoded yet
+    """
+    __slots__ = ["buffer", "offsets", "nodes"]
+
+    def __init__(self, buffer: memoryview, offsets: memoryview) -> None:
+        """
+        Wraps the encoded entries of a snapshot without decoding any of them.
+
+        Time: O(n) where n = number of entries, for one flat list allocation
+        Space: O(n) where n = number of entries
+
+        :param buffer: [memoryview] Encoded entries.
+        :param offsets: [memoryview] Byte offset of each entry in buffer, plus the end offset.
+        """
+        self.buffer: memoryview = buffer
+        self.offsets: memoryview = offsets
+        self.nodes: List[HashNode] = [False] * (len(offsets) - 1)
+
+    @staticmethod
+    def encode(node: HashNode) -> bytes:
+        """
+        Encodes a HashNode as its hash, key, a tag telling a str key from a bytes one, and
+        its pickled value; None encodes as no bytes.
+
+        Time: O(k + v) where k = len(key) and v = size of the pickled value
+        Space: O(k + v)
+
+        :param node: [HashNode] Entry to encode, None if deleted.
+        :return: [bytes] Encoded entry.
+        """
+        if node is None:
+            return b""
+        hashed = node.hash.to_bytes(node.hash.bit_length() // 8 + 1, "little", signed=True)
+        if isinstance(node.key, bytes):
+            tag, key = b"b", node.key
+        else:
+            tag, key = b"s", node.key.encode()
+        return b"".join((struct.pack("<i", len(hashed)), hashed, struct.pack("<i", len(key)), tag, key,
+                         pickle.dumps(node.value)))
+
+    def decode(self, index: int) -> HashNode:
+        """
+        Decodes entry index from the snapshot buffer.
+
+        Time: O(k + v) where k = len(key) and v = size of the pickled value
+        Space: O(k + v)
+
+        :param index: [int] Position of the entry.
+        :return: [HashNode] The decoded entry, None if it was deleted.
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        if start == end:
+            return None
+        record = self.buffer[start:end]
+        length = struct.unpack_from("<i", record)[0]
+        hashed = int.from_bytes(record[4:4 + length], "little", signed=True)
+        start = 4 + length
+        length = struct.unpack_from("<i", record, start)[0]
+        key = bytes(record[start + 5:start + 5 + length])
+        if record[start + 4] == ord("s"):
+            key = key.decode()
+        return HashNode(key, pickle.loads(record[start + 5 + length:]), hashed)
+
+    def __getitem__(self, index: int) -> HashNode:
+        """
+        Returns entry index, decoding it on first access.
+
+        :param index: [int] Position of the entry.
+        :return: [HashNode] The entry, None if it was deleted.
+        """
+        node = self.nodes[index]
+        if node is False:
+            node = self.nodes[index] = self.decode(index % len(self.nodes))
+        return node
+
+    def __setitem__(self, index: int, node: HashNode) -> None:
+        """
+        Replaces entry index.
+
+        :param index: [int] Position of the entry.
+        :param node: [HashNode] New entry, None to mark it deleted.
+        """
+        self.nodes[index] = node
+
+    def __len__(self) -> int:
+        """
+        :return: [int] Number of entries, including deleted ones.
+        """
+        return len(self.nodes)
+
+    def __iter__(self) -> Generator[HashNode, None, None]:
+        """
+        Generates every entry in order, decoding as it goes.
+
+        :return: [Generator] Entries, None for deleted ones.
+        """
+        for i in range(len(self.nodes)):
+            yield self[i]
+
+    def append(self, node: HashNode) -> None:
+        """
+        Appends an entry.
+
+        :param node: [HashNode] Entry to append.
+        """
+        self.nodes.append(node)
+
+    def live(self, index: int) -> bool:
+        """
+        Tells whether entry index is live, without decoding it.
+
+        :param index: [int] Position of the entry.
+        :return: [bool] False if the entry was deleted.
+        """
+        node = self.nodes[index]
+        if node is False:
+            return self.offsets[index] != self.offsets[index + 1]
+        return node is not None
+
+    def pop(self) -> HashNode:
+        """
+        Removes and returns the last entry.
+
+        :return: [HashNode] The last entry, None if it was deleted.
+        """
+        node = self[len(self.nodes) - 1]
+        self.nodes.pop()
+        return node
+
+
+class LiveBlocks:
+    """
+    Number of live entries in each block of BLOCK positions of a dense entries table,
+    so that the position of the k-th live entry is found without walking the table.
+    Deletes of the table keep the counts up to date, and entries appended since the
+    last lookup are counted at the next one. A table that replaces its dense table
+    (compaction, rehash, clear, load) starts new counts at its next windowed read.
+
+    Properties
+    - entries: [list] dense table counted, the key column of a ColumnarHashTable
+    - covered: [int] number of leading positions of entries that are counted
+    - counts: [List[int]] counts[b] = number of live entries among the covered positions
+                          from b * BLOCK to (b + 1) * BLOCK - 1
+    """
+    __slots__ = ["entries", "covered", "counts"]
+    BLOCK = 256
+
+    def __init__(self, entries: list) -> None:
+        """
+        Starts counting a dense table; nothing is counted until the first lookup.
+
+        :param entries: [list] Dense table to count.
+        """
+        self.entries: list = entries
+        self.covered: int = 0
+        self.counts: List[int] = []
+
+    def drop(self, position: int) -> None:
+        """
+        Records that the entry at position was deleted.
+
+        Time: O(1)
+        Space: O(1)
+
+        :param position: [int] Position of the deleted entry.
+        """
+        if position < self.covered:
+            self.counts[position // self.BLOCK] -= 1
+
+    def truncate(self, length: int) -> None:
+        """
+        Records that deleted entries were popped off the end of the table, leaving length entries.
+
+        Time: O(1)
+        Space: O(1)
+
+        :param length: [int] New length of the table.
+        """
+        self.covered = min(self.covered, length)
+
+    def _live(self, position: int) -> bool:
+        """
+        :param position: [int] Position of an entry.
+        :return: [bool] Whether the entry at position is live.
+        """
+        entries = self.entries
+        return entries.live(position) if isinstance(entries, MappedEntries) else entries[position] is not None
+
+    def _update(self) -> None:
+        """
+        Counts the entries appended since the last lookup.
+
+        Time: O(a) where a = number of entries appended, in C for a list
+        Space: O(a / BLOCK)
+        """
+        entries, counts, block = self.entries, self.counts, self.BLOCK
+        length = len(entries)
+        while self.covered < length:
+            start = self.covered
+            end = min((start // block + 1) * block, length)
+            while len(counts) <= start // block:
+                counts.append(0)
+            if isinstance(entries, list):
+                counts[start // block] += sum(map(is_not, entries[start:end], repeat(None)))
+            else:
+                counts[start // block] += sum(1 for position in range(start, end) if self._live(position))
+            self.covered = end
+
+    def locate(self, ranks: List[int]) -> List[int]:
+        """
+        Finds the positions of live entries by rank, rank 0 being the oldest live entry.
+
+        Time: O(n / BLOCK + r * BLOCK) where r = len(ranks), plus the entries appended since
+              the last lookup, the first term in C
+        Space: O(n / BLOCK)
+
+        :param ranks: [List[int]] Ranks to find, each below the number of live entries.
+        :return: [List[int]] Position of each rank.
+        """
+        self._update()
+        prefix = list(accumulate(self.counts))
+        positions = []
+        for rank in ranks:
+            block = bisect_right(prefix, rank)
+            rank -= prefix[block - 1] if block else 0
+            position = block * self.BLOCK
+            while True:
+                if self._live(position):
+                    if rank == 0:
+                        break
+                    rank -= 1
+                position += 1
+            positions.append(position)
+        return positions
+
+
 class HashTable:
     """
     Implements a hashtable for fast insertion and lookup.
@@ -104,11 +625,36 @@ class HashTable:
                       index of the associated value in self.entries
     - entries: [list] a table onto which values are appended, and
                       referenced by integers in indices
-    - prime_index: [int] index of current prime in Hashtable.PRIMES
+    - prime: [int] largest prime not exceeding capacity, used by _hash_2 for step sizes
     - capacity: [int] length of self.indices
-    - size: [int] number of entries in self.entries
+    - size: [int] number of live entries in self.entries
+    - compact_ratio: [float] fraction of deleted (None) entries in self.entries
+                             above which self.entries is compacted
+    - load_factor: [float] fraction of capacity holding live entries at which the table grows
+    - tombstone_ratio: [float] fraction of capacity holding DELETED markers at which
+                               the table is rehashed in place, or shrunk
+    - shrink_ratio: [float] fraction of capacity holding live entries below which
+                            the table shrinks, kept under load_factor / 4 so that
+                            a shrunk table is about to neither grow nor shrink again;
+                            the tombstone_ratio rehash shrinks a sparse table as well
+    - tombstones: [int] number of DELETED markers in self.indices
+    - min_capacity: [int] starting capacity, the table never shrinks below it
+    - compact_indices: [bool] if True, self.indices is an array.array whose typecode
+                              is the narrowest one able to hold every entry index
+    - probing: [ProbingStrategy] probe sequence used for collision resolution
+    - hash_function: [HashFunction] computes the base hash of each key
+    - incremental: [bool] if True, growing migrates entries a few slots per operation
+                          instead of rehashing everything at once
+    - resizing: [HashTable] while an incremental grow is in progress, a view of the old
+                            indices table sharing self.entries, else None
+    - migrated: [int] number of slots of the old indices table migrated so far
+    - head: [int] position in the dense table before which every entry is deleted,
+                  letting popitem(last=False) and iteration skip them
     """
-    __slots__ = ["indices", "entries", "prime_index", "capacity", "size"]
+    __slots__ = ["indices", "entries", "prime", "capacity", "size", "compact_ratio",
+                 "load_factor", "tombstone_ratio", "tombstones", "min_capacity", "compact_indices",
+                 "probing", "incremental", "resizing", "migrated", "shrink_ratio",
+                 "head", "hash_function", "live_blocks"]
 
     # set constants
     FREE = -1
@@ -124,28 +670,149 @@ class HashTable:
         743, 751, 757, 761, 769, 773, 787, 797, 809, 811, 821, 823, 827, 829, 839, 853, 857, 859,
         863, 877, 881, 883, 887, 907, 911, 919, 929, 937, 941, 947, 953, 967, 971, 977, 983, 991,
         997)
+    # bases making Miller-Rabin deterministic for every n < 3.3 * 10^24
+    WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+    # _prime_cache[b] holds (capacity, prime) for the last capacity of bit length b
+    _prime_cache: List[Tuple[int, int]] = [(0, 0)] * 128
+    # signed array typecodes from narrowest to widest, as in CPython's compact dict
+    INDEX_TYPECODES = ("b", "h", "i", "q")
+    # old slots migrated per operation during an incremental grow; at least 2 is needed
+    # for the migration to finish before the new table reaches its own load factor
+    MIGRATE_STEP = 4
+    # smallest batch for which get_many/contains_many vectorize probe starts with NumPy
+    VECTORIZE_MIN = 64
+    # snapshot header: magic, capacity, size, len(entries), tombstones, min_capacity, prime,
+    # compact_ratio, load_factor, tombstone_ratio, shrink_ratio, probing class name,
+    # hash function class name, hash function seed length and seed, compact_indices
+    SNAPSHOT_MAGIC = b"HTSNAP04"
+    SNAPSHOT_HEADER = struct.Struct("=8s6q4d16s16sB16s?6x")
+    # hash functions whose hashes stay the same across processes
+    SNAPSHOT_HASH_FUNCTIONS = (PolynomialHash, FNV1aHash, XXHash, SeededHash)
 
-    def __init__(self, capacity: int = 8) -> None:
+    def __init__(self, capacity: int = 8, compact_ratio: float = 0.75,
+                 load_factor: float = 0.5, tombstone_ratio: float = 0.25,
+                 compact_indices: bool = False, probing: ProbingStrategy = None,
+                 incremental: bool = False, shrink_ratio: float = 0.0625,
+                 hash_function: HashFunction = None) -> None:
         """
         Initializes HashTable.
-        DO NOT EDIT.
 
         Time: O(c) where c = capacity
         Space: O(c) where c = capacity
 
         :param capacity: [int] Starting capacity of the hashtable,
                                i.e., starting length of the indices table.
+        :param compact_ratio: [float] Fraction of deleted entries that triggers compaction.
+        :param load_factor: [float] Fraction of capacity in live use that triggers growth.
+        :param tombstone_ratio: [float] Fraction of capacity marked DELETED that triggers
+                                        a same-capacity rehash or a shrink.
+                                        load_factor and tombstone_ratio must lie in (0, 1)
+                                        and sum to under 1, so that probes always reach a FREE slot.
+        :param compact_indices: [bool] Store indices in an array.array instead of a list.
+        :param probing: [ProbingStrategy] Collision resolution, DoubleHashing if not given.
+                                          QuadraticProbing needs a power of two capacity.
+        :param incremental: [bool] Spread the rehash of each grow across later operations.
+        :param shrink_ratio: [float] Fraction of capacity in live use below which the
+                                     table shrinks after a delete. 0 turns this off, but
+                                     the rehash triggered by tombstone_ratio still shrinks
+                                     a sparse table.
+        :param hash_function: [HashFunction] Base hash of keys, PolynomialHash if not given.
         """
+        if not 0 < load_factor < 1 or not 0 < tombstone_ratio < 1:
+            raise ValueError("load_factor and tombstone_ratio must be between 0 and 1")
+        if load_factor + tombstone_ratio >= 1:
+            raise ValueError("load_factor and tombstone_ratio must sum to less than 1")
+        self.probing: ProbingStrategy = DoubleHashing() if probing is None else probing
+        if isinstance(self.probing, QuadraticProbing) and (capacity < 1 or capacity & (capacity - 1)):
+            raise ValueError("QuadraticProbing needs a power of two capacity")
+        self.hash_function: HashFunction = PolynomialHash() if hash_function is None else hash_function
+        self.incremental: bool = incremental
+        self.resizing: HashTable = None
+        self.migrated: int = 0
         # create underlying data structures
-        self.indices: List[int] = [self.FREE] * capacity  # a sparse table of indices
+        self.compact_indices: bool = compact_indices
+        self.indices: List[int] = self._new_indices(capacity)  # a sparse table of indices
         self.entries: List[HashNode] = []  # a dense table of HashNodes
+        self.head: int = 0
+        self.live_blocks: LiveBlocks = None
         self.capacity: int = capacity
         self.size: int = 0
-        # set prime index for hash computations
-        i = 0
-        while HashTable.PRIMES[i] <= self.capacity:
-            i += 1
-        self.prime_index: int = i - 1
+        self.compact_ratio: float = compact_ratio
+        self.load_factor: float = load_factor
+        self.tombstone_ratio: float = tombstone_ratio
+        self.shrink_ratio: float = shrink_ratio
+        self.tombstones: int = 0
+        self.min_capacity: int = capacity
+        # set prime for hash computations
+        self.prime: int = self._largest_prime(self.capacity)
+
+    def _new_indices(self, capacity: int) -> List[int]:
+        """
+        Allocates a table of FREE indices of the given capacity. In compact mode the
+        table is an array.array using the narrowest typecode able to index capacity entries.
+
+        Time: O(c) where c = capacity
+        Space: O(c) where c = capacity
+
+        :param capacity: [int] Length of the new table.
+        :return: [List[int]] A list, or an array.array in compact mode, filled with FREE.
+        """
+        if not self.compact_indices:
+            return [self.FREE] * capacity
+        for typecode in self.INDEX_TYPECODES:
+            if capacity <= 1 << (8 * array(typecode).itemsize - 1):
+                break
+        return array(typecode, [self.FREE]) * capacity
+
+    def _widen_indices(self) -> None:
+        """
+        Moves a compact index table to the next wider typecode, used when dead entries
+        push the next entry index past what the current typecode can hold.
+
+        Time: O(c) where c = capacity
+        Space: O(c) where c = capacity
+        """
+        typecode = self.INDEX_TYPECODES[self.INDEX_TYPECODES.index(self.indices.typecode) + 1]
+        self.indices = array(typecode, self.indices)
+
+    def _node(self, index: int) -> HashNode:
+        """
+        Returns the entry at the given position of the dense table.
+
+        Time: O(1)
+        Space: O(1)
+
+        :param index: [int] Position in self.entries.
+        :return: [HashNode] The entry, None if it was deleted.
+        """
+        return self.entries[index]
+
+    def probe_stats(self) -> ProbeStats:
+        """
+        Measures how many probes a successful lookup of each live key takes
+        under the table's probing strategy.
+
+        Time: O(n * p) where n = size and p = mean probe length
+        Space: O(p_max) where p_max = longest probe length
+
+        :return: [ProbeStats] Mean and max probe length, and a probe length histogram.
+        """
+        self._finish_resize()
+        histogram = []
+        for slot in range(self.capacity):
+            if self.indices[slot] < 0:
+                continue
+            node = self._node(self.indices[slot])
+            num, step = self.probing.start(self, node.key, node.hash)
+            length = 1
+            while num != slot:
+                num = (num + step) % self.capacity
+                step += self.probing.increment
+                length += 1
+            while len(histogram) < length:
+                histogram.append(0)
+            histogram[length - 1] += 1
+        return ProbeStats(histogram)
 
     def __eq__(self, other: HashTable) -> bool:
         """
@@ -181,7 +848,7 @@ class HashTable:
                 else f'{self.indices[i]}: {self.entries[self.indices[i]]}'
             representation.append(f"[{i}]: " + action)
         representation.append("]\nEntries: [")
-        for i in range(self.size):
+        for i in range(len(self.entries)):
             representation.append(f"[{i}]: {self.entries[i]}")
         representation.append("]")
         return "\n".join(representation)
@@ -200,44 +867,116 @@ class HashTable:
         """
         return self.size
 
-    def _hash_1(self, key: str) -> int:
+    @staticmethod
+    def _is_prime(n: int) -> bool:
         """
-        Converts a key into an initial bin number for double probing.
-        DO NOT EDIT.
+        Deterministic Miller-Rabin primality test.
 
-        Time: O(1)
+        Time: O(log^3(n))
+        Space: O(1)
+
+        :param n: [int] Number to test.
+        :return: [bool] True if n is prime, else False.
+        """
+        if n < 2:
+            return False
+        for p in HashTable.WITNESSES:
+            if n % p == 0:
+                return n == p
+        d, r = n - 1, 0
+        while d % 2 == 0:
+            d //= 2
+            r += 1
+        for a in HashTable.WITNESSES:
+            x = pow(a, d, n)
+            if x == 1 or x == n - 1:
+                continue
+            for _ in range(r - 1):
+                x = x * x % n
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def _largest_prime(n: int) -> int:
+        """
+        Finds the largest prime not exceeding n, for use as the _hash_2 modulus.
+        Small values come from HashTable.PRIMES, larger ones are found by testing
+        odd numbers downward and memoized per bit length, so repeated doubling
+        through the same capacities costs O(1) per lookup.
+
+        Time: O(1) when cached, else O(g * log^3(n)) where g = prime gap below n
+        Space: O(1)
+
+        :param n: [int] Upper bound, typically the table capacity.
+        :return: [int] Largest prime <= n, or 2 if n < 2.
+        """
+        if n <= HashTable.PRIMES[-1]:
+            return HashTable.PRIMES[max(bisect_right(HashTable.PRIMES, n) - 1, 0)]
+        cache = HashTable._prime_cache
+        bits = n.bit_length()
+        if bits < len(cache) and cache[bits][0] == n:
+            return cache[bits][1]
+        candidate = n if n % 2 else n - 1
+        while not HashTable._is_prime(candidate):
+            candidate -= 2
+        if bits < len(cache):
+            cache[bits] = (n, candidate)
+        return candidate
+
+    @staticmethod
+    def _base_hash(key: str) -> int:
+        """
+        Computes the polynomial hash of a key, the base hash of PolynomialHash
+        and the default of HashNode.
+
+        Time: O(k) where k = len(key)
         Space: O(1)
 
         :param key: [str] Key to be hashed.
-        :return: [int] Initial bin number for double probing, None if key is an empty string.
+        :return: [int] Base hash of the key.
         """
-        if not key:
-            return None
         hashed_value = 0
-
         for char in key:
             hashed_value = 181 * hashed_value + ord(char)
-        return hashed_value % self.capacity
+        return hashed_value
 
-    def _hash_2(self, key: str) -> int:
+    def _hash_1(self, key: str, hashed_value: int = None) -> int:
         """
-        Converts a key into a step size for double probing.
-        DO NOT EDIT.
+        Converts a key into an initial bin number for double probing.
 
         Time: O(1)
         Space: O(1)
 
         :param key: [str] Key to be hashed.
-        :return: [int] Double probing step size, None if key is an empty string.
+        :param hashed_value: [int] Cached base hash of key, computed from key if not given.
+        :return: [int] Initial bin number for double probing, None if key is an empty string.
         """
         if not key:
             return None
-        hashed_value = 0
+        if hashed_value is None:
+            hashed_value = self.hash_function(key)
+        return hashed_value % self.capacity
 
-        for char in key:
-            hashed_value = 181 * hashed_value + ord(char)
+    def _hash_2(self, key: str, hashed_value: int = None) -> int:
+        """
+        Converts a key into a step size for double probing.
+
+        Time: O(1)
+        Space: O(1)
 
-        prime = HashTable.PRIMES[self.prime_index]
+        :param key: [str] Key to be hashed.
+        :param hashed_value: [int] Cached base hash of key, computed from key if not given.
+        :return: [int] Double probing step size, None if key is an empty string.
+        """
+        if not key:
+            return None
+        if hashed_value is None:
+            hashed_value = self.hash_function(key)
+
+        prime = self.prime
         hashed_value = prime - (hashed_value % prime)
         if hashed_value % 2 == 0:
             hashed_value += 1
@@ -247,36 +986,60 @@ class HashTable:
     # IMPLEMENT BELOW
     ###############################################################################################
 
-    def _hash(self, key: str, inserting: bool = False) -> int:
+    def _hash(self, key: str, inserting: bool = False, hashed_value: int = None) -> int:
         """
         _hash function returns an index in the self.indices
         :param key: a string returning the index of where the string would go
         :param inserting: determines whether to be inserted or not
+        :param hashed_value: cached base hash of key, computed from key if not given
         :return: an integer representing the index where the key would go or
         where it would be inserted
         """
-        first = self._hash_1(key)
-        second = self._hash_2(key)
-        i = 0
-        if inserting:
-            while True:
-                num = (first + i * second) % self.capacity
-                if self.indices[num] == self.FREE or self.indices[num] == self.DELETED:
-                    break
-                if self.entries[self.indices[num]].key == key:
+        if hashed_value is None:
+            hashed_value = self.hash_function(key)
+        num, step = self.probing.start(self, key, hashed_value)
+        increment = self.probing.increment
+        while True:
+            index = self.indices[num]
+            if index == self.FREE or (inserting and index == self.DELETED):
+                return num
+            if index >= 0:
+                node = self.entries[index]
+                if node.hash == hashed_value and node.key == key:
                     return num
-                i += 1
-        else:
-            while True:
-                num = (first + i * second) % self.capacity
-                if self.indices[num] == self.FREE:
-                    break
-                if self.indices[num] == self.DELETED:
-                    pass
-                elif self.entries[self.indices[num]].key == key:
+            num = (num + step) % self.capacity
+            step += increment
+
+    def _find_slot(self, key: str, hashed_value: int) -> int:
+        """
+        Probes once for key, combining the lookup and insertion probes of _hash.
+        Returns the slot holding key if present, otherwise the first FREE or DELETED
+        slot on the probe sequence, which is where _hash(key, inserting=True) would insert.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to probe for.
+        :param hashed_value: [int] Cached base hash of key.
+        :return: [int] Index in self.indices, holding a non-negative entry index iff key is present.
+        """
+        num, step = self.probing.start(self, key, hashed_value)
+        increment = self.probing.increment
+        indices, entries = self.indices, self.entries
+        reusable = -1
+        while True:
+            index = indices[num]
+            if index == self.FREE:
+                return num if reusable < 0 else reusable
+            if index == self.DELETED:
+                if reusable < 0:
+                    reusable = num
+            else:
+                node = entries[index]
+                if node.hash == hashed_value and node.key == key:
                     return num
-                i += 1
-        return num
+            num = (num + step) % self.capacity
+            step += increment
 
     def _insert(self, key: str, value: T) -> None:
         """
@@ -285,21 +1048,29 @@ class HashTable:
         :param key: the key to be inserted into the function
         :param value: the value to be inserted into the function
         """
-        new_node = HashNode(key, value)
-        index1 = self._hash(key)
+        hashed_value = self.hash_function(key)
+        old_node = None
+        if self.resizing is not None:
+            self._migrate(self.MIGRATE_STEP)
+            if self.resizing is not None:
+                old_node = self._get_old(key, hashed_value)
+        index1 = self._find_slot(key, hashed_value)
 
-        if self.size > 0 and self.entries[self.indices[index1]].key == key:
-            self.entries[self.indices[index1]].value = new_node.value
+        if self.indices[index1] >= 0:
+            self.entries[self.indices[index1]].value = value
+
+        elif old_node is not None:
+            old_node.value = value
 
         else:
-            index1 = self._hash(key, True)
+            if self.indices[index1] == self.DELETED:
+                self.tombstones -= 1
+            if self.compact_indices and len(self.entries) >= 1 << (8 * self.indices.itemsize - 1):
+                self._widen_indices()
             self.indices[index1] = len(self.entries)
             self.size += 1
-            self.entries.append(new_node)
-
-        if self.capacity // 2 <= self.size:
-            self._grow()
-
+            self.entries.append(HashNode(key, value, hashed_value))
+            self._resize()
 
     def _get(self, key: str) -> HashNode:
         """
@@ -307,44 +1078,210 @@ class HashTable:
         :param key: the key to search for
         :return: A HashNode if the key is found, if it is not found returns None
         """
+        if self.resizing is not None:
+            self._migrate(self.MIGRATE_STEP)
+            hashed_value = self.hash_function(key)
+            index = self.indices[self._hash(key, hashed_value=hashed_value)]
+            if index >= 0:
+                return self.entries[index]
+            return None if self.resizing is None else self._get_old(key, hashed_value)
         index = self._hash(key)
         if self.indices[index] == self.FREE or self.indices[index] == self.DELETED:
             return None
         else:
             return self.entries[self.indices[index]]
 
+    def _get_old(self, key: str, hashed_value: int) -> HashNode:
+        """
+        Looks key up in the old indices table of an incremental grow.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to look up.
+        :param hashed_value: [int] Cached base hash of key.
+        :return: [HashNode] The entry if key has not been migrated yet, else None.
+        """
+        index = self.resizing.indices[self.resizing._hash(key, hashed_value=hashed_value)]
+        return self.entries[index] if index >= 0 else None
+
     def _delete(self, key: str) -> None:
         """
         This function will look for a node with the key and if it is found it will delete the node.
         :param key: This parameter is the key that is being searched for
         :return: None
         """
-        index = self._hash(key)
+        if self.resizing is not None:
+            self._migrate(self.MIGRATE_STEP)
+            hashed_value = self.hash_function(key)
+            index = self._hash(key, hashed_value=hashed_value)
+            if self.indices[index] < 0 and self.resizing is not None:
+                old = self.resizing
+                index = old._hash(key, hashed_value=hashed_value)
+                if old.indices[index] >= 0:
+                    # not migrated yet, the DELETED marker only lives until migration ends
+                    self.entries[old.indices[index]] = None
+                    if self.live_blocks is not None:
+                        self.live_blocks.drop(old.indices[index])
+                    old.indices[index] = self.DELETED
+                    self.size -= 1
+                return
+        else:
+            index = self._hash(key)
         if self.indices[index] == self.FREE or self.indices[index] == self.DELETED:
             return
         else:
             self.entries[self.indices[index]] = None
+            if self.live_blocks is not None:
+                self.live_blocks.drop(self.indices[index])
             self.indices[index] = self.DELETED
+            self.tombstones += 1
             self.size -= 1
+            # compaction and tombstone rehashes wait until an incremental grow ends
+            if self.resizing is None and not self._resize(True) and \
+                    len(self.entries) - self.size > self.compact_ratio * len(self.entries):
+                self._compact()
+
+    def _resize(self, deleting: bool = False) -> bool:
+        """
+        Applies the resize policy, counting live entries and DELETED markers separately.
+        Grows when live entries reach load_factor of capacity. Otherwise, when DELETED
+        markers pass tombstone_ratio of capacity, or after a delete live entries fall below
+        shrink_ratio of capacity, rehashes to drop the markers, halving capacity while the live entries
+        would still sit below half the load factor. A shrunk table is thus left between
+        a quarter and half of the load factor, at least twice its live entries away from
+        growing and, while shrink_ratio < load_factor / 4, from shrinking again, so
+        alternating inserts and deletes around either threshold never thrash.
+
+        Time: O(1) if no resize happens, else O(c + n) where c = capacity and n = len(self.entries)
+        Space: O(1) if no resize happens, else O(c + n)
+
+        :param deleting: [bool] Called after a delete, the only time the table may shrink
+                                (a table pre-sized by update must not shrink while it fills).
+        :return: [bool] True if the table was rehashed, else False.
+        """
+        if self.size >= int(self.capacity * self.load_factor):
+            # an incremental grow still in progress is finished before the next one starts
+            self._finish_resize()
+            self._grow()
+            return True
+        if self.resizing is not None:
+            return False
+        purge = self.tombstones > self.capacity * self.tombstone_ratio
+        if purge or (deleting and self.capacity > self.min_capacity and
+                     self.size < self.capacity * self.shrink_ratio):
+            capacity = self.capacity
+            while capacity // 2 >= self.min_capacity and \
+                    self.size < int(capacity // 2 * self.load_factor) // 2:
+                capacity //= 2
+            if purge or capacity < self.capacity:
+                self._rehash(capacity)
+                return True
+        return False
+
+    def _compact(self) -> None:
+        """
+        Drops deleted (None) entries from self.entries, keeping insertion order,
+        and remaps self.indices to the new entry positions in a single pass.
+
+        Time: O(c + n) where c = capacity and n = len(self.entries)
+        Space: O(n) where n = len(self.entries)
+        """
+        self._finish_resize()
+        remap = [self.FREE] * len(self.entries)
+        live = []
+        for i, node in enumerate(self.entries):
+            if node is not None:
+                remap[i] = len(live)
+                live.append(node)
+        for slot in range(self.capacity):
+            if self.indices[slot] >= 0:
+                self.indices[slot] = remap[self.indices[slot]]
+        self.entries = live
+        self.head = 0
 
     def _grow(self) -> None:
         """
-        Grow function doubles the size of the table and changes prime index to
-        the largest prime number less than capacity
+        Grow function doubles the size of the table and changes prime to
+        the largest prime number not exceeding capacity.
+        In incremental mode, only a new empty indices table is allocated here, and
+        later operations migrate the old one MIGRATE_STEP slots at a time.
         """
+        if not self.incremental:
+            self._rehash(self.capacity * 2)
+            return
+        old = HashTable.__new__(HashTable)
+        old.indices, old.entries, old.capacity = self.indices, self.entries, self.capacity
+        old.prime, old.probing = self.prime, self.probing
+        self.resizing = old
+        self.migrated = 0
         self.capacity = self.capacity * 2
-        new_indices = [self.FREE] * self.capacity
-        index = 0
-        self.indices = new_indices
-
-        while self.capacity >= self.PRIMES[index]:
-            index += 1
-        self.prime_index = index - 1
-        count = 0
-        for i in self.entries:
-            new_index = self._hash(i.key)
-            self.indices[new_index] = count
-            count += 1
+        self.indices = self._new_indices(self.capacity)
+        self.tombstones = 0
+        self.prime = self._largest_prime(self.capacity)
+
+    def _migrate(self, step: int) -> None:
+        """
+        Moves the live entries of the next step slots of the old indices table
+        of an incremental grow into the new one, ending the grow after the last slot.
+
+        Time: O(step)*
+        Space: O(1)
+
+        :param step: [int] Number of old slots to migrate.
+        """
+        old = self.resizing
+        end = min(self.migrated + step, old.capacity)
+        for slot in range(self.migrated, end):
+            index = old.indices[slot]
+            if index >= 0:
+                node = self.entries[index]
+                new_slot = self._hash(node.key, True, node.hash)
+                if self.indices[new_slot] == self.DELETED:
+                    self.tombstones -= 1
+                self.indices[new_slot] = index
+                # keep probe chains through the slot intact for keys not migrated yet
+                old.indices[slot] = self.DELETED
+        self.migrated = end
+        if end == old.capacity:
+            self.resizing = None
+
+    def _finish_resize(self) -> None:
+        """
+        Completes an incremental grow in progress, if any, in one pass.
+        Called before operations that rebuild or scan the whole indices table.
+
+        Time: O(c) where c = capacity of the old indices table
+        Space: O(1)
+        """
+        if self.resizing is not None:
+            self._migrate(self.resizing.capacity)
+
+    def _rehash(self, capacity: int) -> None:
+        """
+        Rebuilds self.indices at the given capacity from the cached hashes of live
+        entries, dropping every DELETED marker and compacting self.entries.
+
+        Time: O(c + n) where c = capacity and n = len(self.entries)
+        Space: O(c + n) where c = capacity and n = len(self.entries)
+
+        :param capacity: [int] Capacity of the rebuilt table.
+        """
+        self._finish_resize()
+        self.capacity = capacity
+        self.indices = self._new_indices(self.capacity)
+        self.tombstones = 0
+
+        self.prime = self._largest_prime(self.capacity)
+        # rehash live entries only, compacting self.entries along the way
+        old_entries = self.entries
+        self.entries = []
+        self.head = 0
+        for i in old_entries:
+            if i is not None:
+                new_index = self._hash(i.key, hashed_value=i.hash)
+                self.indices[new_index] = len(self.entries)
+                self.entries.append(i)
 
     def __setitem__(self, key: str, value: T) -> None:
         """
@@ -357,10 +1294,11 @@ class HashTable:
         This function gets the desired value from searching for a key
         :return: Raises KeyError if the key isn't found otherwise returs the value of the key found
         """
-        if self._get(key) is None:
+        node = self._get(key)
+        if node is None:
             raise KeyError()
         else:
-            return self._get(key).value
+            return node.value
 
     def __delitem__(self, key: str) -> None:
         """
@@ -385,171 +1323,2846 @@ class HashTable:
     def update(self, pairs: List[Tuple[str, T]]) -> None:
         """
         This function updates the HashTable with the tuples that are passed in.
+        The table is first sized once so the whole batch fits below the load factor,
+        so no intermediate grows happen while the pairs are inserted in a single pass.
+        Keys repeated within the batch keep their first position and their last value.
         :param pairs: This is a list of tuples that will be added into the table as nodes.
         :return: None
         """
+        if not isinstance(pairs, (list, tuple)):
+            pairs = list(pairs)
+        self._reserve(len(pairs))
 
         for i in pairs:
             self._insert(i[0], i[1])
         return
 
-    def keys(self, reverse: bool = False) -> Generator[str, None, None]:
+    def _reserve(self, count: int) -> None:
+        """
+        Grows the table once so that count more keys fit below the load factor.
+
+        Time: O(n) if the table grows, else O(1)
+        Space: O(n) if the table grows, else O(1)
+
+        :param count: [int] Number of keys about to be inserted.
+        """
+        capacity = self.capacity
+        while self.size + count >= int(capacity * self.load_factor):
+            capacity *= 2
+        if capacity != self.capacity:
+            self._rehash(capacity)
+
+    def _probe_starts(self, keys: List[str], hashes: List[int]) -> Tuple[List[int], List[int]]:
+        """
+        Computes the first slot and first step of the probe sequence of every key.
+        For the built-in strategies, the modulo arithmetic runs vectorized in NumPy
+        when it is installed, the batch is large enough and every hash fits in 64 bits.
+
+        Time: O(m) where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [List[str]] Keys being looked up.
+        :param hashes: [List[int]] Base hash of each key.
+        :return: [Tuple[List[int], List[int]]] First slot and first step of each key.
+        """
+        kind = type(self.probing)
+        if np is not None and len(hashes) >= self.VECTORIZE_MIN and \
+                kind in (DoubleHashing, LinearProbing, QuadraticProbing) and \
+                -(1 << 63) <= min(hashes) and max(hashes) < 1 << 63:
+            hashed = np.array(hashes, dtype=np.int64)
+            starts = (hashed % self.capacity).tolist()
+            if kind is not DoubleHashing:
+                return starts, [1] * len(hashes)
+            steps = self.prime - hashed % self.prime
+            steps += steps % 2 == 0
+            return starts, steps.tolist()
+        starts, steps = [], []
+        for key, hashed_value in zip(keys, hashes):
+            num, step = self.probing.start(self, key, hashed_value)
+            starts.append(num)
+            steps.append(step)
+        return starts, steps
+
+    def _find_many(self, keys: Iterable[str]) -> List[int]:
+        """
+        Finds the entry index of every key, hashing all keys in one pass
+        and then walking each probe sequence in a tight loop.
+
+        Time: O(m)* where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :return: [List[int]] Position in self.entries of each key, -1 if not present.
+        """
+        self._finish_resize()
+        keys = keys if isinstance(keys, list) else list(keys)
+        hashes = [self.hash_function(key) for key in keys]
+        starts, steps = self._probe_starts(keys, hashes)
+        indices, entries, capacity = self.indices, self.entries, self.capacity
+        increment, free = self.probing.increment, self.FREE
+        found = []
+        for key, hashed_value, num, step in zip(keys, hashes, starts, steps):
+            while True:
+                index = indices[num]
+                if index == free:
+                    found.append(-1)
+                    break
+                if index >= 0:
+                    node = entries[index]
+                    if node.hash == hashed_value and node.key == key:
+                        found.append(index)
+                        break
+                num = (num + step) % capacity
+                step += increment
+        return found
+
+    def get_many(self, keys: Iterable[str], default: T = None) -> List[T]:
+        """
+        Looks up a batch of keys at once.
+
+        Time: O(m)* where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :param default: [T] Value returned for keys that are not present.
+        :return: [List[T]] Value of each key, in the order of keys.
+        """
+        entries = self.entries
+        return [entries[index].value if index >= 0 else default for index in self._find_many(keys)]
+
+    def contains_many(self, keys: Iterable[str]) -> List[bool]:
+        """
+        Checks a batch of keys for membership at once.
+
+        Time: O(m)* where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :return: [List[bool]] Whether each key is present, in the order of keys.
+        """
+        return [index >= 0 for index in self._find_many(keys)]
+
+    def setdefault(self, key: str, default: T = None) -> T:
+        """
+        Returns the value of key, first inserting key with default if it is not present.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param key: [str] Key to look up.
+        :param default: [T] Value inserted if key is not present.
+        :return: [T] Value of key after the call.
+        """
+        node = self._get(key)
+        if node is not None:
+            return node.value
+        self._insert(key, default)
+        return default
+
+    def pop(self, key: str, *default: T) -> T:
+        """
+        Removes key and returns its value.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to remove.
+        :param default: [T] Optional value returned if key is not present.
+        :return: [T] Value key had, or default. Raises KeyError if key is not present and no default is given.
+        """
+        node = self._get(key)
+        if node is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._delete(key)
+        return node.value
+
+    def save(self, path: str) -> None:
+        """
+        Writes a binary snapshot of the table: a header, the indices table, and the
+        dense entries with their cached hashes, in native byte order.
+        HashTable.load reopens it without rehashing any key, so the hash function
+        (and its seed) is recorded too; BuiltinHash, whose str hashes change between
+        processes, and custom hash functions cannot be saved.
+
+        Time: O(c + n) where c = capacity and n = len(self.entries)
+        Space: O(c + n) where c = capacity and n = len(self.entries)
+
+        :param path: [str] File to write.
+        """
+        hashing = type(self.hash_function)
+        if hashing not in self.SNAPSHOT_HASH_FUNCTIONS:
+            raise ValueError(f"tables hashed with {hashing.__name__} cannot be saved")
+        self._finish_resize()
+        records = [MappedEntries.encode(node) for node in self.entries]
+        offsets = array("q", [0])
+        for record in records:
+            offsets.append(offsets[-1] + len(record))
+        header = self.SNAPSHOT_HEADER.pack(
+            self.SNAPSHOT_MAGIC, self.capacity, self.size, len(self.entries), self.tombstones,
+            self.min_capacity, self.prime, self.compact_ratio, self.load_factor, self.tombstone_ratio,
+            self.shrink_ratio, type(self.probing).__name__.encode(), hashing.__name__.encode(),
+            len(self.hash_function.seed), self.hash_function.seed, self.compact_indices)
+        with open(path, "wb") as snapshot:
+            snapshot.write(header)
+            snapshot.write(array("q", self.indices).tobytes())
+            snapshot.write(offsets.tobytes())
+            snapshot.write(b"".join(records))
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> HashTable:
+        """
+        Reopens a snapshot written by save. With mmap, the file is memory-mapped
+        copy-on-write: indices are used in place and entries are decoded on first access,
+        so reopening does no per-entry work. Changes to the table never reach the file.
+        Without mmap, the file is read and decoded eagerly, still without rehashing.
+        Values are unpickled, and unpickling can run arbitrary code: only load
+        snapshots from a trusted source.
+
+        Time: O(1) with mmap, else O(c + n) where c = capacity and n = number of entries
+        Space: O(n) with mmap, for a flat list of decoded entries, else O(c + n)
+
+        :param path: [str] File written by save.
+        :param mmap: [bool] Memory-map the file and decode entries lazily.
+        :return: [HashTable] The restored table.
+        """
+        with open(path, "rb") as snapshot:
+            if mmap:
+                buffer = memoryview(memory_map(snapshot.fileno(), 0, access=ACCESS_COPY))
+            else:
+                buffer = memoryview(bytearray(snapshot.read()))
+        header = HashTable.SNAPSHOT_HEADER
+        if len(buffer) < header.size:
+            raise ValueError(f"{path} is not a HashTable snapshot")
+        (magic, capacity, size, count, tombstones, min_capacity, prime, compact_ratio, load_factor,
+         tombstone_ratio, shrink_ratio, probing, hashing, seed_length, seed,
+         compact_indices) = header.unpack_from(buffer)
+        if magic != HashTable.SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a HashTable snapshot")
+        probing = probing.rstrip(b"\0").decode()
+        for kind in (DoubleHashing, LinearProbing, QuadraticProbing):
+            if kind.__name__ == probing:
+                break
+        else:
+            raise ValueError(f"unknown probing strategy {probing}")
+        hashing = hashing.rstrip(b"\0").decode()
+        for hash_kind in HashTable.SNAPSHOT_HASH_FUNCTIONS:
+            if hash_kind.__name__ == hashing:
+                break
+        else:
+            raise ValueError(f"unknown hash function {hashing}")
+
+        offsets_start = header.size + 8 * capacity
+        entries_start = offsets_start + 8 * (count + 1)
+        indices = buffer[header.size:offsets_start].cast("q")
+        entries = MappedEntries(buffer[entries_start:], buffer[offsets_start:entries_start].cast("q"))
+        if not mmap:
+            indices = array("q", indices)
+            entries = list(entries)
+
+        table = HashTable.__new__(HashTable)
+        table.compact_indices = compact_indices
+        table.indices = indices
+        table.entries = entries
+        table.live_blocks = None
+        table.head = 0
+        table.capacity = capacity
+        table.size = size
+        table.tombstones = tombstones
+        table.min_capacity = min_capacity
+        table.prime = prime
+        table.compact_ratio = compact_ratio
+        table.load_factor = load_factor
+        table.tombstone_ratio = tombstone_ratio
+        table.shrink_ratio = shrink_ratio
+        table.probing = kind()
+        table.hash_function = hash_kind(seed[:seed_length]) if hash_kind is SeededHash else hash_kind()
+        table.incremental = False
+        table.resizing = None
+        table.migrated = 0
+        if not mmap and not compact_indices:
+            table.indices = table.indices.tolist()
+        return table
+
+    def _positions(self, entries: list, reverse: bool, start: int, stop: int) -> range:
+        """
+        Returns the positions of the dense table that keys, values and items visit.
+        Without a window, every position from self.head on is visited. With one, the
+        positions of its first and last live entries are found through the LiveBlocks
+        counts of the dense table, built on the first windowed read after a delete and
+        kept up to date from then on, so the table itself is never rewritten by a read.
+
+        Time: O(1) without a window or deleted entries, else O(w + n / B + B) where
+              w = positions in the window, B = LiveBlocks.BLOCK, the n / B part in C;
+              O(n) in C to build the counts on the first windowed read
+        Space: O(1), or O(n / B) for the counts
+
+        :param entries: [list] Dense table, the key column of a ColumnarHashTable.
+        :param reverse: [bool] Visit positions from the end.
+        :param start: [int] Number of live entries to skip, as in itertools.islice.
+        :param stop: [int] Number of live entries at which to stop, None for all.
+        :return: [range] Positions to visit, some of which may hold deleted entries.
+        """
+        count = len(entries)
+        if start == 0 and stop is None:
+            return range(count - 1, self.head - 1, -1) if reverse else range(self.head, count)
+        if start < 0 or (stop is not None and stop < 0):
+            raise ValueError("start and stop must be None or non-negative")
+        stop = self.size if stop is None else min(stop, self.size)
+        start = min(start, stop)
+        if start == stop:
+            return range(0)
+        if count == self.size:
+            if reverse:
+                return range(count - 1 - start, count - 1 - stop, -1)
+            return range(start, stop)
+        if self.live_blocks is None or self.live_blocks.entries is not entries:
+            self.live_blocks = LiveBlocks(entries)
+        if reverse:
+            first, last = self.live_blocks.locate([self.size - 1 - start, self.size - stop])
+            return range(first, last - 1, -1)
+        first, last = self.live_blocks.locate([start, stop - 1])
+        return range(first, last + 1)
+
+    def keys(self, reverse: bool = False, start: int = 0,
+             stop: int = None) -> Generator[str, None, None]:
         """
         This functions generates all the keys in order of indices
         :param reverse: A bool if true will generate the keys in a reverse order
+        :param start: Number of keys to skip, as in itertools.islice
+        :param stop: Number of keys at which to stop, None for all
         :return: Generator containing the keys
         """
-        if not reverse:
-            for i in self.entries:
-                if i is not None:
-                    yield i.key
-        else:
-            for i in range(self.size - 1, -1, -1):
-                if self.entries[i] is not None:
-                    yield self.entries[i].key
+        positions = self._positions(self.entries, reverse, start, stop)
+        entries = self.entries
+        for i in positions:
+            if entries[i] is not None:
+                yield entries[i].key
 
-    def values(self, reverse: bool = False) -> Generator[T, None, None]:
+    def values(self, reverse: bool = False, start: int = 0,
+               stop: int = None) -> Generator[T, None, None]:
         """
         Makes a list of the values in the HashTable in order of indices
         :param reverse: if True will return the values in a Reversed order
+        :param start: Number of values to skip, as in itertools.islice
+        :param stop: Number of values at which to stop, None for all
         :return: Generator of the values
         """
-        if not reverse:
-            for i in self.entries:
-                if i is not None:
-                    yield i.value
-        else:
-            for i in range(self.size - 1, -1, -1):
-                if self.entries[i] is not None:
-                    yield self.entries[i].value
+        positions = self._positions(self.entries, reverse, start, stop)
+        entries = self.entries
+        for i in positions:
+            if entries[i] is not None:
+                yield entries[i].value
 
-    def items(self, reverse: bool = False) -> Generator[Tuple[str, T], None, None]:
+    def items(self, reverse: bool = False, start: int = 0,
+              stop: int = None) -> Generator[Tuple[str, T], None, None]:
         """
         Makes a list of the items in the HashTable in order of indices
         :param reverse: if True will return the items in a Reversed order
+        :param start: Number of items to skip, as in itertools.islice
+        :param stop: Number of items at which to stop, None for all
         :return: Generator of the items.
         """
-        if not reverse:
-            for i in self.entries:
-                if i is not None:
-                    yield tuple([i.key, i.value])
+        positions = self._positions(self.entries, reverse, start, stop)
+        entries = self.entries
+        for i in positions:
+            if entries[i] is not None:
+                yield tuple([entries[i].key, entries[i].value])
+
+    def _last_node(self) -> HashNode:
+        """
+        Returns the last live entry, first dropping deleted entries from the end of
+        the dense table. Each deleted entry is dropped once, so this is O(1) amortized.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :return: [HashNode] The last live entry.
+        """
+        entries = self.entries
+        while entries[-1] is None:
+            entries.pop()
+        if self.live_blocks is not None:
+            self.live_blocks.truncate(len(entries))
+        return entries[-1]
+
+    def popitem(self, last: bool = True) -> Tuple[str, T]:
+        """
+        Removes and returns the most recently inserted item, or the least recently
+        inserted one if last is False.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param last: [bool] Pop the newest item, else the oldest.
+        :return: [Tuple[str, T]] The removed (key, value). Raises KeyError if the table is empty.
+        """
+        if self.size == 0:
+            raise KeyError("popitem(): table is empty")
+        if last:
+            node = self._last_node()
         else:
-            for i in range(len(self.entries) - 1, -1, -1):
-                if self.entries[i] is not None:
-                    yield tuple([self.entries[i].key, self.entries[i].value])
+            while self._node(self.head) is None:
+                self.head += 1
+            node = self._node(self.head)
+        self._delete(node.key)
+        return node.key, node.value
 
     def clear(self) -> None:
         """
-        This functions clears the table of HashNodes completely
+        This functions clears the table of HashNodes completely,
+        reallocating indices at the starting capacity
         """
+        self.resizing = None
         self.entries = []
+        self.head = 0
         self.size = 0
-        for i in range(self.capacity):
-            self.indices[i] = self.FREE
+        self.tombstones = 0
+        self.capacity = self.min_capacity
+        self.indices = self._new_indices(self.capacity)
+        self.prime = self._largest_prime(self.capacity)
 
 
-class DiscordDestroyer:
+class ColumnarHashTable(HashTable):
     """
-    Implements a DiscordDestroyer post management system.
-    It will be far better than Discord, Destroying Discord in the long run.
-    This is only the beginning.
+    Implements a HashTable storing its dense entries as three parallel columns
+    (cached hashes, keys and values) instead of one HashNode per entry.
+    Inserts allocate no node objects, and keys()/values() read only the column they need.
+    Deleted entries are marked by None in entry_keys and entry_values.
 
-    Properties
-    - posts_by_id: Hashtable mapping id strings to post strings
-    - ids_by_user: Hashtable mapping user strings to list of Hashtable of posts from that user
-    - post_id_seed: Starting value for post id
+    Properties (in addition to those of HashTable, whose entries list stays empty)
+    - entry_hashes: [list] cached base hash of each entry
+    - entry_keys: [list] key of each entry, None if deleted
+    - entry_values: [list] value of each entry, None if deleted
     """
-    __slots__ = ["posts_by_id", "ids_by_user", "post_id_seed"]
+    __slots__ = ["entry_hashes", "entry_keys", "entry_values"]
 
-    def __init__(self):
+    def __init__(self, capacity: int = 8, compact_ratio: float = 0.75,
+                 load_factor: float = 0.5, tombstone_ratio: float = 0.25,
+                 compact_indices: bool = False, probing: ProbingStrategy = None,
+                 hash_function: HashFunction = None) -> None:
         """
-        Initializes DiscordDestroyer class.
-        DO NOT EDIT.
+        Initializes ColumnarHashTable, taking the same parameters as HashTable.
 
-        Time: O(1)
-        Space: O(1)
+        Time: O(c) where c = capacity
+        Space: O(c) where c = capacity
+        """
+        super().__init__(capacity, compact_ratio, load_factor, tombstone_ratio, compact_indices,
+                         probing, hash_function=hash_function)
+        self.entry_hashes: List[int] = []
+        self.entry_keys: List[str] = []
+        self.entry_values: List[T] = []
 
-        :return: None
+    def __str__(self) -> str:
         """
-        self.posts_by_id: HashTable = HashTable()
-        self.ids_by_user: HashTable = HashTable()
-        self.post_id_seed: int = 0
+        Represents the ColumnarHashTable as a string.
+
+        Time: O(c + n) where c = capacity and n = len(self.entry_keys)
+        Space: O(c + n) where c = capacity and n = len(self.entry_keys)
 
-    def generate_post_id(self, user: str, message: str) -> str:
+        :return: [str] String representation of the hashtable.
         """
-        Creates a unique post id for each post.
-        DO NOT EDIT.
+        representation = [f"Size: {self.size}\nCapacity: {self.capacity}\nIndices: ["]
+        for i in range(self.capacity):
+            action = "FREE" if self.indices[i] == self.FREE \
+                else "DELETED" if self.indices[i] == self.DELETED \
+                else f'{self.indices[i]}: {self._node(self.indices[i])}'
+            representation.append(f"[{i}]: " + action)
+        representation.append("]\nEntries: [")
+        for i in range(len(self.entry_keys)):
+            representation.append(f"[{i}]: {self._node(i)}")
+        representation.append("]")
+        return "\n".join(representation)
+
+    __repr__ = __str__
+
+    def _node(self, index: int) -> HashNode:
+        """
+        Builds a HashNode snapshot of the entry at the given position.
 
         Time: O(1)
         Space: O(1)
 
-        :return: [str] post id for the post.
+        :param index: [int] Position in the entry columns.
+        :return: [HashNode] Snapshot of the entry, None if it was deleted.
         """
-        post_id = hash(user + message + str(self.post_id_seed))
-        self.post_id_seed += 1
-        return str(post_id)
+        if self.entry_keys[index] is None:
+            return None
+        return HashNode(self.entry_keys[index], self.entry_values[index], self.entry_hashes[index])
 
-    ###############################################################################################
-    # IMPLEMENT BELOW
-    ###############################################################################################
+    def _hash(self, key: str, inserting: bool = False, hashed_value: int = None) -> int:
+        """
+        Returns the index in self.indices holding key, or where key would be inserted,
+        comparing against the hash and key columns.
 
-    def post(self, user: str, message: str) -> str:
+        :param key: [str] Key to probe for.
+        :param inserting: [bool] Stop at DELETED slots as well as FREE ones.
+        :param hashed_value: [int] Cached base hash of key, computed from key if not given.
+        :return: [int] Index in self.indices.
         """
-        This function creates a post in the "post_by_id" hashtable and updates the ids_by_user
-        hashtable and returns the random id it is assigned
-        :param user: a string that represents the user
-        :param message: represents the message that is going to be posted
-        :return: returns the random id assigned
+        if hashed_value is None:
+            hashed_value = self.hash_function(key)
+        num, step = self.probing.start(self, key, hashed_value)
+        increment = self.probing.increment
+        indices, hashes, keys = self.indices, self.entry_hashes, self.entry_keys
+        while True:
+            index = indices[num]
+            if index == self.FREE or (inserting and index == self.DELETED):
+                return num
+            if index >= 0 and hashes[index] == hashed_value and keys[index] == key:
+                return num
+            num = (num + step) % self.capacity
+            step += increment
+
+    def _find_slot(self, key: str, hashed_value: int) -> int:
         """
-        id = self.generate_post_id(user, message)
-        self.posts_by_id[str(user + ',' + id)] = message
+        Probes once for key against the hash and key columns, returning its slot
+        if present, otherwise the first FREE or DELETED slot on the probe sequence.
 
-        if user not in self.ids_by_user:
-            self.ids_by_user[user] = HashTable()
-        self.ids_by_user[user][id] = str(user + ',' + id)
+        :param key: [str] Key to probe for.
+        :param hashed_value: [int] Cached base hash of key.
+        :return: [int] Index in self.indices, holding a non-negative entry index iff key is present.
+        """
+        num, step = self.probing.start(self, key, hashed_value)
+        increment = self.probing.increment
+        indices, hashes, keys = self.indices, self.entry_hashes, self.entry_keys
+        reusable = -1
+        while True:
+            index = indices[num]
+            if index == self.FREE:
+                return num if reusable < 0 else reusable
+            if index == self.DELETED:
+                if reusable < 0:
+                    reusable = num
+            elif hashes[index] == hashed_value and keys[index] == key:
+                return num
+            num = (num + step) % self.capacity
+            step += increment
 
-        return str(user + ',' + id)
+    def _insert(self, key: str, value: T) -> None:
+        """
+        Inserts key with value, overwriting the value if key exists, without allocating a node.
 
-    def delete_post(self, user_post_id: str) -> bool:
+        :param key: [str] Key to insert.
+        :param value: [T] Value to associate with key.
         """
-        Removes the post from the post_by_id and ids_by_user
-        :param user_post_id: post id to remove
-        :return: bool of if the post was deleted or not
+        hashed_value = self.hash_function(key)
+        slot = self._find_slot(key, hashed_value)
+        if self.indices[slot] >= 0:
+            self.entry_values[self.indices[slot]] = value
+            return
+        if self.indices[slot] == self.DELETED:
+            self.tombstones -= 1
+        if self.compact_indices and len(self.entry_keys) >= 1 << (8 * self.indices.itemsize - 1):
+            self._widen_indices()
+        self.indices[slot] = len(self.entry_keys)
+        self.size += 1
+        self.entry_hashes.append(hashed_value)
+        self.entry_keys.append(key)
+        self.entry_values.append(value)
+        self._resize()
+
+    def _get(self, key: str) -> HashNode:
         """
-        if user_post_id not in self.posts_by_id:
-            return False
-        else:
-            del self.posts_by_id[user_post_id]
-            str1 = user_post_id.split(',')
-            del self.ids_by_user[str1[0]][str1[1]]
-            return True
+        Looks up key, returning a HashNode snapshot of its entry.
+        Changing the snapshot does not change the table.
 
-    def get_most_recent_posts(self, v: int) -> Generator[Tuple[str, str], None, None]:
+        :param key: [str] Key to look up.
+        :return: [HashNode] Snapshot of the entry, None if key is not present.
         """
-        Sends back a generator of all the v most recent posts
-        :param v: the number of posts to send back
-        :returns: generator of tuples with the most recent post
+        index = self.indices[self._hash(key)]
+        return self._node(index) if index >= 0 else None
+
+    def _delete(self, key: str) -> None:
         """
-        if v <= 0:
-            return None
-        elif self.posts_by_id.size == 1 and v == 1:
-            post = self.posts_by_id.entries[len(self.posts_by_id.entries)-1]
-            real_user = post.key.split(',')
-            yield tuple([real_user[0], post.value])
-        else:
-            for i in range(len(self.posts_by_id.entries)-1, len(self.posts_by_id.entries)-1-v, -1):
-                if self.posts_by_id is not None:
-                    post = self.posts_by_id.entries[i]
-                    real_user = post.key.split(',')[0]
-                    yield tuple([real_user, post.value])
+        Deletes key if present, leaving None in its key and value columns.
 
-    def get_posts_by_user(self, user: str) -> Generator[Tuple[str, str], None, None]:
+        :param key: [str] Key to delete.
         """
-        This function gets the posts by user
-        :param user: the user to get the posts from
-        :return: generator of tuples of posts.
+        slot = self._hash(key)
+        index = self.indices[slot]
+        if index < 0:
+            return
+        self.entry_keys[index] = None
+        self.entry_values[index] = None
+        if self.live_blocks is not None:
+            self.live_blocks.drop(index)
+        self.indices[slot] = self.DELETED
+        self.tombstones += 1
+        self.size -= 1
+        if not self._resize(True) and \
+                len(self.entry_keys) - self.size > self.compact_ratio * len(self.entry_keys):
+            self._compact()
+
+    def _compact(self) -> None:
         """
-        if user not in self.ids_by_user:
-            return None
-        for i in self.ids_by_user[user].entries:
-            yield tuple([user, self.posts_by_id[i.value]])
+        Drops deleted entries from every column, keeping insertion order,
+        and remaps self.indices in a single pass.
+
+        Time: O(c + n) where c = capacity and n = len(self.entry_keys)
+        Space: O(n) where n = len(self.entry_keys)
+        """
+        remap = [self.FREE] * len(self.entry_keys)
+        live = 0
+        for i, key in enumerate(self.entry_keys):
+            if key is not None:
+                remap[i] = live
+                live += 1
+        for slot in range(self.capacity):
+            if self.indices[slot] >= 0:
+                self.indices[slot] = remap[self.indices[slot]]
+        self._drop_deleted()
+
+    def _drop_deleted(self) -> None:
+        """
+        Filters deleted entries out of the three columns.
+
+        Time: O(n) where n = len(self.entry_keys)
+        Space: O(n) where n = len(self.entry_keys)
+        """
+        keys = self.entry_keys
+        self.entry_hashes = [h for h, k in zip(self.entry_hashes, keys) if k is not None]
+        self.entry_values = [v for v, k in zip(self.entry_values, keys) if k is not None]
+        self.entry_keys = [k for k in keys if k is not None]
+        self.head = 0
+
+    def _rehash(self, capacity: int) -> None:
+        """
+        Rebuilds self.indices at the given capacity from the hash column,
+        dropping DELETED markers and compacting the columns.
+
+        Time: O(c + n) where c = capacity and n = len(self.entry_keys)
+        Space: O(c + n) where c = capacity and n = len(self.entry_keys)
+
+        :param capacity: [int] Capacity of the rebuilt table.
+        """
+        self.capacity = capacity
+        self.indices = self._new_indices(capacity)
+        self.tombstones = 0
+        self.prime = self._largest_prime(capacity)
+        self._drop_deleted()
+        indices, probing = self.indices, self.probing
+        for i, hashed_value in enumerate(self.entry_hashes):
+            num, step = probing.start(self, self.entry_keys[i], hashed_value)
+            while indices[num] != self.FREE:
+                num = (num + step) % capacity
+                step += probing.increment
+            indices[num] = i
+
+    def __getitem__(self, key: str) -> T:
+        """
+        Looks up the value of key without building a HashNode.
+
+        :param key: [str] Key to look up.
+        :return: [T] Value associated to key, raises KeyError if key is not present.
+        """
+        index = self.indices[self._hash(key)]
+        if index < 0:
+            raise KeyError()
+        return self.entry_values[index]
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks whether key is present without building a HashNode.
+
+        :param key: [str] Key to look up.
+        :return: [bool] True if key is present, else False.
+        """
+        return self.indices[self._hash(key)] >= 0
+
+    def save(self, path: str) -> None:
+        """
+        Snapshots only support the HashTable layout, so this raises ValueError.
+
+        :param path: [str] File that would be written.
+        """
+        raise ValueError(f"{type(self).__name__} tables cannot be saved")
+
+    def _find_many(self, keys: Iterable[str]) -> List[int]:
+        """
+        Finds the entry index of every key, comparing against the hash and key columns.
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :return: [List[int]] Position in the columns of each key, -1 if not present.
+        """
+        keys = keys if isinstance(keys, list) else list(keys)
+        hashes = [self.hash_function(key) for key in keys]
+        starts, steps = self._probe_starts(keys, hashes)
+        indices, entry_hashes, entry_keys = self.indices, self.entry_hashes, self.entry_keys
+        capacity, increment, free = self.capacity, self.probing.increment, self.FREE
+        found = []
+        for key, hashed_value, num, step in zip(keys, hashes, starts, steps):
+            while True:
+                index = indices[num]
+                if index == free:
+                    found.append(-1)
+                    break
+                if index >= 0 and entry_hashes[index] == hashed_value and entry_keys[index] == key:
+                    found.append(index)
+                    break
+                num = (num + step) % capacity
+                step += increment
+        return found
+
+    def get_many(self, keys: Iterable[str], default: T = None) -> List[T]:
+        """
+        Looks up a batch of keys at once, reading values from the value column.
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :param default: [T] Value returned for keys that are not present.
+        :return: [List[T]] Value of each key, in the order of keys.
+        """
+        values = self.entry_values
+        return [values[index] if index >= 0 else default for index in self._find_many(keys)]
+
+    def keys(self, reverse: bool = False, start: int = 0,
+             stop: int = None) -> Generator[str, None, None]:
+        """
+        Generates the keys in insertion order, reading only the key column.
+
+        :param reverse: [bool] Generate in reverse insertion order.
+        :param start: [int] Number of keys to skip, as in itertools.islice.
+        :param stop: [int] Number of keys at which to stop, None for all.
+        :return: [Generator] Keys of the table.
+        """
+        if start == 0 and stop is None and self.head == 0:
+            for key in (reversed(self.entry_keys) if reverse else self.entry_keys):
+                if key is not None:
+                    yield key
+            return
+        positions = self._positions(self.entry_keys, reverse, start, stop)
+        keys = self.entry_keys
+        for i in positions:
+            if keys[i] is not None:
+                yield keys[i]
+
+    def values(self, reverse: bool = False, start: int = 0,
+               stop: int = None) -> Generator[T, None, None]:
+        """
+        Generates the values in insertion order, reading the key column only to skip deleted entries.
+
+        :param reverse: [bool] Generate in reverse insertion order.
+        :param start: [int] Number of values to skip, as in itertools.islice.
+        :param stop: [int] Number of values at which to stop, None for all.
+        :return: [Generator] Values of the table.
+        """
+        positions = self._positions(self.entry_keys, reverse, start, stop)
+        keys, values = self.entry_keys, self.entry_values
+        for i in positions:
+            if keys[i] is not None:
+                yield values[i]
+
+    def items(self, reverse: bool = False, start: int = 0,
+              stop: int = None) -> Generator[Tuple[str, T], None, None]:
+        """
+        Generates (key, value) tuples in insertion order.
+
+        :param reverse: [bool] Generate in reverse insertion order.
+        :param start: [int] Number of items to skip, as in itertools.islice.
+        :param stop: [int] Number of items at which to stop, None for all.
+        :return: [Generator] Items of the table.
+        """
+        positions = self._positions(self.entry_keys, reverse, start, stop)
+        keys, values = self.entry_keys, self.entry_values
+        for i in positions:
+            if keys[i] is not None:
+                yield keys[i], values[i]
+
+    def _last_node(self) -> HashNode:
+        """
+        Returns a snapshot of the last live entry, first dropping deleted entries
+        from the end of every column.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :return: [HashNode] Snapshot of the last live entry.
+        """
+        keys = self.entry_keys
+        while keys[-1] is None:
+            keys.pop()
+            self.entry_hashes.pop()
+            self.entry_values.pop()
+        if self.live_blocks is not None:
+            self.live_blocks.truncate(len(keys))
+        return self._node(len(keys) - 1)
+
+    def clear(self) -> None:
+        """
+        Clears the table, emptying every column.
+        """
+        super().clear()
+        self.entry_hashes = []
+        self.entry_keys = []
+        self.entry_values = []
+
+
+class RobinHoodHashTable(HashTable):
+    """
+    Implements a HashTable using Robin Hood hashing over linear probing.
+    On insert, an entry further from its home slot takes the slot of an entry closer
+    to its own, which keeps probe lengths, and so lookup latency, tightly bunched.
+    Deletion shifts the following entries of the cluster back one slot instead of
+    leaving a DELETED marker, so self.indices never holds tombstones.
+    Entries stay in the dense self.entries table, preserving insertion order.
+
+    Properties (in addition to those of HashTable)
+    - distances: [list] distances[i] = how far the entry at self.indices[i] sits from its home slot
+    """
+    __slots__ = ["distances"]
+
+    def __init__(self, capacity: int = 8, compact_ratio: float = 0.75,
+                 load_factor: float = 0.5, compact_indices: bool = False,
+                 hash_function: HashFunction = None) -> None:
+        """
+        Initializes RobinHoodHashTable. No tombstone_ratio or probing is taken,
+        as the table never holds tombstones and always probes linearly.
+
+        Time: O(c) where c = capacity
+        Space: O(c) where c = capacity
+
+        :param capacity: [int] Starting capacity of the hashtable.
+        :param compact_ratio: [float] Fraction of deleted entries that triggers compaction.
+        :param load_factor: [float] Fraction of capacity in live use that triggers growth.
+        :param compact_indices: [bool] Store indices in an array.array instead of a list.
+        :param hash_function: [HashFunction] Base hash of keys, PolynomialHash if not given.
+        """
+        # the tombstone_ratio is never reached, as the table never holds tombstones
+        super().__init__(capacity, compact_ratio, load_factor, (1 - load_factor) / 2, compact_indices,
+                         LinearProbing(), hash_function=hash_function)
+        self.distances: List[int] = [0] * capacity
+
+    def _hash(self, key: str, inserting: bool = False, hashed_value: int = None) -> int:
+        """
+        Returns the slot holding key, or -1 if key is not present. The probe stops as soon
+        as it passes an entry closer to its home than key would be, since Robin Hood
+        insertion would have placed key before it.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to probe for.
+        :param inserting: [bool] Unused, kept for the HashTable signature.
+        :param hashed_value: [int] Cached base hash of key, computed from key if not given.
+        :return: [int] Index in self.indices holding key, -1 if not present.
+        """
+        if hashed_value is None:
+            hashed_value = self.hash_function(key)
+        indices, distances, entries = self.indices, self.distances, self.entries
+        num = hashed_value % self.capacity
+        distance = 0
+        while True:
+            index = indices[num]
+            if index == self.FREE or distances[num] < distance:
+                return -1
+            node = entries[index]
+            if node.hash == hashed_value and node.key == key:
+                return num
+            num = (num + 1) % self.capacity
+            distance += 1
+
+    def _place(self, index: int, hashed_value: int) -> None:
+        """
+        Places an entry index into self.indices, displacing entries closer to their home slot.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param index: [int] Position of the entry in self.entries.
+        :param hashed_value: [int] Cached base hash of the entry's key.
+        """
+        indices, distances = self.indices, self.distances
+        num = hashed_value % self.capacity
+        distance = 0
+        while indices[num] != self.FREE:
+            if distances[num] < distance:
+                index, indices[num] = indices[num], index
+                distance, distances[num] = distances[num], distance
+            num = (num + 1) % self.capacity
+            distance += 1
+        indices[num] = index
+        distances[num] = distance
+
+    def _insert(self, key: str, value: T) -> None:
+        """
+        Inserts key with value, overwriting the value if key exists.
+
+        :param key: [str] Key to insert.
+        :param value: [T] Value to associate with key.
+        """
+        hashed_value = self.hash_function(key)
+        slot = self._hash(key, hashed_value=hashed_value)
+        if slot >= 0:
+            self.entries[self.indices[slot]].value = value
+            return
+        if self.compact_indices and len(self.entries) >= 1 << (8 * self.indices.itemsize - 1):
+            self._widen_indices()
+        self._place(len(self.entries), hashed_value)
+        self.entries.append(HashNode(key, value, hashed_value))
+        self.size += 1
+        self._resize()
+
+    def _get(self, key: str) -> HashNode:
+        """
+        Looks up the HashNode of key.
+
+        :param key: [str] Key to look up.
+        :return: [HashNode] The entry, None if key is not present.
+        """
+        slot = self._hash(key)
+        return self.entries[self.indices[slot]] if slot >= 0 else None
+
+    def _delete(self, key: str) -> None:
+        """
+        Deletes key if present, shifting the rest of its cluster back one slot.
+
+        :param key: [str] Key to delete.
+        """
+        slot = self._hash(key)
+        if slot < 0:
+            return
+        self.entries[self.indices[slot]] = None
+        if self.live_blocks is not None:
+            self.live_blocks.drop(self.indices[slot])
+        self.size -= 1
+        indices, distances = self.indices, self.distances
+        following = (slot + 1) % self.capacity
+        while indices[following] != self.FREE and distances[following] > 0:
+            indices[slot] = indices[following]
+            distances[slot] = distances[following] - 1
+            slot = following
+            following = (following + 1) % self.capacity
+        indices[slot] = self.FREE
+        distances[slot] = 0
+        if not self._resize(True) and \
+                len(self.entries) - self.size > self.compact_ratio * len(self.entries):
+            self._compact()
+
+    def _rehash(self, capacity: int) -> None:
+        """
+        Rebuilds self.indices and self.distances at the given capacity from
+        the cached hashes of live entries, compacting self.entries.
+
+        Time: O(c + n) where c = capacity and n = len(self.entries)
+        Space: O(c + n) where c = capacity and n = len(self.entries)
+
+        :param capacity: [int] Capacity of the rebuilt table.
+        """
+        self.capacity = capacity
+        self.indices = self._new_indices(capacity)
+        self.distances = [0] * capacity
+        self.prime = self._largest_prime(capacity)
+        self.entries = [node for node in self.entries if node is not None]
+        self.head = 0
+        for i, node in enumerate(self.entries):
+            self._place(i, node.hash)
+
+    def save(self, path: str) -> None:
+        """
+        Snapshots only support the HashTable layout, so this raises ValueError.
+
+        :param path: [str] File that would be written.
+        """
+        raise ValueError(f"{type(self).__name__} tables cannot be saved")
+
+    def clear(self) -> None:
+        """
+        Clears the table of HashNodes completely.
+        """
+        super().clear()
+        self.distances = [0] * self.capacity
+
+
+class BoundedHashTable(HashTable):
+    """
+    Implements a HashTable holding at most maxsize entries, for use as a cache.
+    Inserting a new key into a full table first evicts one entry, chosen by policy:
+    - "lru": the least recently used entry. A read moves its entry to the end of
+             self.entries, so insertion order doubles as recency order and the victim
+             is always the first live entry.
+    - "lfu": the least frequently used entry, ties going to the least recently used one.
+             Victims come from a heap of (count, tick, key) that is updated lazily:
+             every use pushes a new item and stale items are skipped when popped.
+    - "ttl": the entry written longest ago, which is also the next one to expire.
+    With a ttl, entries also expire ttl seconds after their last write. Expired entries
+    are dropped when they are next looked up, or all at once by expire().
+    Evictions and expirations delete entries like any other delete, so the tombstone
+    rehash and compaction of HashTable reclaim their slots and dead entries.
+
+    Properties (in addition to those of HashTable)
+    - maxsize: [int] largest number of entries held
+    - policy: [str] eviction policy, "lru", "lfu" or "ttl"
+    - ttl: [float] seconds an entry lives after its last write, None for no expiry
+    - clock: [Callable] returns the current time in seconds
+    - heap: [list] lazy heap of (count, tick, key), used by the "lfu" policy
+    - ticks: [int] number of uses so far, ordering uses within the heap
+    - hits: [int] lookups that found their key
+    - misses: [int] lookups that did not find their key, or found it expired
+    - evictions: [int] entries evicted to make room
+    - expirations: [int] entries dropped because they expired
+    """
+    __slots__ = ["maxsize", "policy", "ttl", "clock", "heap", "ticks", "hits", "misses",
+                 "evictions", "expirations"]
+
+    POLICIES = ("lru", "lfu", "ttl")
+
+    def __init__(self, maxsize: int, policy: str = "lru", ttl: float = None, capacity: int = 8,
+                 compact_ratio: float = 0.75, load_factor: float = 0.5,
+                 tombstone_ratio: float = 0.25, hash_function: HashFunction = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Initializes BoundedHashTable.
+
+        Time: O(c) where c = capacity
+        Space: O(c) where c = capacity
+
+        :param maxsize: [int] Largest number of entries held, at least 1.
+        :param policy: [str] Eviction policy, "lru", "lfu" or "ttl".
+        :param ttl: [float] Seconds an entry lives after its last write, required by "ttl".
+        :param capacity: [int] Starting capacity of the hashtable.
+        :param compact_ratio: [float] Fraction of deleted entries that triggers compaction.
+        :param load_factor: [float] Fraction of capacity in live use that triggers growth.
+        :param tombstone_ratio: [float] Fraction of capacity marked DELETED that triggers a rehash.
+        :param hash_function: [HashFunction] Base hash of keys, PolynomialHash if not given.
+        :param clock: [Callable] Source of the current time, time.monotonic if not given.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(self.POLICIES)}")
+        if policy == "ttl" and ttl is None:
+            raise ValueError("the ttl policy requires a ttl")
+        super().__init__(capacity, compact_ratio, load_factor, tombstone_ratio,
+                         hash_function=hash_function)
+        self.maxsize: int = maxsize
+        self.policy: str = policy
+        self.ttl: float = ttl
+        self.clock: Callable[[], float] = clock
+        self.heap: List[Tuple[int, int, str]] = []
+        self.ticks: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def _find(self, key: str) -> Tuple[int, CacheNode]:
+        """
+        Looks key up without counting or using it, dropping it if it expired.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to look up.
+        :return: [Tuple[int, CacheNode]] Slot and entry of key, (-1, None) if not present.
+        """
+        slot = self._hash(key)
+        index = self.indices[slot]
+        if index < 0:
+            return -1, None
+        node = self.entries[index]
+        if self.ttl is not None and node.expires <= self.clock():
+            self._delete(key)
+            self.expirations += 1
+            return -1, None
+        return slot, node
+
+    def _append(self, slot: int, node: CacheNode) -> None:
+        """
+        Appends an entry to self.entries and points slot at it.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param slot: [int] Slot of self.indices referring to the entry.
+        :param node: [CacheNode] Entry to append.
+        """
+        if self.compact_indices and len(self.entries) >= 1 << (8 * self.indices.itemsize - 1):
+            self._widen_indices()
+        self.indices[slot] = len(self.entries)
+        self.entries.append(node)
+
+    def _use(self, slot: int, node: CacheNode, write: bool) -> None:
+        """
+        Records a use of an entry for the eviction policy.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param slot: [int] Slot of self.indices referring to the entry.
+        :param node: [CacheNode] Entry used.
+        :param write: [bool] The use was a write, which also restarts the entry's ttl.
+        """
+        self.ticks += 1
+        node.count += 1
+        node.tick = self.ticks
+        if write and self.ttl is not None:
+            node.expires = self.clock() + self.ttl
+        if self.policy == "lfu":
+            self._push(node)
+        elif write or self.policy == "lru":
+            # move the entry to the end of self.entries, leaving a dead entry behind
+            index = self.indices[slot]
+            if index != len(self.entries) - 1:
+                self.entries[index] = None
+                if self.live_blocks is not None:
+                    self.live_blocks.drop(index)
+                self._append(slot, node)
+                if len(self.entries) - self.size > self.compact_ratio * len(self.entries):
+                    self._compact()
+
+    def _push(self, node: CacheNode) -> None:
+        """
+        Pushes the current (count, tick, key) of an entry onto the lfu heap,
+        rebuilding the heap from live entries once stale items make up most of it.
+
+        Time: O(log(n))*
+        Space: O(1)*
+
+        :param node: [CacheNode] Entry to push.
+        """
+        heappush(self.heap, (node.count, node.tick, node.key))
+        if len(self.heap) > 2 * self.size + 32:
+            self.heap = [(node.count, node.tick, node.key) for node in self.entries if node is not None]
+            heapify(self.heap)
+
+    def _evict(self) -> None:
+        """
+        Evicts one entry according to the eviction policy.
+
+        Time: O(1)* for "lru" and "ttl", O(log(n))* for "lfu"
+        Space: O(1)
+        """
+        if self.policy == "lfu":
+            while True:
+                count, tick, key = heappop(self.heap)
+                index = self.indices[self._hash(key)]
+                if index >= 0 and self.entries[index].tick == tick:
+                    break
+        else:
+            while self.entries[self.head] is None:
+                self.head += 1
+            key = self.entries[self.head].key
+        self._delete(key)
+        self.evictions += 1
+
+    def _insert(self, key: str, value: T) -> None:
+        """
+        Sets the value of key, first evicting an entry if key is new and the table is full.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param key: [str] Key to set.
+        :param value: [T] Value to associate with key.
+        """
+        hashed_value = self.hash_function(key)
+        slot = self._find_slot(key, hashed_value)
+        index = self.indices[slot]
+        if index >= 0:
+            node = self.entries[index]
+            node.value = value
+            self._use(slot, node, True)
+            return
+        if self.size >= self.maxsize:
+            self._evict()
+            slot = self._find_slot(key, hashed_value)
+        if self.indices[slot] == self.DELETED:
+            self.tombstones -= 1
+        self.ticks += 1
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        node = CacheNode(key, value, hashed_value, self.ticks, expires)
+        self._append(slot, node)
+        self.size += 1
+        if self.policy == "lfu":
+            self._push(node)
+        self._resize()
+
+    def _get(self, key: str) -> CacheNode:
+        """
+        Looks key up, counting a hit or a miss and recording the use.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param key: [str] Key to look up.
+        :return: [CacheNode] The entry, None if key is not present or expired.
+        """
+        slot, node = self._find(key)
+        if node is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._use(slot, node, False)
+        return node
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Deletes key without counting a lookup.
+
+        :param key: [str] Key to delete. Raises KeyError if it is not present.
+        """
+        if self._find(key)[1] is None:
+            raise KeyError(key)
+        self._delete(key)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks whether key is present, without counting a lookup or recording a use.
+
+        :param key: [str] Key to look for.
+        :return: [bool] True if key is present and not expired.
+        """
+        return self._find(key)[1] is not None
+
+    def get(self, key: str, default: T = None) -> T:
+        """
+        Returns the value of key, or default if it is not present.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param key: [str] Key to look up.
+        :param default: [T] Value returned if key is not present.
+        :return: [T] Value of key, or default.
+        """
+        node = self._get(key)
+        return default if node is None else node.value
+
+    def get_many(self, keys: Iterable[str], default: T = None) -> List[T]:
+        """
+        Looks up a batch of keys, counting and recording each lookup like get.
+
+        Time: O(m)* where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [Iterable[str]] Keys to look up.
+        :param default: [T] Value returned for keys that are not present.
+        :return: [List[T]] Value of each key, in the order of keys.
+        """
+        return [self.get(key, default) for key in keys]
+
+    def contains_many(self, keys: Iterable[str]) -> List[bool]:
+        """
+        Checks a batch of keys like __contains__.
+
+        Time: O(m)* where m = len(keys)
+        Space: O(m) where m = len(keys)
+
+        :param keys: [Iterable[str]] Keys to look for.
+        :return: [List[bool]] Whether each key is present, in the order of keys.
+        """
+        return [key in self for key in keys]
+
+    def expire(self) -> int:
+        """
+        Drops every expired entry at once.
+
+        Time: O(n) where n = len(self.entries)
+        Space: O(n) where n = len(self.entries)
+
+        :return: [int] Number of entries dropped.
+        """
+        if self.ttl is None:
+            return 0
+        now = self.clock()
+        expired = [node.key for node in self.entries if node is not None and node.expires <= now]
+        for key in expired:
+            self._delete(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def _reserve(self, count: int) -> None:
+        """
+        Grows the table once so that the keys about to be inserted fit below the load
+        factor, counting at most maxsize of them since the rest only evict.
+
+        :param count: [int] Number of keys about to be inserted.
+        """
+        super()._reserve(max(min(count, self.maxsize - self.size), 0))
+
+    def save(self, path: str) -> None:
+        """
+        Snapshots only support the HashTable layout, so this raises ValueError.
+
+        :param path: [str] File that would be written.
+        """
+        raise ValueError(f"{type(self).__name__} tables cannot be saved")
+
+    def clear(self) -> None:
+        """
+        Clears the table, keeping the counters.
+        """
+        super().clear()
+        self.heap = []
+
+
+class ConcurrentHashTable:
+    """
+    Implements a thread-safe hashtable striped across independent HashTable segments,
+    each guarded by its own lock, so threads working on different segments never wait
+    on each other and each segment grows, shrinks and compacts on its own.
+    A key's segment is chosen with the built-in hash(), which is independent of the
+    polynomial hash the segments probe with, so it does not skew slots within a segment.
+    Iteration and len() lock one segment at a time, so they are not atomic across segments;
+    iteration order is by segment, then by insertion within the segment.
+
+    Properties
+    - segments: [list] the HashTable segments
+    - locks: [list] locks[i] guards segments[i]
+    """
+    __slots__ = ["segments", "locks"]
+
+    def __init__(self, segments: int = 16, capacity: int = 8, table_type: type = HashTable) -> None:
+        """
+        Initializes ConcurrentHashTable.
+
+        Time: O(s * c) where s = segments and c = capacity
+        Space: O(s * c) where s = segments and c = capacity
+
+        :param segments: [int] Number of independently locked segments.
+        :param capacity: [int] Starting capacity of each segment.
+        :param table_type: [type] HashTable class used for the segments.
+        """
+        self.segments: List[HashTable] = [table_type(capacity) for _ in range(segments)]
+        self.locks: List[threading.Lock] = [threading.Lock() for _ in range(segments)]
+
+    def _segment(self, key: str) -> int:
+        """
+        Chooses the segment holding key.
+
+        Time: O(1)
+        Space: O(1)
+
+        :param key: [str] Key to place.
+        :return: [int] Index of the segment.
+        """
+        return hash(key) % len(self.segments)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of elements, summed one segment at a time.
+
+        Time: O(s) where s = number of segments
+        Space: O(1)
+
+        :return: [int] Number of elements.
+        """
+        total = 0
+        for segment, lock in zip(self.segments, self.locks):
+            with lock:
+                total += len(segment)
+        return total
+
+    def __setitem__(self, key: str, value: T) -> None:
+        """
+        Sets the value of key.
+
+        :param key: [str] Key to set.
+        :param value: [T] Value to associate with key.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            self.segments[i][key] = value
+
+    def __getitem__(self, key: str) -> T:
+        """
+        Looks up the value of key.
+
+        :param key: [str] Key to look up.
+        :return: [T] Value of key, raises KeyError if key is not present.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            return self.segments[i][key]
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Deletes key.
+
+        :param key: [str] Key to delete, raises KeyError if key is not present.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            del self.segments[i][key]
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks whether key is present.
+
+        :param key: [str] Key to look up.
+        :return: [bool] True if key is present, else False.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            return key in self.segments[i]
+
+    def get(self, key: str, default: T = None) -> T:
+        """
+        Looks up the value of key, returning default if it is not present.
+
+        :param key: [str] Key to look up.
+        :param default: [T] Value returned if key is not present.
+        :return: [T] Value of key, or default.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            node = self.segments[i]._get(key)
+            return default if node is None else node.value
+
+    def setdefault(self, key: str, default: T = None) -> T:
+        """
+        Atomically returns the value of key, first inserting default if it is not present.
+
+        :param key: [str] Key to look up.
+        :param default: [T] Value inserted if key is not present.
+        :return: [T] Value of key after the call.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            return self.segments[i].setdefault(key, default)
+
+    def pop(self, key: str, *default: T) -> T:
+        """
+        Atomically removes key and returns its value.
+
+        :param key: [str] Key to remove.
+        :param default: [T] Optional value returned if key is not present.
+        :return: [T] Value key had, or default. Raises KeyError if key is not present and no default is given.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            return self.segments[i].pop(key, *default)
+
+    def compare_and_set(self, key: str, expected: T, value: T) -> bool:
+        """
+        Atomically sets key to value if key is present and its value equals expected.
+
+        :param key: [str] Key to update.
+        :param expected: [T] Value key must currently hold.
+        :param value: [T] New value of key.
+        :return: [bool] True if key was updated, else False.
+        """
+        i = self._segment(key)
+        with self.locks[i]:
+            node = self.segments[i]._get(key)
+            if node is None or node.value != expected:
+                return False
+            self.segments[i][key] = value
+            return True
+
+    def update(self, pairs: List[Tuple[str, T]]) -> None:
+        """
+        Sets every (key, value) pair, grouping the pairs by segment so each
+        segment is locked once and loaded with one bulk update.
+
+        :param pairs: [List[Tuple[str, T]]] Pairs to set.
+        """
+        groups = [[] for _ in self.segments]
+        for pair in pairs:
+            groups[self._segment(pair[0])].append(pair)
+        for segment, lock, group in zip(self.segments, self.locks, groups):
+            if group:
+                with lock:
+                    segment.update(group)
+
+    def items(self) -> Generator[Tuple[str, T], None, None]:
+        """
+        Generates (key, value) tuples, copying out one segment at a time under its lock.
+
+        :return: [Generator] Items of the table.
+        """
+        for segment, lock in zip(self.segments, self.locks):
+            with lock:
+                batch = list(segment.items())
+            yield from batch
+
+    def keys(self) -> Generator[str, None, None]:
+        """
+        Generates the keys, one segment at a time.
+
+        :return: [Generator] Keys of the table.
+        """
+        for key, _ in self.items():
+            yield key
+
+    def values(self) -> Generator[T, None, None]:
+        """
+        Generates the values, one segment at a time.
+
+        :return: [Generator] Values of the table.
+        """
+        for _, value in self.items():
+            yield value
+
+
+class PostRecord:
+    """
+    Implements one post of a DiscordDestroyer, linked into a list of live posts
+    ordered from oldest to newest.
+
+    Properties
+    - user: [str] author of the post, the interned copy kept as key of ids_by_user
+    - id: [int] post id
+    - message: [str] body of the post
+    - prev: [PostRecord] next older live post, None for the oldest
+    - next: [PostRecord] next newer live post, None for the newest
+    """
+    __slots__ = ["user", "id", "message", "prev", "next"]
+
+    def __init__(self, user: str, id: int, message: str, prev: "PostRecord") -> None:
+        """
+        Constructs a post record, linked after prev.
+
+        :param user: [str] author of the post.
+        :param id: [int] post id.
+        :param message: [str] body of the post.
+        :param prev: [PostRecord] newest live post so far, None if there is none.
+        """
+        self.user: str = user
+        self.id: int = id
+        self.message: str = message
+        self.prev: PostRecord = prev
+        self.next: PostRecord = None
+
+
+class UserPost(tuple):
+    """
+    Implements a (user, message) tuple that also carries the id of its post,
+    so that it can serve as the cursor of the next page of get_posts_by_user.
+    It compares equal to the plain (user, message) tuple.
+
+    Properties
+    - post_id: [str] composite id of the post, as returned by DiscordDestroyer.post
+    """
+
+    def __new__(cls, user: str, message: str, post_id: str) -> "UserPost":
+        """
+        Builds the tuple.
+
+        :param user: [str] author of the post.
+        :param message: [str] body of the post.
+        :param post_id: [str] composite id of the post.
+        """
+        post = tuple.__new__(cls, (user, message))
+        post.post_id = post_id
+        return post
+
+    def __getnewargs__(self) -> Tuple[str, str, str]:
+        """
+        Arguments __new__ is called with when the tuple is unpickled.
+
+        :return: [Tuple[str, str, str]] user, message and post id.
+        """
+        return self[0], self[1], self.post_id
+
+
+class PostingList:
+    """
+    Implements the posting list of one token of a PostIndex: the increasing ids of the
+    posts containing the token, stored as varint-encoded gaps between consecutive ids.
+    The ids are split into blocks of BLOCK ids that each keep their first id in full, so
+    the list can be read from its newest block back without decoding the older ones.
+
+    Properties
+    - blocks: [List[bytearray]] varint gaps between the consecutive ids of each block
+    - firsts: [List[int]] first id of each block
+    - sizes: [List[int]] number of ids in each block
+    - last: [int] largest id in the list, 0 if it is empty
+    - count: [int] number of ids in the list
+    - dead: [int] number of ids in the list whose post was deleted since
+    """
+    __slots__ = ["blocks", "firsts", "sizes", "last", "count", "dead"]
+    BLOCK = 128
+
+    def __init__(self, ids: Iterable[int] = ()) -> None:
+        """
+        Constructs a posting list.
+
+        :param ids: [Iterable[int]] Increasing ids to start the list with.
+        """
+        self.blocks: List[bytearray] = []
+        self.firsts: List[int] = []
+        self.sizes: List[int] = []
+        self.last: int = 0
+        self.count: int = 0
+        self.dead: int = 0
+        for id in ids:
+            self.append(id)
+
+    def __len__(self) -> int:
+        """
+        Getter for the number of ids in the list, including those of deleted posts.
+
+        :return: [int] Number of ids.
+        """
+        return self.count
+
+    def __iter__(self) -> Generator[int, None, None]:
+        """
+        Generates the ids from oldest to newest.
+
+        :return: [Generator] Ids of the list.
+        """
+        for block in range(len(self.blocks)):
+            yield from self._decode(block)
+
+    def append(self, id: int) -> None:
+        """
+        Appends an id larger than every id in the list.
+
+        Time: O(1)
+        Space: O(1)*
+
+        :param id: [int] Id to append, raises ValueError if it is not larger than last.
+        """
+        if id <= self.last:
+            raise ValueError(f"posting list ids must increase, {id} follows {self.last}")
+        if not self.sizes or self.sizes[-1] == self.BLOCK:
+            self.blocks.append(bytearray())
+            self.firsts.append(id)
+            self.sizes.append(1)
+        else:
+            block, gap = self.blocks[-1], id - self.last
+            while gap >= 0x80:
+                block.append(gap & 0x7F | 0x80)
+                gap >>= 7
+            block.append(gap)
+            self.sizes[-1] += 1
+        self.last = id
+        self.count += 1
+
+    def _decode(self, block: int) -> List[int]:
+        """
+        Decodes the ids of one block.
+
+        Time: O(BLOCK)
+        Space: O(BLOCK)
+
+        :param block: [int] Index of the block.
+        :return: [List[int]] Ids of the block, oldest first.
+        """
+        id = self.firsts[block]
+        ids, gap, shift = [id], 0, 0
+        for byte in self.blocks[block]:
+            gap |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                id += gap
+                ids.append(id)
+                gap = shift = 0
+        return ids
+
+    def newest_first(self) -> Generator[int, None, None]:
+        """
+        Generates the ids from newest to oldest, decoding one block at a time.
+
+        :return: [Generator] Ids of the list, newest first.
+        """
+        for block in range(len(self.blocks) - 1, -1, -1):
+            yield from reversed(self._decode(block))
+
+
+class PostIndex:
+    """
+    Implements a full-text inverted index of the posts of a DiscordDestroyer.
+    Messages are split into lowercase word tokens, and each token maps to the
+    PostingList of the posts containing it. Deleting a post only counts it as dead in
+    the lists of its tokens; a list is rebuilt from its live ids once more than half of
+    them are dead, so deletes cost O(1) amortized per token and dead ids never make up
+    more than half of a list.
+
+    Properties
+    - tokens: Hashtable mapping token strings to PostingLists
+    - records: Hashtable mapping the integer ids of live posts to PostRecords
+    """
+    __slots__ = ["tokens", "records"]
+    TOKEN = re.compile(r"\w+")
+
+    def __init__(self) -> None:
+        """
+        Constructs an empty index.
+        """
+        self.tokens: HashTable = HashTable(hash_function=BuiltinHash())
+        self.records: HashTable = HashTable(hash_function=BuiltinHash())
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Splits text into its distinct lowercase word tokens.
+
+        Time: O(t log t) where t = number of tokens in text
+        Space: O(t)
+
+        :param text: [str] Text to split.
+        :return: [List[str]] Distinct tokens, sorted.
+        """
+        tokens = sorted(PostIndex.TOKEN.findall(text.lower()))
+        return [token for i, token in enumerate(tokens) if i == 0 or token != tokens[i - 1]]
+
+    def add(self, record: PostRecord) -> None:
+        """
+        Indexes a new post. Its id must be larger than the id of every indexed post.
+
+        Time: O(t)* where t = number of tokens in the message
+        Space: O(t)*
+
+        :param record: [PostRecord] Post to index.
+        """
+        self.records[record.id] = record
+        for token in self.tokenize(record.message):
+            node = self.tokens._get(token)
+            if node is None:
+                self.tokens[token] = PostingList([record.id])
+            else:
+                node.value.append(record.id)
+
+    def remove(self, record: PostRecord) -> None:
+        """
+        Removes a post from the index.
+
+        Time: O(t)* where t = number of tokens in the message
+        Space: O(1)*
+
+        :param record: [PostRecord] Post to remove.
+        """
+        del self.records[record.id]
+        for token in self.tokenize(record.message):
+            postings = self.tokens[token]
+            postings.dead += 1
+            if postings.dead * 2 > postings.count:
+                live = [id for id in postings if self.records._get(id) is not None]
+                if live:
+                    self.tokens[token] = PostingList(live)
+                else:
+                    del self.tokens[token]
+
+    def search(self, query: str, mode: str = "and", limit: int = None) -> Generator[PostRecord, None, None]:
+        """
+        Generates the live posts matching a query, newest first. With mode "and" a post
+        must contain every token of the query, walking the posting lists down together
+        from their newest ids and driven by the shortest one; with mode "or" it must
+        contain any of them, merging the lists. Only as many ids are decoded as it takes
+        to find limit posts, so the cost depends on the posting lists of the query, not on
+        the total number of posts.
+
+        Time: O(l) where l = total length of the posting lists of the query tokens
+        Space: O(q) where q = number of query tokens
+
+        :param query: [str] Text whose tokens are searched for.
+        :param mode: [str] "and" or "or", checked right away rather than on first use.
+        :param limit: [int] Largest number of posts to generate, None for all.
+        :return: [Generator] PostRecords of the matching posts, newest first.
+        """
+        if mode not in ("and", "or"):
+            raise ValueError(f"mode must be 'and' or 'or', not {mode!r}")
+        return self._search(query, mode, limit)
+
+    def _search(self, query: str, mode: str, limit: int) -> Generator[PostRecord, None, None]:
+        """
+        Generates the live posts matching a query for search, once mode is checked.
+        """
+        lists = []
+        for token in self.tokenize(query):
+            node = self.tokens._get(token)
+            if node is not None:
+                lists.append(node.value)
+            elif mode == "and":
+                return
+        if not lists:
+            return
+        if mode == "and":
+            ids = self._intersect(lists)
+        else:
+            ids = merge(*[postings.newest_first() for postings in lists], reverse=True)
+        previous = 0
+        for id in ids:
+            if limit is not None and limit <= 0:
+                return
+            if id == previous:
+                continue
+            previous = id
+            node = self.records._get(id)
+            if node is not None:
+                yield node.value
+                if limit is not None:
+                    limit -= 1
+
+    @staticmethod
+    def _intersect(lists: List[PostingList]) -> Generator[int, None, None]:
+        """
+        Generates the ids found in every posting list, newest first.
+
+        Time: O(l) where l = total length of the lists
+        Space: O(k) where k = number of lists
+
+        :param lists: [List[PostingList]] Lists to intersect.
+        :return: [Generator] Common ids, newest first.
+        """
+        lists = sorted(lists, key=len)
+        others = [postings.newest_first() for postings in lists[1:]]
+        heads = [next(other, 0) for other in others]
+        for id in lists[0].newest_first():
+            for i, other in enumerate(others):
+                head = heads[i]
+                while head > id:
+                    head = next(other, 0)
+                heads[i] = head
+                if head == 0:
+                    return
+                if head != id:
+                    break
+            else:
+                yield id
+
+
+class DiscordDestroyer:
+    """
+    Implements a DiscordDestroyer post management system.
+    It will be far better than Discord, Destroying Discord in the long run.
+    This is only the beginning.
+
+    Given a log path, every post and delete is also appended to a write-ahead log of
+    JSON lines, written and fsynced group_commit records at a time; a post_many batch is
+    a single record. A queued record waits at most flush_delay seconds, after which a
+    timer thread writes the unfinished group, so a crash loses at most the records of
+    the last flush_delay seconds. Without a flush_delay, queued records wait for the
+    group to fill, and callers must call flush() (or close()) to make them durable.
+    Starting on an existing log replays the latest snapshot and then the log. Every checkpoint_every records, checkpoint()
+    writes a new snapshot and empties the log, which keeps replay time bounded.
+
+    Post ids are increasing integers. Internally posts are keyed by the integer alone,
+    hashed with the built-in hash() which maps them to themselves, and each username is
+    stored once: ids_by_user doubles as the symbol table, and every PostRecord refers to
+    the copy of the username kept as its key. The "user,id" strings the API deals in
+    are only built and parsed at the API boundary.
+
+    Given index=True, a PostIndex of the words of every message is kept up to date by
+    post, post_many and delete_post, and search finds posts by their words.
+
+    Properties
+    - posts_by_id: Hashtable mapping integer post ids to post strings
+    - ids_by_user: Hashtable mapping user strings to a Hashtable mapping the integer ids of
+                   their posts to PostRecords
+    - post_id_seed: Last post id handed out
+    - newest: [PostRecord] most recent live post, None if there is none; following prev
+                           from it walks the live posts from newest to oldest
+    - log_path: [str] path of the write-ahead log, None without one;
+                      the snapshot is kept at log_path + ".snapshot"
+    - log: [file] the open write-ahead log, None without one
+    - pending: [list] encoded records not written to the log yet
+    - group_commit: [int] number of records written and fsynced together
+    - checkpoint_every: [int] number of records logged between checkpoints, None to never checkpoint
+    - logged: [int] number of records logged since the last checkpoint
+    - flush_delay: [float] longest time in seconds a record stays queued, None for no limit
+    - timer: [threading.Timer] pending flush of the queued records, None if there is none
+    - lock: [threading.RLock] guards the queue and the log against the timer thread
+    - index: [PostIndex] full-text index of the live posts, None without one
+    """
+    __slots__ = ["posts_by_id", "ids_by_user", "post_id_seed", "newest", "log_path", "log",
+                 "pending", "group_commit", "checkpoint_every", "logged", "flush_delay", "timer",
+                 "lock", "index"]
+
+    def __init__(self, log_path: str = None, group_commit: int = 64,
+                 checkpoint_every: int = 100000, index: bool = False,
+                 flush_delay: float = 0.1) -> None:
+        """
+        Initializes DiscordDestroyer class, replaying the snapshot and log at log_path if given.
+
+        Time: O(1) without a log, else O(r) where r = number of records replayed
+        Space: O(1) without a log, else O(r)
+
+        :param log_path: [str] Write-ahead log to replay and append to, None to keep posts in memory only.
+        :param group_commit: [int] Number of records written and fsynced together.
+        :param checkpoint_every: [int] Number of records between checkpoints, None to never checkpoint.
+        :param index: [bool] Whether to keep a full-text index of the posts for search.
+        :param flush_delay: [float] Longest time in seconds a record waits in the queue before
+                            it is written, None to only write full groups and on flush().
+        :return: None
+        """
+        self.posts_by_id: HashTable = HashTable(hash_function=BuiltinHash())
+        self.ids_by_user: HashTable = HashTable()
+        self.post_id_seed: int = 0
+        self.newest: PostRecord = None
+        self.log_path: str = log_path
+        self.log = None
+        self.pending: List[str] = []
+        self.group_commit: int = group_commit
+        self.checkpoint_every: int = checkpoint_every
+        self.logged: int = 0
+        self.flush_delay: float = flush_delay
+        self.timer: threading.Timer = None
+        self.lock: threading.RLock = threading.RLock()
+        self.index: PostIndex = PostIndex() if index else None
+        if log_path is not None:
+            self._replay()
+            self.log = open(log_path, "a", encoding="utf-8", newline="\n")
+
+    def generate_post_id(self, user: str, message: str) -> int:
+        """
+        Creates a unique post id for each post, counting up from 1.
+
+        Time: O(1)
+        Space: O(1)
+
+        :return: [int] post id for the post.
+        """
+        self.post_id_seed += 1
+        return self.post_id_seed
+
+    ###############################################################################################
+    # IMPLEMENT BELOW
+    ###############################################################################################
+
+    def post(self, user: str, message: str) -> str:
+        """
+        This function creates a post in the "post_by_id" hashtable and updates the ids_by_user
+        hashtable and returns the id it is assigned, the next one in sequence
+        :param user: a string that represents the user
+        :param message: represents the message that is going to be posted
+        :return: returns the id assigned, as "user,id"
+        """
+        id = self.generate_post_id(user, message)
+        self._add_post(user, id, message)
+        if self.log is not None:
+            self._append_log({"op": "post", "user": user, "id": id, "message": message,
+                              "seed": self.post_id_seed})
+        return f"{user},{id}"
+
+    def post_many(self, posts: List[Tuple[str, str]]) -> List[str]:
+        """
+        Creates a batch of posts, as if post were called on each of them in order.
+        The batch is grouped by user first, so each user's table is looked up once and
+        grown at most once for all of the user's new posts before they are inserted.
+        posts_by_id is grown once for the whole batch, and with a log the whole batch
+        is written as one record. The batch is checked and every user's table resolved
+        before any post is stored, so a bad batch raises without storing any of its posts.
+
+        Time: O(m)* where m = len(posts)
+        Space: O(m)
+
+        :param posts: [List[Tuple[str, str]]] (user, message) of each post, oldest first.
+        :return: [List[str]] Post id of each post, in the same order as posts;
+                 raises TypeError if a post is not a pair of strings.
+        """
+        if not isinstance(posts, (list, tuple)):
+            posts = list(posts)
+        for i, post in enumerate(posts):
+            if not isinstance(post, (list, tuple)) or len(post) != 2 or \
+                    not isinstance(post[0], str) or not isinstance(post[1], str):
+                raise TypeError(f"posts[{i}] is not a (user, message) pair of strings")
+
+        groups = HashTable(hash_function=BuiltinHash())
+        batch = []
+        for user, message in posts:
+            group = groups._get(user)
+            if group is None:
+                groups[user] = [user, None, []]
+                group = groups._get(user)
+            batch.append(group.value)
+        # every user was hashed into groups above, so no table is created for a batch that fails
+        for group in groups.values():
+            node = self.ids_by_user._get(group[0])
+            if node is None:
+                self.ids_by_user[group[0]] = HashTable(hash_function=BuiltinHash())
+                node = self.ids_by_user._get(group[0])
+            group[0], group[1] = node.key, node.value
+
+        first = self.post_id_seed + 1
+        self.post_id_seed += len(posts)
+        self.posts_by_id._reserve(len(posts))
+        ids = []
+        for i, (user, _, records) in enumerate(batch):
+            message = posts[i][1]
+            record = PostRecord(user, first + i, message, self.newest)
+            if self.newest is not None:
+                self.newest.next = record
+            self.newest = record
+            self.posts_by_id._insert(record.id, message)
+            if self.index is not None:
+                self.index.add(record)
+            records.append(record)
+            ids.append(f"{user},{record.id}")
+        for _, table, records in groups.values():
+            table._reserve(len(records))
+            for record in records:
+                table._insert(record.id, record)
+
+        if self.log is not None and posts:
+            records = [[post[0], first + i, post[1]] for i, post in enumerate(posts)]
+            self._append_log({"op": "post_many", "posts": records, "seed": self.post_id_seed}, len(posts))
+        return ids
+
+    def _add_post(self, user: str, id: int, message: str) -> None:
+        """
+        Stores a post under a given id and links it as the newest post,
+        shared by post and log replay. Storing an id again only replaces its message.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param user: [str] Author of the post.
+        :param id: [int] Post id.
+        :param message: [str] Body of the post.
+        """
+        self.posts_by_id[id] = message
+
+        node = self.ids_by_user._get(user)
+        if node is None:
+            self.ids_by_user[user] = HashTable(hash_function=BuiltinHash())
+            node = self.ids_by_user._get(user)
+        user, posts = node.key, node.value
+        record = posts._get(id)
+        if record is not None:
+            record.value.message = message
+            return
+        record = PostRecord(user, id, message, self.newest)
+        if self.newest is not None:
+            self.newest.next = record
+        self.newest = record
+        posts[id] = record
+        if self.index is not None:
+            self.index.add(record)
+
+    def delete_post(self, user_post_id: str) -> bool:
+        """
+        Removes the post from the post_by_id and ids_by_user
+        :param user_post_id: post id to remove
+        :return: bool of if the post was deleted or not
+        """
+        if not self._remove_post(user_post_id):
+            return False
+        if self.log is not None:
+            self._append_log({"op": "delete", "post_id": user_post_id})
+        return True
+
+    def _remove_post(self, user_post_id: str) -> bool:
+        """
+        Removes a post, shared by delete_post and log replay.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param user_post_id: [str] Post id to remove.
+        :return: [bool] True if the post existed.
+        """
+        record = self._find_post(user_post_id)
+        if record is None:
+            return False
+        del self.posts_by_id[record.id]
+        del self.ids_by_user[record.user][record.id]
+        if self.index is not None:
+            self.index.remove(record)
+        if record.prev is not None:
+            record.prev.next = record.next
+        if record.next is not None:
+            record.next.prev = record.prev
+        else:
+            self.newest = record.prev
+        return True
+
+    def _find_post(self, user_post_id: str) -> PostRecord:
+        """
+        Parses a "user,id" post id and looks its post up in the user's table.
+
+        Time: O(1)*
+        Space: O(1)
+
+        :param user_post_id: [str] Post id as returned by post.
+        :return: [PostRecord] The post, None if there is no such post.
+        """
+        user, _, id = user_post_id.rpartition(',')
+        if not (id.isascii() and id.isdecimal()) or user not in self.ids_by_user:
+            return None
+        node = self.ids_by_user[user]._get(int(id))
+        return None if node is None else node.value
+
+    def _append_log(self, record: dict, count: int = 1) -> None:
+        """
+        Queues a record for the write-ahead log, writing the queue once it holds
+        group_commit records or flush_delay seconds after its first record, and
+        checkpointing every checkpoint_every records.
+
+        Time: O(1)*
+        Space: O(1)*
+
+        :param record: [dict] Record to log.
+        :param count: [int] Number of records it counts as, the size of a batch.
+        """
+        with self.lock:
+            self.pending.append(json.dumps(record, separators=(",", ":")))
+            self.logged += count
+            if len(self.pending) >= self.group_commit:
+                self.flush()
+            elif self.timer is None and self.flush_delay is not None:
+                self.timer = threading.Timer(self.flush_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if self.checkpoint_every is not None and self.logged >= self.checkpoint_every:
+            self.checkpoint()
+
+    def flush(self) -> None:
+        """
+        Writes every queued record to the write-ahead log and fsyncs it.
+        Called by the timer thread too, flush_delay seconds after a record was queued.
+
+        Time: O(p) where p = number of queued records
+        Space: O(p)
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.log is None:
+                return
+            if self.pending:
+                self.log.write("\n".join(self.pending) + "\n")
+                self.pending = []
+            self.log.flush()
+            os.fsync(self.log.fileno())
+
+    def checkpoint(self) -> None:
+        """
+        Writes a snapshot of every live post and empties the write-ahead log.
+        The snapshot replaces the previous one atomically. Replaying a log that was
+        already folded into the snapshot is harmless, since replay skips the posts the
+        snapshot accounts for, so a crash between the two steps loses nothing.
+
+        Time: O(n) where n = number of posts
+        Space: O(n)
+        """
+        if self.log is None:
+            return
+        with self.lock:
+            self.flush()
+            snapshot = self.log_path + ".snapshot"
+            with open(snapshot + ".tmp", "w", encoding="utf-8", newline="\n") as file:
+                file.write(json.dumps({"seed": self.post_id_seed}) + "\n")
+                records, record = [], self.newest
+                while record is not None:
+                    records.append(record)
+                    record = record.prev
+                for record in reversed(records):
+                    file.write(json.dumps([record.user, record.id, record.message], separators=(",", ":")) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(snapshot + ".tmp", snapshot)
+            self.log.truncate(0)
+            self.log.seek(0)
+            self.logged = 0
+
+    def close(self) -> None:
+        """
+        Flushes and closes the write-ahead log, if any.
+        """
+        with self.lock:
+            if self.log is not None:
+                self.flush()
+                self.log.close()
+                self.log = None
+
+    def _replay(self) -> None:
+        """
+        Rebuilds the posts from the snapshot and the write-ahead log. A torn last
+        record, left by a crash in the middle of a write, is cut off the log.
+        Posts of the log with ids up to the seed of the snapshot are skipped: the snapshot
+        already holds them, or they were deleted before it was taken, which is the case
+        when a crash came between writing a snapshot and emptying the log.
+
+        Time: O(r) where r = number of records replayed
+        Space: O(r)
+        """
+        snapshot, seen = self.log_path + ".snapshot", 0
+        if os.path.exists(snapshot):
+            with open(snapshot, encoding="utf-8") as file:
+                self.post_id_seed = seen = json.loads(file.readline())["seed"]
+                for line in file:
+                    self._add_post(*json.loads(line))
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as file:
+            data = file.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            if record["op"] == "post":
+                if record["id"] > seen:
+                    self._add_post(record["user"], record["id"], record["message"])
+                self.post_id_seed = max(self.post_id_seed, record["seed"])
+                self.logged += 1
+            elif record["op"] == "post_many":
+                for post in record["posts"]:
+                    if post[1] > seen:
+                        self._add_post(*post)
+                self.post_id_seed = max(self.post_id_seed, record["seed"])
+                self.logged += len(record["posts"])
+            else:
+                self._remove_post(record["post_id"])
+                self.logged += 1
+        if end < len(data):
+            with open(self.log_path, "r+b") as file:
+                file.truncate(end)
+
+    def search(self, query: str, mode: str = "and", limit: int = None) -> Generator[Tuple[str, str], None, None]:
+        """
+        Finds the posts containing the words of a query, newest first, through the
+        full-text index. Words are matched whole and case-insensitively.
+
+        Time: O(l) where l = total length of the posting lists of the query words
+        Space: O(q) where q = number of query words
+
+        :param query: the words to search for
+        :param mode: "and" to find posts containing every word, "or" for any of them
+        :param limit: the largest number of posts to yield, None for all
+        :return: generator of UserPost tuples of (user, message), newest first;
+                 raises ValueError right away if the DiscordDestroyer was created
+                 without index=True or mode is unknown
+        """
+        if self.index is None:
+            raise ValueError("search needs a DiscordDestroyer created with index=True")
+        return (UserPost(record.user, record.message, f"{record.user},{record.id}")
+                for record in self.index.search(query, mode, limit))
+
+    def get_most_recent_posts(self, v: int) -> Generator[Tuple[str, str], None, None]:
+        """
+        Sends back a generator of the v most recent live posts, newest first,
+        walking the list of live posts back from the newest one.
+
+        Time: O(v)
+        Space: O(1)
+
+        :param v: the number of posts to send back
+        :returns: generator of (user, message) tuples, fewer than v if fewer posts exist
+        """
+        record = self.newest
+        while record is not None and v > 0:
+            yield record.user, record.message
+            record = record.prev
+            v -= 1
+
+    def get_posts_by_user(self, user: str, after: str = None,
+                          limit: int = None) -> Generator[Tuple[str, str], None, None]:
+        """
+        This function gets the posts by user, oldest first, one page at a time if asked.
+        The cursor is an id bound: a page starts at the user's first live post with a larger
+        id, so paging carries on even when the post named by the cursor was deleted since.
+        A live cursor is found with one lookup in the user's table, a deleted one with a
+        binary search over the table's entries, which are in id order. A page then reads
+        limit posts from there, stepping over the deleted entries between them, whose
+        number the table's compaction keeps below three times its live posts.
+        Messages are read off the post records with no further lookups.
+
+        Time: O(limit + d)* where d = number of deleted entries the page steps over, plus
+              O(log n) when the cursor's post was deleted; O(n) without a limit
+        Space: O(1)
+
+        :param user: the user to get the posts from
+        :param after: cursor, the id of the last post of the previous page (the post_id
+                      of the last UserPost yielded), None to start from the oldest post;
+                      raises KeyError right away if it is not an id of a post by user
+        :param limit: the largest number of posts to yield, None for all
+        :return: generator of UserPost tuples of (user, message).
+        """
+        if user not in self.ids_by_user:
+            return self._page(user, [], 0, limit)
+        posts = self.ids_by_user[user]
+        start = posts.head
+        if after is not None:
+            cursor, _, id = after.rpartition(',')
+            if cursor != user or not (id.isascii() and id.isdecimal()):
+                raise KeyError(after)
+            start = self._first_after(posts, int(id))
+        return self._page(user, posts.entries, start, limit)
+
+    @staticmethod
+    def _page(user: str, entries: List[HashNode], start: int,
+              limit: int) -> Generator[Tuple[str, str], None, None]:
+        """
+        Generates a page of get_posts_by_user, once its cursor is checked.
+
+        :param user: the user the posts are from
+        :param entries: entries of the user's table of posts
+        :param start: position in entries to start from
+        :param limit: the largest number of posts to yield, None for all
+        :return: generator of UserPost tuples of (user, message).
+        """
+        remaining = len(entries) if limit is None else limit
+        for i in range(start, len(entries)):
+            if remaining <= 0:
+                return
+            node = entries[i]
+            if node is not None:
+                yield UserPost(user, node.value.message, f"{user},{node.key}")
+                remaining -= 1
+
+    @staticmethod
+    def _first_after(posts: HashTable, id: int) -> int:
+        """
+        Finds the position of the first live entry of a user's table with an id larger
+        than id: the entry right after the post itself if it is live, else by binary
+        search, stepping over runs of deleted entries.
+
+        Time: O(1)* if the post is live, else O(log n + d) where d = deleted entries stepped over
+        Space: O(1)
+
+        :param posts: [HashTable] Table of a user's posts, keyed by increasing ids.
+        :param id: [int] Id bound.
+        :return: [int] Position in posts.entries, len(posts.entries) if there is none.
+        """
+        if id > 0 and posts._get(id) is not None:  # ids start at 1, and 0 is no key to the table
+            return posts.indices[posts._hash(id)] + 1
+        entries = posts.entries
+        low, high = posts.head, len(entries)
+        while low < high:
+            middle = live = (low + high) // 2
+            while live < high and entries[live] is None:
+                live += 1
+            if live == high or entries[live].key > id:
+                high = middle
+            else:
+                low = live + 1
+        return low
+
+
+class HashRing:
+    """
+    Implements a consistent hashing ring that assigns keys to nodes.
+    Each node is placed on the ring at vnodes points, and a key belongs to the node of
+    the first point at or after the key's hash, wrapping around. Adding or removing a
+    node therefore only moves the keys of the arcs it gains or loses, about 1 / n of
+    them, and the virtual nodes keep the arcs of each node close to an even share.
+
+    Properties
+    - points: [List[int]] hashes of the points on the ring, sorted
+    - owners: [list] owners[i] = node placed at points[i]
+    - vnodes: [int] number of points per node
+    - hash_function: [HashFunction] hashes keys and points, stable across processes and runs
+    """
+    __slots__ = ["points", "owners", "vnodes", "hash_function"]
+
+    def __init__(self, nodes: Iterable, vnodes: int = 64, hash_function: HashFunction = None) -> None:
+        """
+        Builds the ring.
+
+        Time: O(n * v log(n * v)) where n = number of nodes and v = vnodes
+        Space: O(n * v)
+
+        :param nodes: [Iterable] Nodes to place, each with a distinct str().
+        :param vnodes: [int] Number of points per node.
+        :param hash_function: [HashFunction] Hash of keys and points, a SeededHash with a fixed
+                              seed if None; it must mix every bit of the key into the high bits,
+                              which FNV1aHash does not do for keys that differ in their last bytes.
+        """
+        self.vnodes: int = vnodes
+        self.hash_function: HashFunction = SeededHash(b"HashRing") if hash_function is None else hash_function
+        self.points: List[int] = []
+        self.owners: list = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        """
+        Getter for the number of points on the ring.
+
+        :return: [int] Number of points.
+        """
+        return len(self.points)
+
+    def add(self, node) -> None:
+        """
+        Places a node on the ring.
+
+        Time: O(n * v) where n = number of nodes and v = vnodes
+        Space: O(v)
+
+        :param node: Node to place.
+        """
+        for replica in range(self.vnodes):
+            point = self.hash_function(f"{node}#{replica}") & (1 << 64) - 1
+            i = bisect_right(self.points, point)
+            self.points.insert(i, point)
+            self.owners.insert(i, node)
+
+    def remove(self, node) -> None:
+        """
+        Takes a node off the ring.
+
+        Time: O(n * v) where n = number of nodes and v = vnodes
+        Space: O(n * v)
+
+        :param node: Node to remove.
+        """
+        kept = [i for i, owner in enumerate(self.owners) if owner != node]
+        self.points = [self.points[i] for i in kept]
+        self.owners = [self.owners[i] for i in kept]
+
+    def __getitem__(self, key: str):
+        """
+        Finds the node owning a key.
+
+        Time: O(log(n * v)) where n = number of nodes and v = vnodes
+        Space: O(1)
+
+        :param key: [str] Key to place.
+        :return: Node owning the key, raises KeyError if the ring is empty.
+        """
+        if not self.points:
+            raise KeyError(key)
+        i = bisect_right(self.points, self.hash_function(key) & (1 << 64) - 1)
+        return self.owners[i % len(self.points)]
+
+
+class ShardedDiscordDestroyer:
+    """
+    Implements a DiscordDestroyer front-end that partitions users across worker processes.
+    Each shard is a process owning a local DiscordDestroyer, reached through a
+    multiprocessing Pipe, and a HashRing on the username picks the shard of every user,
+    so all posts of a user live on one shard. post, delete_post and get_posts_by_user
+    make one round trip to that shard. get_most_recent_posts and search ask every shard
+    at once and merge their answers.
+
+    Post ids come from a counter in the front-end and are handed to the shards with each
+    post, so ids are increasing across all shards and order posts by recency globally,
+    which is what the merge sorts on. The "user,id" post ids are the same as those of a
+    single DiscordDestroyer. Requests to one shard are answered in order; the front-end
+    itself is not thread-safe.
+
+    The shards are daemon processes, killed when the interpreter exits, so the records a
+    shard still holds back for its log are lost unless close() is called first; use the
+    front-end as a context manager to make sure it is.
+
+    Properties
+    - ring: [HashRing] assigns usernames to shard numbers
+    - connections: [list] connections[i] = front-end end of the Pipe to shard i
+    - processes: [list] processes[i] = process of shard i
+    - post_id_seed: [int] last post id handed out, on any shard
+    """
+    __slots__ = ["ring", "connections", "processes", "post_id_seed"]
+
+    def __init__(self, shards: int = 4, log_path: str = None, index: bool = False,
+                 vnodes: int = 64, hash_function: HashFunction = None) -> None:
+        """
+        Starts the shard processes, replaying their logs if any.
+
+        Time: O(s * v log(s * v)) where s = shards and v = vnodes, plus the replay of every shard
+        Space: O(s * v)
+
+        :param shards: [int] Number of shard processes.
+        :param log_path: [str] Write-ahead log path prefix, shard i logs to log_path + f".{i}";
+                         None to keep posts in memory only. Restarting on the same logs needs
+                         the same shards, vnodes and hash_function, or users change shards.
+        :param index: [bool] Whether each shard keeps a full-text index of its posts.
+        :param vnodes: [int] Number of points per shard on the ring.
+        :param hash_function: [HashFunction] Hash of the ring, see HashRing.
+        """
+        self.ring: HashRing = HashRing(range(shards), vnodes, hash_function)
+        self.connections: list = []
+        self.processes: list = []
+        for shard in range(shards):
+            connection, remote = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=ShardedDiscordDestroyer._serve, daemon=True,
+                args=(remote, None if log_path is None else f"{log_path}.{shard}", index))
+            process.start()
+            remote.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.post_id_seed: int = max(self._broadcast("seed"))
+
+    @staticmethod
+    def _serve(connection, log_path: str, index: bool) -> None:
+        """
+        Runs one shard: answers (method, args) requests with ("ok", result) or
+        ("error", exception) until it receives None, then closes its DiscordDestroyer.
+
+        :param connection: Shard end of the Pipe to the front-end.
+        :param log_path: [str] Write-ahead log of the shard, None without one.
+        :param index: [bool] Whether to keep a full-text index.
+        """
+        app = DiscordDestroyer(log_path, index=index)
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            method, args = request
+            try:
+                if method == "post":
+                    user, message, id = args
+                    app.post_id_seed = id - 1
+                    result = app.post(user, message)
+                elif method == "recent":
+                    result, record = [], app.newest
+                    while record is not None and len(result) < args[0]:
+                        result.append((record.id, record.user, record.message))
+                        record = record.prev
+                elif method == "seed":
+                    result = app.post_id_seed
+                else:
+                    result = getattr(app, method)(*args)
+                    if isinstance(result, types.GeneratorType):
+                        result = list(result)
+                connection.send(("ok", result))
+            except Exception as error:
+                connection.send(("error", error))
+        app.close()
+        connection.close()
+
+    def _call(self, shard: int, method: str, *args):
+        """
+        Runs a method on one shard and waits for its result.
+
+        :param shard: [int] Shard number.
+        :param method: [str] Name of the request.
+        :param args: Arguments of the request.
+        :return: Result of the request, raises the exception the shard raised if any.
+        """
+        self.connections[shard].send((method, args))
+        return self._receive(shard)
+
+    def _broadcast(self, method: str, *args) -> list:
+        """
+        Runs a method on every shard in parallel, sending every request before
+        waiting for any result. Every answer is read before an error is raised,
+        so that no answer is left in a pipe to be taken for that of a later request.
+
+        :param method: [str] Name of the request.
+        :param args: Arguments of the request.
+        :return: [list] Result of every shard, by shard number, raises the exception
+                 the first failing shard raised if any.
+        """
+        for connection in self.connections:
+            connection.send((method, args))
+        answers = [connection.recv() for connection in self.connections]
+        for status, result in answers:
+            if status == "error":
+                raise result
+        return [result for _, result in answers]
+
+    def _receive(self, shard: int):
+        """
+        Receives the answer of one shard.
+
+        :param shard: [int] Shard number.
+        :return: Result of the request, raises the exception the shard raised if any.
+        """
+        status, result = self.connections[shard].recv()
+        if status == "error":
+            raise result
+        return result
+
+    def post(self, user: str, message: str) -> str:
+        """
+        Creates a post on the shard of its user.
+
+        :param user: a string that represents the user
+        :param message: represents the message that is going to be posted
+        :return: returns the id assigned, as "user,id"
+        """
+        self.post_id_seed += 1
+        return self._call(self.ring[user], "post", user, message, self.post_id_seed)
+
+    def delete_post(self, user_post_id: str) -> bool:
+        """
+        Removes a post from the shard of its user.
+
+        :param user_post_id: post id to remove
+        :return: bool of if the post was deleted or not
+        """
+        return self._call(self.ring[user_post_id.rpartition(",")[0]], "delete_post", user_post_id)
+
+    def get_posts_by_user(self, user: str, after: str = None, limit: int = None) -> List[Tuple[str, str]]:
+        """
+        Gets the posts by user, oldest first, from the shard of the user.
+        See DiscordDestroyer.get_posts_by_user for the paging.
+
+        :param user: the user to get the posts from
+        :param after: cursor, the post_id of the last UserPost of the previous page, None to start
+        :param limit: the largest number of posts to return, None for all
+        :return: list of UserPost tuples of (user, message).
+        """
+        return self._call(self.ring[user], "get_posts_by_user", user, after, limit)
+
+    def get_most_recent_posts(self, v: int) -> List[Tuple[str, str]]:
+        """
+        Gets the v most recent posts across all shards, newest first: every shard sends
+        its own v newest posts, and the streams are merged on their post ids.
+
+        Time: O(s * v) where s = number of shards
+        Space: O(s * v)
+
+        :param v: the number of posts to send back
+        :return: list of (user, message) tuples, fewer than v if fewer posts exist
+        """
+        v = max(v, 0)
+        streams = self._broadcast("recent", v)
+        return [(user, message) for _, user, message in islice(merge(*streams, reverse=True), v)]
+
+    def search(self, query: str, mode: str = "and", limit: int = None) -> List[Tuple[str, str]]:
+        """
+        Finds the posts containing the words of a query across all shards, newest first:
+        every shard searches its own index for up to limit posts, and the results are
+        merged on their post ids. See DiscordDestroyer.search for the query.
+
+        :param query: the words to search for
+        :param mode: "and" to find posts containing every word, "or" for any of them
+        :param limit: the largest number of posts to return, None for all
+        :return: list of UserPost tuples of (user, message), newest first; raises
+                 ValueError if the shards were started without index=True
+        """
+        if limit is not None:
+            limit = max(limit, 0)
+        streams = self._broadcast("search", query, mode, limit)
+        found = merge(*streams, key=lambda post: int(post.post_id.rpartition(",")[2]), reverse=True)
+        return list(found if limit is None else islice(found, limit))
+
+    def __enter__(self) -> "ShardedDiscordDestroyer":
+        """
+        Enters a with block.
+
+        :return: [ShardedDiscordDestroyer] self
+        """
+        return self
+
+    def __exit__(self, *error) -> None:
+        """
+        Leaves a with block, closing every shard.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops every shard, flushing and closing their logs, and waits for them to exit.
+        """
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(None)
+            connection.close()
+            process.join()
+        self.connections, self.processes = [], []
+
+
+class DiscordDestroyerServer:
+    """
+    Implements an asyncio server in front of a DiscordDestroyer (or a ShardedDiscordDestroyer),
+    speaking JSON lines over TCP or a Unix socket. Every request line is an object
+    {"id": any, "op": name, "args": [...]} and is answered, possibly out of order, by a line
+    {"id": same id, "ok": true, "result": ...} or {"id": same id, "ok": false, "error": text}.
+    Clients may send many requests without waiting for the answers.
+
+    Requests from every connection are queued and applied together in micro-batches, at most
+    batch_interval seconds after the first request of the batch or as soon as max_batch
+    requests are queued. A batch runs without yielding to the event loop, so it is one
+    critical section and its requests take effect in arrival order. Runs of consecutive
+    posts are applied with a single post_many when the application has one; should it
+    fail, which it leaves no trace of, the run is retried one post at a time, so a post
+    only ever fails on its own account.
+    UserPosts are sent as [user, message, post_id].
+
+    Properties
+    - app: the DiscordDestroyer requests are applied to
+    - batch_interval: [float] longest wait in seconds before a queued request is applied
+    - max_batch: [int] number of queued requests that triggers a batch at once
+    - queue: [list] (op, args, future) of the requests waiting for the next batch
+    - timer: [asyncio.TimerHandle] pending batch, None if the queue is empty
+    - server: [asyncio.Server] listening server, None before start
+    - connections: [list] (task, writer) of every open connection
+    - requests: [int] number of requests applied
+    - batches: [int] number of batches applied
+    """
+    __slots__ = ["app", "batch_interval", "max_batch", "queue", "timer", "server", "connections",
+                 "requests", "batches"]
+    OPS = ("post", "delete_post", "get_most_recent_posts", "get_posts_by_user", "search")
+
+    def __init__(self, app=None, batch_interval: float = 0.002, max_batch: int = 1024) -> None:
+        """
+        Initializes the server, without listening yet.
+
+        :param app: DiscordDestroyer or ShardedDiscordDestroyer to serve, a new DiscordDestroyer if None.
+        :param batch_interval: [float] Longest wait in seconds before a queued request is applied.
+        :param max_batch: [int] Number of queued requests that triggers a batch at once,
+                          1 to apply every request on its own.
+        """
+        self.app = DiscordDestroyer() if app is None else app
+        self.batch_interval: float = batch_interval
+        self.max_batch: int = max_batch
+        self.queue: list = []
+        self.timer: asyncio.TimerHandle = None
+        self.server: asyncio.AbstractServer = None
+        self.connections: list = []
+        self.requests: int = 0
+        self.batches: int = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: str = None,
+                    limit: int = 1 << 20):
+        """
+        Starts listening, on a Unix socket if path is given, else on TCP.
+
+        :param host: [str] TCP host to listen on.
+        :param port: [int] TCP port to listen on, 0 for any free port.
+        :param path: [str] Unix socket path to listen on instead of TCP.
+        :param limit: [int] Longest request line in bytes; a longer line is skipped and
+                      answered with an error.
+        :return: Address listened on, (host, port) for TCP or the path.
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path, limit=limit)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port, limit=limit)
+        return self.server.sockets[0].getsockname()
+
+    async def close(self) -> None:
+        """
+        Stops listening, applies the requests still queued, then closes every connection
+        and waits for them to finish.
+        """
+        server, self.server = self.server, None
+        if server is not None:
+            server.close()
+        if self.queue:
+            self._apply()
+        tasks = [task for task, _ in self.connections]
+        for _, writer in self.connections:
+            writer.close()
+        await asyncio.gather(*tasks)
+        if server is not None:
+            await server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one connection: queues each request line it reads and writes each answer
+        once its batch has been applied. A line longer than the limit is answered with
+        an error and skipped up to its end.
+
+        :param reader: [asyncio.StreamReader] Reads the requests of the connection.
+        :param writer: [asyncio.StreamWriter] Writes the answers of the connection.
+        """
+        connection = (asyncio.current_task(), writer)
+        self.connections.append(connection)
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as error:
+                    line = error.partial
+                    if not line:
+                        break
+                except asyncio.LimitOverrunError as error:
+                    self._answer(writer, None, error=ValueError("request line longer than the limit"))
+                    while True:
+                        try:
+                            await reader.readuntil(b"\n")
+                            break
+                        except asyncio.LimitOverrunError as overrun:
+                            await reader.readexactly(overrun.consumed)
+                    continue
+                self._submit(line, writer)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.remove(connection)
+            writer.close()
+
+    def _submit(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        """
+        Parses a request line and queues it, answering malformed requests at once.
+
+        :param line: [bytes] Request line.
+        :param writer: [asyncio.StreamWriter] Writes the answer.
+        """
+        id = None
+        try:
+            request = json.loads(line)
+            id = request.get("id")
+            op, args = request["op"], request.get("args", [])
+            if op not in self.OPS:
+                raise ValueError(f"unknown op {op!r}")
+            if not isinstance(args, list) or op == "post" and \
+                    (len(args) != 2 or not isinstance(args[0], str) or not isinstance(args[1], str)):
+                raise ValueError(f"bad args for {op}")
+        except (ValueError, KeyError, AttributeError) as error:
+            self._answer(writer, id, error=error)
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda done: self._answer(writer, id, done))
+        self.queue.append((op, args, future))
+        if len(self.queue) >= self.max_batch:
+            self._apply()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.batch_interval, self._apply)
+
+    @staticmethod
+    def _answer(writer: asyncio.StreamWriter, id, done: asyncio.Future = None, error: Exception = None) -> None:
+        """
+        Writes the answer to one request, unless its connection is gone.
+
+        :param writer: [asyncio.StreamWriter] Writes the answer.
+        :param id: Id of the request.
+        :param done: [asyncio.Future] Completed future of the request, None if error is given.
+        :param error: [Exception] Error to answer with when there is no future.
+        """
+        if writer.is_closing():
+            return
+        if done is not None:
+            error = done.exception()
+        if error is not None:
+            answer = {"id": id, "ok": False, "error": f"{type(error).__name__}: {error}"}
+        else:
+            answer = {"id": id, "ok": True, "result": done.result()}
+        writer.write(json.dumps(answer, separators=(",", ":")).encode() + b"\n")
+
+    def _apply(self) -> None:
+        """
+        Applies every queued request in arrival order, in one go.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        queue, self.queue = self.queue, []
+        self.requests += len(queue)
+        self.batches += 1
+        post_many = getattr(self.app, "post_many", None)
+        i = 0
+        while i < len(queue):
+            op, args, future = queue[i]
+            end = i + 1
+            if op == "post" and post_many is not None:
+                while end < len(queue) and queue[end][0] == "post":
+                    end += 1
+                try:
+                    results = post_many([tuple(args) for _, args, _ in queue[i:end]])
+                except Exception:
+                    results = [self._call(op, args) for _, args, _ in queue[i:end]]
+            else:
+                results = [self._call(op, args)]
+            for (_, _, future), result in zip(queue[i:end], results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            i = end
+
+    def _call(self, op: str, args: list):
+        """
+        Applies one request on its own.
+
+        :param op: [str] Name of the method.
+        :param args: [list] Arguments of the method.
+        :return: The encoded result, or the exception the method raised.
+        """
+        try:
+            return self._encode(getattr(self.app, op)(*args))
+        except Exception as error:
+            return error
+
+    @staticmethod
+    def _encode(result):
+        """
+        Turns the result of a DiscordDestroyer method into JSON-ready values.
+
+        :param result: Result of the method.
+        :return: The result with generators and UserPosts turned into lists.
+        """
+        if isinstance(result, (types.GeneratorType, list)):
+            return [[*post, post.post_id] if isinstance(post, UserPost) else list(post) for post in result]
+        return result
@@ -1,9 +1,19 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import types
 import unittest
 import random
 from itertools import cycle
 from xml.dom import minidom
-from solution import HashNode, HashTable, DiscordDestroyer
+import solution
+from solution import HashNode, HashTable, ColumnarHashTable, RobinHoodHashTable, ConcurrentHashTable, BoundedHashTable, \
+    DiscordDestroyer, DoubleHashing, LinearProbing, QuadraticProbing, PolynomialHash, BuiltinHash, \
+    FNV1aHash, XXHash, SeededHash, PostingList, HashRing, ShardedDiscordDestroyer, \
+    DiscordDestroyerServer
 
 random.seed(331)
 
@@ -415,6 +425,39 @@ class TestHashTable(unittest.TestCase):
         self.assertEqual(42, table["ghast"])  # 4c
         self.assertEqual(3, table.size)  # 4d
 
+    def test_update_bulk(self):
+        # (1) A large batch resizes once up front instead of doubling repeatedly
+        class CountingHashTable(HashTable):
+            __slots__ = ["rehashes"]
+
+            def _rehash(self, capacity):
+                self.rehashes = getattr(self, "rehashes", 0) + 1
+                super()._rehash(capacity)
+
+        table = CountingHashTable()
+        pairs = [(f"key{i}", i) for i in range(1000)]
+        table.update(pairs)
+        self.assertEqual(1, table.rehashes)  # 1a
+        self.assertEqual(2048, table.capacity)  # 1b
+        self.assertEqual(1000, len(table))  # 1c
+        self.assertEqual(pairs, list(table.items()))  # 1d
+
+        # (2) Keys repeated within a batch keep their first position and last value
+        table = HashTable()
+        table.update(iter([("a", 1), ("b", 2), ("a", 3), ("c", 4), ("b", 5)]))
+        self.assertEqual([("a", 3), ("b", 5), ("c", 4)], list(table.items()))  # 2a
+        self.assertEqual(3, len(table))  # 2b
+
+        # (3) Batches into a table holding DELETED slots reuse them and still find existing keys
+        table = HashTable()
+        table["Brandon"] = 1
+        table["Lukas"] = 2
+        del table["Brandon"]
+        table.update([("Lukas", 3), ("Brandon", 4)])
+        self.assertEqual(2, len(table))  # 3a
+        self.assertEqual(3, table["Lukas"])  # 3b
+        self.assertEqual(4, table["Brandon"])  # 3c
+
     def test_keys_values_items(self):
         # (1) Basic
         table = HashTable()
@@ -683,6 +726,744 @@ class TestHashTable(unittest.TestCase):
         # of searching with inserting=False first, this will probably cause problems
         del table["Lukas"]
 
+    def test_cached_hash(self):
+        # (1) HashNode caches the base hash of its key
+        node = HashNode("cse331", 100)
+        self.assertEqual(HashTable._base_hash("cse331"), node.hash)  # 1a
+        self.assertEqual(node.hash, HashNode("cse331", 100, node.hash).hash)  # 1b
+
+        # (2) _grow reuses cached hashes instead of rehashing keys
+        class CountingHash(PolynomialHash):
+            calls = 0
+
+            def __call__(self, key):
+                CountingHash.calls += 1
+                return super().__call__(key)
+
+        table = HashTable(hash_function=CountingHash())
+        keys = ["cse331", "is_the", "best", "class_ever"]
+        for i, key in enumerate(keys):
+            table[key] = i
+        self.assertEqual(16, table.capacity)  # 2a
+        self.assertEqual(len(keys), CountingHash.calls)  # 2b
+        for i, key in enumerate(keys):
+            self.assertEqual(i, table[key])  # 2c
+
+    def test_large_primes(self):
+        # (1) Largest prime not exceeding n matches a brute force sieve
+        limit = 5000
+        sieve = [True] * (limit + 1)
+        sieve[0] = sieve[1] = False
+        for i in range(2, limit + 1):
+            if sieve[i]:
+                for j in range(i * i, limit + 1, i):
+                    sieve[j] = False
+        largest = 2
+        for n in range(2, limit + 1):
+            if sieve[n]:
+                largest = n
+            self.assertEqual(largest, HashTable._largest_prime(n))  # 1a
+
+        # (2) Deterministic primality test on large values
+        self.assertTrue(HashTable._is_prime(2 ** 61 - 1))  # 2a
+        self.assertFalse(HashTable._is_prime(3215031751))  # 2b, strong pseudoprime to bases 2, 3, 5, 7
+        self.assertEqual(2 ** 31 - 1, HashTable._largest_prime(2 ** 31))  # 2c
+
+        # (3) Tables grow well past the old 997 prime ceiling
+        table = HashTable()
+        keys = [f"user{i},{i * 7919}" for i in range(5000)]
+        for i, key in enumerate(keys):
+            table[key] = i
+        self.assertEqual(16384, table.capacity)  # 3a
+        self.assertEqual(16381, table.prime)  # 3b
+        for i, key in enumerate(keys):
+            self.assertEqual(i, table[key])  # 3c
+
+    def test_compact(self):
+        # (1) Entries are compacted once deleted entries pass compact_ratio
+        table = HashTable(capacity=64, compact_ratio=0.5)
+        keys = [f"key{i}" for i in range(20)]
+        for i, key in enumerate(keys):
+            table[key] = i
+        for key in keys[:10]:
+            del table[key]
+        self.assertEqual(20, len(table.entries))  # 1a, not compacted at exactly half
+        del table[keys[10]]
+        self.assertEqual(9, len(table.entries))  # 1b
+        self.assertTrue(all(node is not None for node in table.entries))  # 1c
+        self.assertEqual(keys[11:], list(table.keys()))  # 1d, insertion order kept
+        for i, key in enumerate(keys[11:], 11):
+            self.assertEqual(i, table[key])  # 1e, indices remapped
+        for key in keys[:11]:
+            self.assertNotIn(key, table)  # 1f
+
+        # (2) Growing after deletes skips and drops deleted entries
+        table = HashTable()
+        table["a"] = 1
+        table["b"] = 2
+        del table["a"]
+        table["c"] = 3
+        table["d"] = 4
+        table["e"] = 5
+        self.assertEqual(16, table.capacity)  # 2a
+        self.assertEqual([HashNode("b", 2), HashNode("c", 3), HashNode("d", 4), HashNode("e", 5)],
+                         table.entries)  # 2b
+        self.assertEqual(["b", "c", "d", "e"], list(table.keys()))  # 2c
+
+    def test_tombstone_resize(self):
+        # (1) Churn at a steady size rehashes in place instead of filling up with DELETED
+        table = HashTable(capacity=64, tombstone_ratio=0.25)
+        for i in range(8):
+            table[f"key{i}"] = i
+        for i in range(8, 500):
+            del table[f"key{i - 8}"]
+            table[f"key{i}"] = i
+            self.assertLessEqual(table.tombstones, 16)  # 1a
+            self.assertEqual(64, table.capacity)  # 1b
+        self.assertEqual(8, len(table))  # 1c
+        self.assertEqual(table.tombstones, table.indices.count(HashTable.DELETED))  # 1d
+        for i in range(492, 500):
+            self.assertEqual(i, table[f"key{i}"])  # 1e
+
+        # (2) Mass deletion shrinks once DELETED markers dominate
+        table = HashTable(load_factor=0.5, tombstone_ratio=0.1)
+        for i in range(100):
+            table[f"key{i}"] = i
+        self.assertEqual(256, table.capacity)  # 2a
+        for i in range(95):
+            del table[f"key{i}"]
+        self.assertLess(table.capacity, 256)  # 2b
+        self.assertGreaterEqual(table.capacity, 8)  # 2c
+        self.assertEqual([f"key{i}" for i in range(95, 100)], list(table.keys()))  # 2d
+        for i in range(95, 100):
+            self.assertEqual(i, table[f"key{i}"])  # 2e
+
+        # (3) load_factor controls when the table grows
+        table = HashTable(load_factor=0.75, tombstone_ratio=0.2)
+        for i in range(5):
+            table[f"key{i}"] = i
+        self.assertEqual(8, table.capacity)  # 3a
+        table["key5"] = 5
+        self.assertEqual(16, table.capacity)  # 3b
+
+        # (4) Ratios must leave FREE slots for probes to end on
+        for load_factor, tombstone_ratio in ((0, 0.25), (1, 0.25), (0.5, 0), (0.5, 1), (0.75, 0.25), (0.9, 0.5)):
+            with self.assertRaises(ValueError):
+                HashTable(load_factor=load_factor, tombstone_ratio=tombstone_ratio)  # 4a
+        with self.assertRaises(ValueError):
+            RobinHoodHashTable(load_factor=1)  # 4b
+
+    def test_compact_indices(self):
+        # (1) Compact tables place keys exactly like list-backed tables
+        table = HashTable()
+        compact = HashTable(compact_indices=True)
+        keys = "According to all known laws of aviation, there is no way a bee should be able 2 fly".split(' ')
+        for i, key in enumerate(keys):
+            table[key] = i
+            compact[key] = i
+        self.assertEqual("b", compact.indices.typecode)  # 1a
+        self.assertEqual(table.indices, list(compact.indices))  # 1b
+        self.assertEqual(table.entries, compact.entries)  # 1c
+        for key in keys[:10]:
+            del table[key]
+            del compact[key]
+        self.assertEqual(table.indices, list(compact.indices))  # 1d
+        self.assertEqual(list(table.items()), list(compact.items()))  # 1e
+
+        # (2) Typecode widens as capacity grows
+        for i in range(200):
+            compact[f"key{i}"] = i
+        self.assertEqual(512, compact.capacity)  # 2a
+        self.assertEqual("h", compact.indices.typecode)  # 2b
+        self.assertEqual(2, compact.indices.itemsize)  # 2c
+        for i in range(200):
+            self.assertEqual(i, compact[f"key{i}"])  # 2d
+
+        # (3) Typecode widens when dead entries push entry indices past the typecode
+        churn = HashTable(capacity=128, compact_ratio=1.0, load_factor=0.05, tombstone_ratio=0.9,
+                          compact_indices=True)
+        for i in range(200):
+            churn[f"key{i}"] = i
+            if i:
+                del churn[f"key{i - 1}"]
+        self.assertEqual(128, churn.capacity)  # 3a
+        self.assertEqual("h", churn.indices.typecode)  # 3b
+        self.assertEqual(199, churn["key199"])  # 3c
+
+    def test_columnar(self):
+        # (1) Columnar tables place keys exactly like HashNode tables
+        table = HashTable()
+        columnar = ColumnarHashTable()
+        keys = "According to all known laws of aviation, there is no way a bee should be able 2 fly".split(' ')
+        for i, key in enumerate(keys):
+            table[key] = i
+            columnar[key] = i
+        self.assertEqual(table.indices, columnar.indices)  # 1a
+        self.assertEqual([], columnar.entries)  # 1b
+        self.assertEqual(keys, columnar.entry_keys)  # 1c
+        self.assertEqual([HashTable._base_hash(key) for key in keys], columnar.entry_hashes)  # 1d
+        self.assertEqual(HashNode("bee", 12), columnar._get("bee"))  # 1e
+        self.assertIsNone(columnar._get("Enbody"))  # 1f
+        with self.assertRaises(KeyError):
+            _ = columnar["Enbody"]  # 1g
+
+        # (2) Deletes, overwrites and iteration match
+        for key in keys[:10]:
+            del table[key]
+            del columnar[key]
+        table.update([("bee", 1), ("fly", 2)])
+        columnar.update([("bee", 1), ("fly", 2)])
+        self.assertEqual(table.indices, columnar.indices)  # 2a
+        self.assertEqual(len(table), len(columnar))  # 2b
+        self.assertEqual(list(table.keys()), list(columnar.keys()))  # 2c
+        self.assertEqual(list(table.values()), list(columnar.values()))  # 2d
+        self.assertEqual(list(table.items()), list(columnar.items()))  # 2e
+        self.assertEqual(list(table.items(reverse=True)), list(columnar.items(reverse=True)))  # 2f
+        self.assertEqual(list(table.values(reverse=True)), list(columnar.values(reverse=True)))  # 2g
+        self.assertEqual(str(table).split("Entries")[0], str(columnar).split("Entries")[0])  # 2h
+        self.assertFalse("no" in columnar)  # 2i
+        self.assertTrue("a" in columnar)  # 2j
+
+        # (3) Clear
+        columnar.clear()
+        self.assertEqual(0, len(columnar))  # 3a
+        self.assertEqual([], list(columnar.items()))  # 3b
+        columnar["a"] = 1
+        self.assertEqual(1, columnar["a"])  # 3c
+
+    def test_probing(self):
+        # (1) Every strategy supports insert, lookup, delete and growth
+        keys = [f"user{i % 7},{i * 7919}" for i in range(600)]
+        for probing in (DoubleHashing(), LinearProbing(), QuadraticProbing()):
+            for table_type in (HashTable, ColumnarHashTable):
+                table = table_type(probing=probing)
+                for i, key in enumerate(keys):
+                    table[key] = i
+                for key in keys[::2]:
+                    del table[key]
+                table.update([(key, -1) for key in keys[:10]])
+                self.assertEqual(305, len(table))  # 1a
+                for i, key in enumerate(keys[10:], 10):
+                    if i % 2:
+                        self.assertEqual(i, table[key])  # 1b
+                    else:
+                        self.assertNotIn(key, table)  # 1c
+
+        # (2) Linear probing places colliding keys in consecutive slots
+        table = HashTable(capacity=16, probing=LinearProbing())
+        table["a"] = 1  # 97 % 16 = 1
+        table["q"] = 2  # 113 % 16 = 1
+        table["b"] = 3  # 98 % 16 = 2
+        self.assertEqual([HashTable.FREE, 0, 1, 2], table.indices[:4])  # 2a
+
+        # (3) Probe statistics
+        stats = table.probe_stats()
+        self.assertEqual([1, 2], stats.histogram)  # 3a, "q" and "b" each probe twice
+        self.assertEqual(2, stats.max)  # 3b
+        self.assertAlmostEqual(5 / 3, stats.mean)  # 3c
+        stats = HashTable().probe_stats()
+        self.assertEqual(([], 0, 0.0), (stats.histogram, stats.max, stats.mean))  # 3d
+
+        # (4) Quadratic probing only takes power of two capacities
+        for capacity in (0, 12, 100):
+            with self.assertRaises(ValueError):
+                HashTable(capacity=capacity, probing=QuadraticProbing())  # 4a
+        self.assertEqual(64, HashTable(capacity=64, probing=QuadraticProbing()).capacity)  # 4b
+        for probing in (DoubleHashing(), LinearProbing(), QuadraticProbing()):
+            table = HashTable(probing=probing)
+            table.update([(key, i) for i, key in enumerate(keys)])
+            stats = table.probe_stats()
+            self.assertEqual(len(keys), sum(stats.histogram))  # 3e
+            self.assertEqual(len(stats.histogram), stats.max)  # 3f
+            self.assertGreaterEqual(stats.mean, 1.0)  # 3g
+
+    def test_robin_hood(self):
+        # (1) Random workload matches a reference list of items and never leaves tombstones
+        table = RobinHoodHashTable(load_factor=0.75)
+        reference = []
+        keys = [f"user{i % 13},{i * 31}" for i in range(300)]
+        for _ in range(3000):
+            key = random.choice(keys)
+            present = [k for k, _ in reference]
+            if key in present and random.random() < 0.4:
+                del table[key]
+                reference.pop(present.index(key))
+            else:
+                value = random.randint(0, 1000)
+                table[key] = value
+                if key in present:
+                    reference[present.index(key)] = (key, value)
+                else:
+                    reference.append((key, value))
+        self.assertEqual(reference, list(table.items()))  # 1a, insertion order kept
+        self.assertEqual(len(reference), len(table))  # 1b
+        self.assertNotIn(HashTable.DELETED, table.indices)  # 1c
+        for key in keys:
+            self.assertEqual(key in [k for k, _ in reference], key in table)  # 1d
+
+        # (2) Stored distances match each entry's offset from its home slot
+        for slot in range(table.capacity):
+            if table.indices[slot] >= 0:
+                home = table.entries[table.indices[slot]].hash % table.capacity
+                self.assertEqual((slot - home) % table.capacity, table.distances[slot])  # 2a
+        stats = table.probe_stats()
+        self.assertEqual(max(table.distances) + 1, stats.max)  # 2b
+
+        # (3) Backward shift deletion moves the cluster back into place
+        table = RobinHoodHashTable(capacity=16)
+        table["a"] = 1  # home 1
+        table["q"] = 2  # home 1
+        table["b"] = 3  # home 2
+        self.assertEqual([HashTable.FREE, 0, 1, 2], table.indices[:4])  # 3a
+        self.assertEqual([0, 0, 1, 1], table.distances[:4])  # 3b
+        del table["a"]
+        self.assertEqual([HashTable.FREE, 1, 2, HashTable.FREE], table.indices[:4])  # 3c
+        self.assertEqual([0, 0, 0, 0], table.distances[:4])  # 3d
+        self.assertEqual([("q", 2), ("b", 3)], list(table.items()))  # 3e
+        with self.assertRaises(KeyError):
+            del table["a"]  # 3f
+
+    def test_get_many(self):
+        # (1) Batch lookups match single lookups on every table layout
+        keys = [f"user{i % 7},{i * 7919}" for i in range(300)]
+        missing = [f"ghost{i}" for i in range(100)]
+        for table in (HashTable(), ColumnarHashTable(), RobinHoodHashTable(),
+                      HashTable(probing=QuadraticProbing())):
+            table.update([(key, i) for i, key in enumerate(keys)])
+            for key in keys[::3]:
+                del table[key]
+            batch = keys + missing
+            expected = [table[key] if key in table else "missing" for key in batch]
+            self.assertEqual(expected, table.get_many(batch, "missing"))  # 1a
+            self.assertEqual([key in table for key in batch], table.contains_many(iter(batch)))  # 1b
+            self.assertEqual([None] * 100, table.get_many(missing))  # 1c
+            self.assertEqual([], table.get_many([]))  # 1d
+
+    @unittest.skipIf(solution.np is None, "NumPy is not installed")
+    def test_get_many_vectorized(self):
+        # (1) NumPy probe starts match the pure Python ones
+        table = HashTable()
+        keys = [f"k{i}" for i in range(500)]
+        table.update([(key, i) for i, key in enumerate(keys)])
+        hashes = [HashTable._base_hash(key) for key in keys]
+        self.assertEqual(([table._hash_1(key) for key in keys], [table._hash_2(key) for key in keys]),
+                         table._probe_starts(keys, hashes))  # 1a
+        self.assertEqual(list(range(500)), table.get_many(keys))  # 1b
+
+    def test_snapshot(self):
+        table = HashTable(probing=QuadraticProbing(), compact_ratio=0.9)
+        keys = [f"user{i % 7},{i * 7919}" for i in range(300)]
+        table.update([(key, [i, str(i)]) for i, key in enumerate(keys)])
+        for key in keys[::3]:
+            del table[key]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.bin")
+            table.save(path)
+            with open(path, "rb") as snapshot:
+                saved = snapshot.read()
+
+            for mmap in (True, False):
+                # (1) Reloaded tables hold the same items and layout
+                loaded = HashTable.load(path, mmap=mmap)
+                self.assertEqual(table.capacity, loaded.capacity)  # 1a
+                self.assertEqual(table.prime, loaded.prime)  # 1b
+                self.assertIsInstance(loaded.probing, QuadraticProbing)  # 1c
+                self.assertEqual(list(table.indices), list(loaded.indices))  # 1d
+                self.assertEqual(table, loaded)  # 1e
+                self.assertEqual(table.entries[-1].hash, loaded.entries[-1].hash)  # 1f
+                for key in keys:
+                    self.assertEqual(table.get_many([key], None)[0], loaded.get_many([key], None)[0])  # 1g
+
+                # (2) Reloaded tables stay fully usable without touching the file
+                for key in keys[1::3]:
+                    del loaded[key]
+                for i in range(300):
+                    loaded[f"new{i}"] = i
+                self.assertEqual(100 + 300, len(loaded))  # 2a
+                self.assertEqual(5, loaded["new5"])  # 2b
+                self.assertEqual([2, "2"], loaded[keys[2]])  # 2c
+                with open(path, "rb") as snapshot:
+                    self.assertEqual(saved, snapshot.read())  # 2d
+
+            # (3) Entries are decoded lazily
+            loaded = HashTable.load(path)
+            self.assertEqual([False] * len(table.entries), loaded.entries.nodes)  # 3a
+            self.assertEqual([1, "1"], loaded[keys[1]])  # 3b
+            self.assertEqual(1, sum(node is not False for node in loaded.entries.nodes))  # 3c
+            self.assertEqual(list(table.values(start=150, stop=152)), list(loaded.values(start=150, stop=152)))  # 3d
+            self.assertLess(sum(node is not False for node in loaded.entries.nodes), 6)  # 3e
+            del loaded
+
+            # (4) Bad files and unsupported layouts
+            with open(path, "wb") as snapshot:
+                snapshot.write(b"not a snapshot" * 10)
+            with self.assertRaises(ValueError):
+                HashTable.load(path)  # 4a
+            for unsupported in (ColumnarHashTable(), RobinHoodHashTable(), BoundedHashTable(3)):
+                with self.assertRaises(ValueError):
+                    unsupported.save(path)  # 4b
+
+    def test_setdefault_pop(self):
+        table = HashTable()
+        # (1) setdefault inserts only when missing
+        self.assertEqual(1, table.setdefault("a", 1))  # 1a
+        self.assertEqual(1, table.setdefault("a", 2))  # 1b
+        self.assertIsNone(table.setdefault("b"))  # 1c
+        self.assertEqual([("a", 1), ("b", None)], list(table.items()))  # 1d
+
+        # (2) pop removes and returns the value
+        self.assertEqual(1, table.pop("a"))  # 2a
+        self.assertNotIn("a", table)  # 2b
+        self.assertEqual("gone", table.pop("a", "gone"))  # 2c
+        self.assertIsNone(table.pop("a", None))  # 2d
+        with self.assertRaises(KeyError):
+            table.pop("a")  # 2e
+        self.assertEqual(1, len(table))  # 2f
+
+    def test_concurrent(self):
+        # (1) Basic operations behave like a HashTable
+        table = ConcurrentHashTable(segments=4)
+        table.update([(f"key{i}", i) for i in range(100)])
+        self.assertEqual(100, len(table))  # 1a
+        self.assertEqual(42, table["key42"])  # 1b
+        del table["key42"]
+        self.assertNotIn("key42", table)  # 1c
+        self.assertEqual("none", table.get("key42", "none"))  # 1d
+        with self.assertRaises(KeyError):
+            _ = table["key42"]  # 1e
+        self.assertEqual(sorted(f"key{i}" for i in range(100) if i != 42), sorted(table.keys()))  # 1f
+        self.assertEqual(sum(range(100)) - 42, sum(table.values()))  # 1g
+        self.assertTrue(table.compare_and_set("key1", 1, 10))  # 1h
+        self.assertFalse(table.compare_and_set("key1", 1, 20))  # 1i
+        self.assertFalse(table.compare_and_set("missing", None, 1))  # 1j
+        self.assertEqual(10, table["key1"])  # 1k
+
+        # (2) Compare-and-set increments from many threads are never lost
+        table = ConcurrentHashTable(segments=4, table_type=ColumnarHashTable)
+        counters = [f"counter{i}" for i in range(8)]
+        for key in counters:
+            table[key] = 0
+
+        def increment():
+            for i in range(200):
+                key = counters[i % len(counters)]
+                while True:
+                    current = table[key]
+                    if table.compare_and_set(key, current, current + 1):
+                        break
+
+        def claim(results):
+            results.append((table.setdefault("winner", threading.get_ident()), table.pop("token", None)))
+
+        table["token"] = "prize"
+        results = []
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        threads += [threading.Thread(target=claim, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([200] * len(counters), [table[key] for key in counters])  # 2a
+        self.assertEqual(8, len(results))
+        self.assertEqual(1, len({winner for winner, _ in results}))  # 2b, every thread saw the same setdefault winner
+        self.assertEqual(["prize"], [token for _, token in results if token is not None])  # 2c
+
+    def test_incremental_resize(self):
+        rng = random.Random(13)
+        keys = [f"key{i}" for i in range(500)]
+        # (1) Grows never rehash in one pass, and are observed mid-migration
+        rehashes, seen_resizing = [], False
+
+        class Probe(HashTable):
+            __slots__ = []
+
+            def _rehash(self, capacity):
+                rehashes.append(capacity)
+                super()._rehash(capacity)
+
+        table, reference = Probe(incremental=True), HashTable()
+        for i, key in enumerate(keys):
+            table[key] = i
+            reference[key] = i
+            seen_resizing = seen_resizing or table.resizing is not None
+        self.assertEqual([], rehashes)  # 1a
+        self.assertTrue(seen_resizing)  # 1b
+        self.assertEqual(reference.capacity, table.capacity)  # 1c
+
+        # (2) Lookups, updates and deletes see keys on both sides of the migration
+        for i in range(2000):
+            key = rng.choice(keys)
+            operation = rng.random()
+            if operation < 0.3:
+                table[key] = reference[key] = rng.random()
+            elif operation < 0.5 and key in reference:
+                del table[key]
+                del reference[key]
+            else:
+                table[f"new{i}"] = reference[f"new{i}"] = i
+            self.assertEqual(key in reference, key in table)
+        self.assertEqual(len(reference), len(table))  # 2a
+        self.assertEqual(list(reference.items()), list(table.items()))  # 2b
+
+        # (3) Scans finish the migration first
+        table["last"] = 1
+        table.probe_stats()
+        self.assertIsNone(table.resizing)  # 3a
+        table.clear()
+        self.assertEqual(0, len(table))  # 3b
+
+    def test_shrink(self):
+        # (1) A mass delete shrinks the table, but never below its starting capacity
+        table = HashTable(capacity=16, tombstone_ratio=0.49)
+        keys = [f"key{i}" for i in range(1000)]
+        for i, key in enumerate(keys):
+            table[key] = i
+        self.assertEqual(2048, table.capacity)  # 1a
+        for key in keys[10:]:
+            del table[key]
+        self.assertEqual(10, len(table))  # 1b
+        self.assertEqual(128, table.capacity)  # 1c
+        self.assertEqual(list(range(10)), list(table.values()))  # 1d
+        for key in keys[:10]:
+            del table[key]
+        self.assertEqual(16, table.capacity)  # 1e
+
+        # (2) Hysteresis: churn around either threshold never resizes back and forth
+        table = HashTable(capacity=16)
+        for i, key in enumerate(keys[:128]):
+            table[key] = i
+        self.assertEqual(512, table.capacity)  # 2a
+        capacities = set()
+        for _ in range(50):
+            del table[keys[127]]
+            table[keys[127]] = 127
+            capacities.add(table.capacity)
+        self.assertEqual({512}, capacities)  # 2b
+        for key in keys[31:]:
+            table.pop(key, None)
+        self.assertEqual(128, table.capacity)  # 2c
+        capacities = set()
+        for _ in range(50):
+            table[keys[31]] = 31
+            del table[keys[31]]
+            del table[keys[30]]
+            table[keys[30]] = 30
+            capacities.add(table.capacity)
+        self.assertEqual({128}, capacities)  # 2d
+
+        # (3) shrink_ratio=0 keeps the capacity, clear reallocates at the starting capacity
+        table = HashTable(shrink_ratio=0)
+        for i, key in enumerate(keys):
+            table[key] = i
+        for key in keys[1:]:
+            del table[key]
+        self.assertEqual(2048, table.capacity)  # 3a
+        table.clear()
+        self.assertEqual(8, table.capacity)  # 3b
+        self.assertEqual([HashTable.FREE] * 8, table.indices)  # 3c
+        table["again"] = 1
+        self.assertEqual(1, table["again"])  # 3d
+        # 3e, the tombstone_ratio rehash still shrinks a table with shrink_ratio=0
+        table = HashTable(shrink_ratio=0, compact_ratio=1.0, tombstone_ratio=0.1)
+        for i, key in enumerate(keys):
+            table[key] = i
+        for key in keys[1:]:
+            del table[key]
+        self.assertEqual(8, table.capacity)
+
+    def test_window_popitem(self):
+        for table_type in (HashTable, ColumnarHashTable, RobinHoodHashTable):
+            table = table_type()
+            for i in range(20):
+                table[f"key{i}"] = i
+            for i in range(0, 20, 3):
+                del table[f"key{i}"]
+            live = [i for i in range(20) if i % 3]
+
+            # (1) Windows count live entries only, in either direction
+            self.assertIsInstance(table.items(start=2, stop=5), types.GeneratorType)  # 1a
+            self.assertEqual(live[2:5], list(table.values(start=2, stop=5)))  # 1b
+            self.assertEqual([f"key{i}" for i in live[4:]], list(table.keys(start=4)))  # 1c
+            self.assertEqual([(f"key{i}", i) for i in live[::-1][:3]],
+                             list(table.items(reverse=True, stop=3)))  # 1d
+            self.assertEqual([], list(table.values(start=50, stop=60)))  # 1e
+            self.assertEqual(20, len(table.entries) if table_type is not ColumnarHashTable
+                             else len(table.entry_keys))  # 1f, windows never compact the table
+            with self.assertRaises(ValueError):
+                list(table.keys(start=-1))  # 1g
+
+            # (2) popitem pops from either end, skipping deleted entries
+            del table["key19"]
+            del table["key1"]
+            self.assertEqual(("key17", 17), table.popitem())  # 2a
+            self.assertEqual(("key2", 2), table.popitem(last=False))  # 2b
+            self.assertEqual(("key4", 4), table.popitem(last=False))  # 2c
+            self.assertEqual([5, 7, 8, 10, 11, 13, 14, 16], list(table.values()))  # 2d
+            self.assertEqual([16, 14], list(table.values(reverse=True, stop=2)))  # 2e
+            while len(table):
+                table.popitem(last=len(table) % 2 == 0)
+            with self.assertRaises(KeyError):
+                table.popitem()  # 2f
+            table["again"] = 1
+            self.assertEqual([("again", 1)], list(table.items()))  # 2g
+
+            # (3) Windows over many blocks stay right through deletes, inserts and pops
+            rng = random.Random(15)
+            table = table_type(compact_ratio=0.99)
+            order = []
+            for i in range(3000):
+                table[f"key{i}"] = i
+                order.append(i)
+            for step in range(6):
+                for i in rng.sample(order, 200):
+                    del table[f"key{i}"]
+                    order.remove(i)
+                if step % 2:
+                    table.popitem()
+                    order.pop()
+                for i in range(3000 + 100 * step, 3100 + 100 * step):
+                    table[f"key{i}"] = i
+                    order.append(i)
+                for start, stop in ((0, 10), (500, 900), (len(order) - 5, None), (1234, 1235)):
+                    self.assertEqual(order[start:stop], list(table.values(start=start, stop=stop)))  # 3a
+                    self.assertEqual(order[::-1][start:stop],
+                                     list(table.values(reverse=True, start=start, stop=stop)))  # 3b
+
+    def test_hash_functions(self):
+        keys = [f"user{i},{i * 7919}" for i in range(300)]
+        functions = [PolynomialHash(), BuiltinHash(), FNV1aHash(), SeededHash(b"secret")]
+        if solution.xxhash is not None:
+            functions.append(XXHash())
+        # (1) Every hash function and table layout stores and finds the same keys
+        for function in functions:
+            for table_type in (HashTable, ColumnarHashTable, RobinHoodHashTable):
+                table = table_type(hash_function=function)
+                for i, key in enumerate(keys):
+                    table[key] = i
+                for key in keys[::2]:
+                    del table[key]
+                self.assertEqual(list(range(1, 300, 2)), [table[key] for key in keys[1::2]])  # 1a
+                self.assertNotIn(keys[0], table)  # 1b
+
+        # (2) Known values, bytes keys and seeds
+        self.assertEqual(0xaf63dc4c8601ec8c, FNV1aHash()("a"))  # 2a
+        self.assertEqual(FNV1aHash()("ключ"), FNV1aHash()("ключ".encode()))  # 2b
+        self.assertEqual(HashTable._base_hash("key"), PolynomialHash()(b"key"))  # 2c
+        self.assertEqual(SeededHash(b"a")("key"), SeededHash(b"a")(b"key"))  # 2d
+        self.assertNotEqual(SeededHash(b"a")("key"), SeededHash(b"b")("key"))  # 2e
+        self.assertNotEqual(SeededHash().seed, SeededHash().seed)  # 2f
+        table = HashTable(hash_function=FNV1aHash())
+        table[b"raw"] = 1
+        self.assertEqual(1, table[b"raw"])  # 2g
+        if solution.xxhash is None:
+            with self.assertRaises(ImportError):
+                XXHash()  # 2h
+
+        # (3) Snapshots record the hash function and seed, but not the salted built-in hash
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.snap")
+            table = HashTable(hash_function=SeededHash(b"\0seed\0"))
+            for i, key in enumerate(keys):
+                table[key] = i
+            table.save(path)
+            loaded = HashTable.load(path, mmap=False)
+            self.assertIsInstance(loaded.hash_function, SeededHash)  # 3a
+            self.assertEqual(b"\0seed\0", loaded.hash_function.seed)  # 3b
+            self.assertEqual(list(range(300)), [loaded[key] for key in keys])  # 3c
+            with self.assertRaises(ValueError):
+                HashTable(hash_function=BuiltinHash()).save(path)  # 3d
+
+            # (4) Bytes keys survive a snapshot as bytes, next to str keys
+            table = HashTable(hash_function=FNV1aHash())
+            table[b"raw\xff"] = 1
+            table["raw"] = 2
+            table.save(path)
+            for mmap in (False, True):
+                loaded = HashTable.load(path, mmap=mmap)
+                self.assertEqual([b"raw\xff", "raw"], list(loaded.keys()))  # 4a
+                self.assertEqual([1, 2], [loaded[b"raw\xff"], loaded["raw"]])  # 4b
+                del loaded
+
+    def test_bounded(self):
+        # (1) LRU evicts the least recently used key, reads count as uses
+        table = BoundedHashTable(3)
+        for key in "abc":
+            table[key] = key.upper()
+        self.assertEqual("A", table["a"])  # 1a
+        table["d"] = "D"
+        self.assertEqual(["c", "a", "d"], list(table.keys()))  # 1b
+        self.assertNotIn("b", table)  # 1c
+        table["c"] = "C2"
+        table["e"] = "E"
+        self.assertEqual([("d", "D"), ("c", "C2"), ("e", "E")], list(table.items()))  # 1d
+        self.assertEqual((1, 0, 2), (table.hits, table.misses, table.evictions))  # 1e, "in" is not counted
+        self.assertIsNone(table.get("a"))  # 1f
+        self.assertEqual(1, table.misses)  # 1g
+
+        # (2) LFU evicts the least frequently used key, the least recent one on ties
+        table = BoundedHashTable(3, policy="lfu")
+        for key in "abc":
+            table[key] = 0
+        for key in "aab":
+            table[key]
+        table["d"] = 0
+        self.assertEqual(["a", "b", "d"], list(table.keys()))  # 2a
+        table["d"]
+        table["e"] = 0
+        self.assertEqual(["a", "d", "e"], list(table.keys()))  # 2b
+        for i in range(200):
+            table[f"churn{i}"] = i
+            table[f"churn{i}"]
+        self.assertEqual(["a", "churn198", "churn199"], list(table.keys()))  # 2c
+        self.assertLessEqual(len(table.heap), 2 * len(table) + 32)  # 2d
+
+        # (3) Entries expire ttl seconds after their last write
+        now = [0.0]
+        table = BoundedHashTable(3, policy="ttl", ttl=10, clock=lambda: now[0])
+        table["a"] = 1
+        now[0] = 5
+        table["b"] = 2
+        table["a"]
+        now[0] = 6
+        table["c"] = 3
+        table["d"] = 4
+        self.assertEqual(["b", "c", "d"], list(table.keys()))  # 3a, ttl evicts by write order
+        now[0] = 15
+        self.assertNotIn("b", table)  # 3b
+        self.assertEqual(3, table["c"])  # 3c
+        table["c"] = 30
+        now[0] = 20
+        self.assertEqual(1, table.expire())  # 3d
+        self.assertEqual([("c", 30)], list(table.items()))  # 3e
+        self.assertEqual(2, table.expirations)  # 3f
+
+        # (4) Evictions go through the tombstone and compaction machinery
+        table = BoundedHashTable(64)
+        for i in range(10000):
+            table[f"key{i}"] = i
+            table.get(f"key{i - 32}")
+        self.assertEqual(64, len(table))  # 4a
+        self.assertLess(len(table.entries), 4 * 64 + 1)  # 4b
+        self.assertLessEqual(table.tombstones, table.capacity * table.tombstone_ratio)  # 4c
+        self.assertLessEqual(set(range(9968, 10000)), set(table.values()))  # 4d
+        with self.assertRaises(ValueError):
+            BoundedHashTable(3, policy="ttl")  # 4e
+
+        # (5) A batch larger than maxsize only reserves room for maxsize entries
+        capacities = []
+
+        class Probe(BoundedHashTable):
+            __slots__ = []
+
+            def _rehash(self, capacity):
+                capacities.append(capacity)
+                super()._rehash(capacity)
+
+        table = Probe(10)
+        table.update([(f"key{i}", i) for i in range(20000)])
+        self.assertEqual(list(range(19990, 20000)), list(table.values()))  # 5a
+        self.assertLessEqual(max(capacities), 32)  # 5b
+
     def test_application_post(self):
         app = DiscordDestroyer()
         # Small example from specs
@@ -693,21 +1474,22 @@ class TestHashTable(unittest.TestCase):
         # create 4  posts, alternating users
         ids = [app.post(users[i % 2], posts[i]) for i in range(4)]
 
-        # (1) Check that all posts are added to posts_by_id
+        # (1) Check that all posts are added to posts_by_id, keyed by integer id
         for id, true_post in zip(ids, posts):
+            post_id = int(id.rpartition(",")[2])
             # ensure id is in posts_by_id
-            self.assertIn(id, app.posts_by_id)  # 1a
+            self.assertIn(post_id, app.posts_by_id)  # 1a
             # ensure post matches
-            post = app.posts_by_id[id]
+            post = app.posts_by_id[post_id]
             self.assertEqual(true_post, post)  # 1b
 
         # (2) Check that all ids are added to self.ids_by_user
         for id in ids:
-            user, post_id = id.split(",")
+            user, _, post_id = id.rpartition(",")
             # ensure user is in ids_by_user
             self.assertIn(user, app.ids_by_user)  # 2a
             # ensure id is in ids_by_user[user]
-            self.assertIn(post_id, app.ids_by_user[user])  # 2b
+            self.assertIn(int(post_id), app.ids_by_user[user])  # 2b
 
         app = DiscordDestroyer()
         # Longer example with 2 users still
@@ -721,21 +1503,22 @@ class TestHashTable(unittest.TestCase):
         # create 19 posts, alternating users
         ids = [app.post(users[i % 2], posts[i]) for i in range(19)]
 
-        # (1) Check that all posts are added to posts_by_id
+        # (1) Check that all posts are added to posts_by_id, keyed by integer id
         for id, true_post in zip(ids, posts):
+            post_id = int(id.rpartition(",")[2])
             # ensure id is in posts_by_id
-            self.assertIn(id, app.posts_by_id)  # 1a
+            self.assertIn(post_id, app.posts_by_id)  # 1a
             # ensure post matches
-            post = app.posts_by_id[id]
+            post = app.posts_by_id[post_id]
             self.assertEqual(true_post, post)  # 1b
 
         # (2) Check that all ids are added to self.ids_by_user
         for id in ids:
-            user, post_id = id.split(",")
+            user, _, post_id = id.rpartition(",")
             # ensure user is in ids_by_user
             self.assertIn(user, app.ids_by_user)  # 2a
             # ensure id is in ids_by_user[user]
-            self.assertIn(post_id, app.ids_by_user[user])  # 2b
+            self.assertIn(int(post_id), app.ids_by_user[user])  # 2b
 
     def test_application_delete(self):
 
@@ -763,9 +1546,9 @@ class TestHashTable(unittest.TestCase):
 
         # (2) Check that all ids are removed from self.ids_by_user
         for id in ids:
-            user, post_id = id.split(",")
+            user, _, post_id = id.rpartition(",")
             # ensure id is not in ids_by_user[user]
-            self.assertNotIn(post_id, app.ids_by_user[user])  # 2a
+            self.assertNotIn(int(post_id), app.ids_by_user[user])  # 2a
 
     def test_application_recent_posts(self):
         app = DiscordDestroyer()
@@ -789,6 +1572,27 @@ class TestHashTable(unittest.TestCase):
                 true_user, true_post = current_posts[j]
                 self.assertEqual((true_user, true_post), user_post_from_generator)  # 1a
 
+    def test_application_recent_posts_deleted(self):
+        app = DiscordDestroyer()
+        users = ["Aaron", "Andrew", "Comma, User"]
+        ids = [app.post(users[i % 3], f"post {i}") for i in range(30)]
+        for i in (29, 27, 20, 21, 22, 0):
+            app.delete_post(ids[i])
+        live = [i for i in range(29, -1, -1) if i not in (29, 27, 20, 21, 22, 0)]
+
+        # (1) Exactly v live posts come back, newest first, users intact
+        expected = [(users[i % 3], f"post {i}") for i in live]
+        for v in (0, 1, 2, 5, 24):
+            self.assertEqual(expected[:v], list(app.get_most_recent_posts(v)))  # 1a
+        self.assertEqual(expected, list(app.get_most_recent_posts(100)))  # 1b
+
+        # (2) Deleting every post empties the list, and new posts start it again
+        for i in live:
+            app.delete_post(ids[i])
+        self.assertEqual([], list(app.get_most_recent_posts(3)))  # 2a
+        app.post("Aaron", "again")
+        self.assertEqual([("Aaron", "again")], list(app.get_most_recent_posts(3)))  # 2b
+
     def test_application_by_user(self):
         app = DiscordDestroyer()
         # consider posts from two users
@@ -810,6 +1614,453 @@ class TestHashTable(unittest.TestCase):
         self.assertEqual(andrew_posts, list(app.get_posts_by_user("Andrew")))  # 1b
         self.assertEqual([], list(app.get_posts_by_user("Onsay")))  # 1c
 
+    def test_application_log(self):
+        users = ["Aaron", "Andrew", "Comma, User"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "posts.log")
+
+            # (1) Posts and deletes survive a restart
+            app = DiscordDestroyer(path, group_commit=4)
+            ids = [app.post(users[i % 3], f"post {i}") for i in range(10)]
+            self.assertTrue(app.delete_post(ids[3]))
+            self.assertTrue(app.delete_post(ids[5]))
+            with open(path) as log:
+                self.assertEqual(12, len(log.readlines()))  # 1a, records are written in groups of 4
+            app.close()
+            app = DiscordDestroyer(path)
+            live = [i for i in range(10) if i not in (3, 5)]
+            self.assertEqual([i + 1 for i in live], list(app.posts_by_id.keys()))  # 1b
+            self.assertEqual([3, 9], list(app.ids_by_user["Comma, User"].keys()))  # 1c
+            self.assertEqual(10, app.post_id_seed)  # 1d
+            self.assertFalse(app.delete_post(ids[3]))  # 1e
+
+            # (2) A checkpoint empties the log, and replay starts from its snapshot
+            app.checkpoint()
+            self.assertEqual(0, os.path.getsize(path))  # 2a
+            new_id = app.post("Aaron", "after checkpoint")
+            app.delete_post(ids[0])
+            app.close()
+            app = DiscordDestroyer(path)
+            self.assertEqual([i + 1 for i in live[1:]] + [11], list(app.posts_by_id.keys()))  # 2b
+            self.assertEqual("Aaron,11", new_id)  # 2c
+            app.close()
+
+            # (3) A torn last record is cut off, and the log keeps working
+            with open(path, "a") as log:
+                log.write('{"op":"post","user":"Aaron","id":"1"')
+            app = DiscordDestroyer(path, group_commit=1)
+            self.assertEqual(len(live), len(app.posts_by_id))  # 3a
+            last_id = app.post("Andrew", "after crash")
+            app.close()
+            app = DiscordDestroyer(path)
+            self.assertEqual("after crash", app.posts_by_id[int(last_id.rpartition(",")[2])])  # 3b
+            app.close()
+
+            # (4) Checkpoints happen on their own every checkpoint_every records
+            app = DiscordDestroyer(path, group_commit=1, checkpoint_every=5)
+            self.assertEqual(3, app.logged)  # 4a, replayed records count too
+            app.checkpoint()
+            for i in range(7):
+                app.post("Aaron", f"auto {i}")
+            self.assertEqual(2, app.logged)  # 4b
+            with open(path) as log:
+                self.assertEqual(2, len(log.readlines()))  # 4c
+            app.close()
+            app = DiscordDestroyer(path)
+            self.assertEqual(len(live) + 8, len(app.posts_by_id))  # 4d
+            app.close()
+
+            # (5) A quiet instance writes an unfinished group after flush_delay, or on flush() without one
+            app = DiscordDestroyer(path, flush_delay=0.01)
+            app.checkpoint()
+            app.post("Aaron", "quiet")
+            deadline = time.monotonic() + 5
+            while os.path.getsize(path) == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            with open(path) as log:
+                self.assertEqual(1, len(log.readlines()))  # 5a
+            self.assertEqual([], app.pending)  # 5b
+            app.close()
+            app = DiscordDestroyer(path, flush_delay=None)
+            app.checkpoint()
+            app.post("Aaron", "waits")
+            time.sleep(0.05)
+            self.assertEqual(0, os.path.getsize(path))  # 5c
+            app.flush()
+            self.assertNotEqual(0, os.path.getsize(path))  # 5d
+            app.close()
+
+    def test_application_by_user_pages(self):
+        app = DiscordDestroyer()
+        ids = [app.post("Aaron" if i % 4 else "Andrew", f"post {i}") for i in range(200)]
+        aaron = [i for i in range(200) if i % 4]
+
+        # (1) Pages follow each other through the cursor
+        pages, cursor = [], None
+        while True:
+            page = list(app.get_posts_by_user("Aaron", after=cursor, limit=32))
+            if not page:
+                break
+            pages.append(page)
+            cursor = page[-1].post_id
+        self.assertEqual([32] * 4 + [22], [len(page) for page in pages])  # 1a
+        self.assertEqual([("Aaron", f"post {i}") for i in aaron], sum(pages, []))  # 1b
+        self.assertEqual(ids[aaron[31]], pages[0][-1].post_id)  # 1c
+
+        # (2) Deleted posts are skipped, and a page may start after any post id
+        for i in aaron[10:20]:
+            app.delete_post(ids[i])
+        page = list(app.get_posts_by_user("Aaron", after=ids[aaron[5]], limit=6))
+        self.assertEqual([f"post {i}" for i in aaron[6:10] + aaron[20:22]],
+                         [message for _, message in page])  # 2a
+        self.assertEqual([], list(app.get_posts_by_user("Aaron", after=ids[aaron[-1]])))  # 2b
+        self.assertEqual([], list(app.get_posts_by_user("Aaron", limit=0)))  # 2c
+
+        # (3) The cursor is an id bound, so the post it names may have been deleted since
+        page = list(app.get_posts_by_user("Aaron", after=ids[aaron[12]], limit=2))
+        self.assertEqual([f"post {i}" for i in aaron[20:22]], [message for _, message in page])  # 3a
+        app.delete_post(ids[aaron[21]])
+        page = list(app.get_posts_by_user("Aaron", after=page[-1].post_id, limit=2))
+        self.assertEqual([f"post {i}" for i in aaron[22:24]], [message for _, message in page])  # 3b
+        for i in aaron[22:]:
+            app.delete_post(ids[i])
+        self.assertEqual([], list(app.get_posts_by_user("Aaron", after=ids[aaron[30]])))  # 3c
+        self.assertEqual([f"post {i}" for i in aaron[:2]],
+                         [message for _, message in app.get_posts_by_user("Aaron", after="Aaron,0", limit=2)])  # 3d
+
+        # (4) Cursors of other users or that are not ids are rejected as soon as the call is made
+        for cursor in [ids[0], "Aaron", "Aaron,x", "Aaron,²"]:
+            with self.assertRaises(KeyError):
+                app.get_posts_by_user("Aaron", after=cursor)  # 4a
+        self.assertIsInstance(app.get_posts_by_user("Nobody"), types.GeneratorType)  # 4b
+        self.assertEqual([], list(app.get_posts_by_user("Nobody")))  # 4c
+
+    def test_application_ids(self):
+        app = DiscordDestroyer()
+        # (1) Post ids count up, and the "user,id" form only exists at the API boundary
+        ids = [app.post(user, "hello") for user in ["Aaron", "Andrew", "Aaron", "Comma, User"]]
+        self.assertEqual(["Aaron,1", "Andrew,2", "Aaron,3", "Comma, User,4"], ids)  # 1a
+        self.assertEqual([1, 2, 3, 4], list(app.posts_by_id.keys()))  # 1b
+        self.assertIsInstance(app.posts_by_id.hash_function, BuiltinHash)  # 1c
+
+        # (2) Each username is stored once and shared by every post record
+        user = "".join(["Aa", "ron"])
+        app.post(user, "interned")
+        records = list(app.ids_by_user["Aaron"].values())
+        self.assertTrue(all(record.user is records[0].user for record in records))  # 2a
+        self.assertIs(next(iter(app.ids_by_user.keys())), records[-1].user)  # 2b
+
+        # (3) Malformed or mismatched ids are simply not found
+        for bad in ["Aaron", "Aaron,", "Aaron,x", "Andrew,1", "Nobody,1", "Aaron,-1", "Aaron,²", "Aaron,١"]:
+            self.assertFalse(app.delete_post(bad))  # 3a
+        self.assertTrue(app.delete_post("Andrew,2"))  # 3b
+        self.assertEqual([1, 3, 4, 5], list(app.posts_by_id.keys()))  # 3c
+
+    def test_application_post_many(self):
+        users = ["Aaron", "Andrew", "Comma, User"]
+        batch = [(users[i * i % 3], f"post {i}") for i in range(50)]
+
+        # (1) A batch leaves the same state as posting one at a time
+        app, expected = DiscordDestroyer(), DiscordDestroyer()
+        app.post("Andrew", "before")
+        expected.post("Andrew", "before")
+        ids = app.post_many(batch)
+        self.assertEqual([expected.post(user, message) for user, message in batch], ids)  # 1a
+        self.assertEqual(list(expected.posts_by_id.items()), list(app.posts_by_id.items()))  # 1b
+        self.assertEqual(list(expected.get_most_recent_posts(60)), list(app.get_most_recent_posts(60)))  # 1c
+        for user in users:
+            self.assertEqual(list(expected.get_posts_by_user(user)), list(app.get_posts_by_user(user)))  # 1d
+        self.assertEqual("Andrew,52", app.post("Andrew", "after"))  # 1e
+        self.assertEqual([], app.post_many([]))  # 1f
+
+        # (2) Each user's table is sized once, and records share the interned username
+        app = DiscordDestroyer()
+        app.post_many([("Aaron", f"post {i}") for i in range(100)])
+        self.assertEqual(256, app.ids_by_user["Aaron"].capacity)  # 2a
+        records = list(app.ids_by_user["Aaron"].values())
+        self.assertTrue(all(record.user is records[0].user for record in records))  # 2b
+
+        # (3) A batch is one log record that replays in full, and posts can be deleted by id
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "posts.log")
+            app = DiscordDestroyer(path, group_commit=1)
+            ids = app.post_many(batch)
+            self.assertTrue(app.delete_post(ids[7]))
+            app.close()
+            with open(path) as log:
+                self.assertEqual(2, len(log.readlines()))  # 3a
+            app = DiscordDestroyer(path)
+            self.assertEqual(51, app.logged)  # 3b, a batch counts once per post
+            self.assertEqual(list(range(1, 51))[:7] + list(range(9, 51)), list(app.posts_by_id.keys()))  # 3c
+            self.assertEqual(batch[-1], next(app.get_most_recent_posts(1)))  # 3d
+            self.assertEqual(50, app.post_id_seed)  # 3e
+            app.close()
+
+        # (4) A batch with a bad post raises without storing any of its posts
+        app = DiscordDestroyer()
+        app.post("a", "before")
+        for bad in [("b", "y", "z"), (["b"], "y"), ("b", None), "by"]:
+            with self.assertRaises(TypeError):
+                app.post_many([("a", "x"), bad])  # 4a
+            self.assertEqual(1, app.post_id_seed)  # 4b
+            self.assertEqual([1], list(app.posts_by_id.keys()))  # 4c
+            self.assertEqual([("a", "before")], list(app.get_most_recent_posts(5)))  # 4d
+        with self.assertRaises(TypeError):
+            app.post_many([("new", "x"), ("", "empty users cannot be hashed")])  # 4e
+        self.assertEqual(["a"], list(app.ids_by_user.keys()))  # 4f, no table was left for "new"
+        self.assertEqual(["a,2"], app.post_many([("a", "x")]))  # 4g
+        self.assertTrue(app.delete_post("a,2"))  # 4h
+
+    def test_application_search(self):
+        # (1) Posting lists round-trip through varint gaps and blocks, both ways
+        ids = [1, 2, 130, 131, 20000, 20001, 1 << 40] + [(1 << 40) + 3 * i for i in range(1, 300)]
+        postings = PostingList(ids)
+        self.assertEqual(ids, list(postings))  # 1a
+        self.assertEqual(ids[::-1], list(postings.newest_first()))  # 1b
+        self.assertEqual([128, 128, 50], postings.sizes)  # 1c
+        self.assertEqual(1 + 2 + 1 + 3 + 1 + 6 + 121, len(postings.blocks[0]))  # 1d, 127 gaps of 1 to 6 bytes
+
+        # (2) AND and OR queries, newest first, case-insensitive and on whole words
+        app = DiscordDestroyer(index=True)
+        messages = ["Hello world", "hello there", "WORLD peace", "hello, world!", "worldly hello"]
+        ids = [app.post("Aaron" if i % 2 else "Andrew", message) for i, message in enumerate(messages)]
+        self.assertEqual([("Andrew", "worldly hello"), ("Aaron", "hello, world!"), ("Aaron", "hello there"),
+                          ("Andrew", "Hello world")], list(app.search("hello")))  # 2a
+        self.assertEqual([messages[3], messages[0]], [m for _, m in app.search("world HELLO")])  # 2b
+        self.assertEqual([messages[4], messages[3], messages[2], messages[1], messages[0]],
+                         [m for _, m in app.search("world hello", mode="or")])  # 2c
+        self.assertEqual([messages[4], messages[3]], [m for _, m in app.search("hello", limit=2)])  # 2d
+        self.assertEqual(ids[4], next(app.search("peace hello", mode="or")).post_id)  # 2e
+        self.assertEqual([], list(app.search("hello nobody")))  # 2f
+        self.assertEqual([], list(app.search("!!!")))  # 2g
+        adjacent = DiscordDestroyer(index=True)
+        adjacent.post("Aaron", "world")
+        adjacent.post("Andrew", "hello")
+        self.assertEqual([], list(adjacent.search("hello world")))  # 2h, id 2 follows the last "world" id
+
+        # (3) Deleted posts are never found, and posting lists shed them
+        self.assertTrue(app.delete_post(ids[3]))
+        self.assertEqual([messages[0]], [m for _, m in app.search("world hello")])  # 3a
+        self.assertTrue(app.delete_post(ids[2]))
+        self.assertEqual([1], list(app.index.tokens["world"]))  # 3b, rebuilt once most ids were dead
+        self.assertTrue(app.delete_post(ids[0]))
+        self.assertNotIn("world", app.index.tokens)  # 3c
+        self.assertEqual([messages[4], messages[1]], [m for _, m in app.search("hello")])  # 3d
+
+        # (4) post_many and log replay keep the index too
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "posts.log")
+            app = DiscordDestroyer(path, index=True)
+            app.post("Aaron", "first words")
+            batch = app.post_many([("Andrew", f"batch words {i}") for i in range(300)])
+            app.delete_post(batch[0])
+            self.assertEqual(300, len(list(app.search("words"))))  # 4a
+            app.close()
+            app = DiscordDestroyer(path, index=True)
+            self.assertEqual([("Andrew", "batch words 299"), ("Andrew", "batch words 298")],
+                             list(app.search("words batch", limit=2)))  # 4b
+            self.assertEqual([("Aaron", "first words")], list(app.search("first")))  # 4c
+            app.close()
+
+        # (5) Bad queries
+        with self.assertRaises(ValueError):
+            DiscordDestroyer().search("hello")  # 5a
+        with self.assertRaises(ValueError):
+            app.search("hello", mode="xor")  # 5b
+
+        # (6) Ids out of order are refused, and replay never appends them
+        with self.assertRaises(ValueError):
+            PostingList([1, 5, 5])  # 6a
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "posts.log")
+            app = DiscordDestroyer(path, group_commit=1, index=True)
+            ids = [app.post("Aaron", f"words {i}") for i in range(3)]
+            app.delete_post(ids[1])
+            app.flush()
+            with open(path) as log:
+                records = log.read()
+            app.checkpoint()
+            app.close()
+            with open(path, "w") as log:
+                log.write(records)  # the log as if a crash kept it from being emptied
+            app = DiscordDestroyer(path, index=True)
+            self.assertEqual([1, 3], list(app.posts_by_id.keys()))  # 6b
+            self.assertEqual([("Aaron", "words 2"), ("Aaron", "words 0")], list(app.search("words")))  # 6c
+            self.assertEqual("Aaron,4", app.post("Aaron", "words 3"))  # 6d
+            app.close()
+
+    def test_hash_ring(self):
+        users = [f"user{i}" for i in range(4000)]
+
+        # (1) Keys spread across every node, close to evenly
+        ring = HashRing(range(4))
+        self.assertEqual(256, len(ring))  # 1a
+        counts = [0] * 4
+        for user in users:
+            counts[ring[user]] += 1
+        self.assertTrue(all(700 < count < 1300 for count in counts))  # 1b
+
+        # (2) Adding a node only moves keys to it, about 1 / n of them
+        before = [ring[user] for user in users]
+        ring.add(4)
+        moved = [(old, ring[user]) for old, user in zip(before, users) if ring[user] != old]
+        self.assertTrue(all(new == 4 for _, new in moved))  # 2a
+        self.assertTrue(500 < len(moved) < 1100)  # 2b
+
+        # (3) Removing it moves exactly those keys back, and an empty ring owns nothing
+        ring.remove(4)
+        self.assertEqual(before, [ring[user] for user in users])  # 3a
+        with self.assertRaises(KeyError):
+            HashRing([])["user0"]  # 3b
+
+    def test_application_sharded(self):
+        users = [f"user{i}" for i in range(12)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "posts.log")
+
+            # (1) Posts are routed by user, and ids count up across shards
+            app, expected = ShardedDiscordDestroyer(3, path), DiscordDestroyer()
+            try:
+                self.assertEqual(3, len({app.ring[user] for user in users}))  # 1a
+                ids = [app.post(users[i % 12], f"post {i}") for i in range(60)]
+                self.assertEqual([expected.post(users[i % 12], f"post {i}") for i in range(60)], ids)  # 1b
+                for user in users:
+                    self.assertEqual(list(expected.get_posts_by_user(user)), app.get_posts_by_user(user))  # 1c
+
+                # (2) Recent posts merge every shard, and deletes reach the right shard
+                for i in (59, 57, 40, 3):
+                    self.assertTrue(app.delete_post(ids[i]))  # 2a
+                    expected.delete_post(ids[i])
+                self.assertFalse(app.delete_post(ids[59]))  # 2b
+                self.assertFalse(app.delete_post("nobody,1"))  # 2c
+                self.assertEqual(list(expected.get_most_recent_posts(20)), app.get_most_recent_posts(20))  # 2d
+                self.assertEqual(56, len(app.get_most_recent_posts(100)))  # 2e
+
+                # (3) Pages and errors come back from the shard
+                page = app.get_posts_by_user("user1", limit=2)
+                self.assertEqual(ids[13], page[-1].post_id)  # 3a
+                self.assertEqual([("user1", "post 25")], app.get_posts_by_user("user1", after=page[-1].post_id,
+                                                                               limit=1))  # 3b
+                with self.assertRaises(KeyError):
+                    app.get_posts_by_user("user3", after=ids[4])  # 3c
+            finally:
+                app.close()
+
+            # (4) Each shard replays its own log, and ids carry on after the newest post
+            with ShardedDiscordDestroyer(3, path) as app:
+                self.assertEqual(list(expected.get_most_recent_posts(100)), app.get_most_recent_posts(100))  # 4a
+                self.assertEqual("user0,61", app.post("user0", "after restart"))  # 4b
+            self.assertEqual([], app.processes)  # 4c, leaving the with block closed the shards
+
+        # (5) Search asks every shard and merges on recency
+        expected = DiscordDestroyer(index=True)
+        with ShardedDiscordDestroyer(3, index=True) as app:
+            for i in range(60):
+                message = f"{'even' if i % 2 else 'odd'} post {i}"
+                app.post(users[i % 12], message)
+                expected.post(users[i % 12], message)
+            for query, mode, limit in [("post", "and", None), ("even post", "and", 7), ("odd even", "or", 11)]:
+                found = app.search(query, mode, limit)
+                self.assertEqual(list(expected.search(query, mode, limit)), found)  # 5a
+                self.assertEqual([post.post_id for post in expected.search(query, mode, limit)],
+                                 [post.post_id for post in found])  # 5b
+            self.assertEqual([], app.search("post", limit=-1))  # 5c, as DiscordDestroyer finds nothing
+            self.assertEqual([], app.get_most_recent_posts(-1))  # 5d
+        with ShardedDiscordDestroyer(2) as app:
+            with self.assertRaises(ValueError):
+                app.search("post")  # 5e
+            self.assertEqual("user0,1", app.post("user0", "after the error"))  # 5f, no answer was left behind
+            self.assertEqual([("user0", "after the error")], app.get_most_recent_posts(5))  # 5g
+
+    def test_application_server(self):
+        async def client(address, requests):
+            if isinstance(address, str):
+                reader, writer = await asyncio.open_unix_connection(address)
+            else:
+                reader, writer = await asyncio.open_connection(*address)
+            for request in requests:
+                writer.write(request.encode() if isinstance(request, str) else json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            answers = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            return answers
+
+        async def scenario():
+            # (1) Concurrent clients are served in micro-batches, posts through post_many
+            server = DiscordDestroyerServer(batch_interval=0.005)
+            address = await server.start()
+            answers = await asyncio.gather(*[client(address, [
+                {"id": i, "op": "post", "args": [f"user{c}", f"post {i}"]} for i in range(25)]) for c in range(4)])
+            self.assertTrue(all(answer["ok"] for replies in answers for answer in replies))  # 1a
+            self.assertEqual(100, len(server.app.posts_by_id))  # 1b
+            self.assertLess(server.batches, 10)  # 1c
+            for c, replies in enumerate(answers):
+                ids = {answer["id"]: answer["result"] for answer in replies}
+                self.assertEqual(list(server.app.ids_by_user[f"user{c}"].keys()),
+                                 [int(ids[i].rpartition(",")[2]) for i in range(25)])  # 1d, in arrival order
+
+            # (2) A batch applies requests in order, so reads see the writes before them
+            answers = await client(address, [{"id": "a", "op": "post", "args": ["Aaron", "hello"]},
+                                             {"id": "b", "op": "get_most_recent_posts", "args": [1]},
+                                             {"id": "c", "op": "get_posts_by_user", "args": ["Aaron", None, 1]}])
+            answers = {answer["id"]: answer for answer in answers}
+            self.assertEqual([["Aaron", "hello"]], answers["b"]["result"])  # 2a
+            self.assertEqual([["Aaron", "hello", answers["a"]["result"]]], answers["c"]["result"])  # 2b
+
+            # (3) Bad requests are answered with errors, and the connection keeps working
+            answers = await client(address, ["not json\n", {"id": 1, "op": "clear"},
+                                             {"id": 2, "op": "post", "args": ["Aaron"]},
+                                             {"id": 3, "op": "get_posts_by_user", "args": ["Aaron", "Andrew,1"]},
+                                             {"id": 4, "op": "delete_post", "args": ["Aaron,999"]}])
+            answers = {answer["id"]: answer for answer in answers}
+            self.assertFalse(answers[None]["ok"])  # 3a
+            self.assertEqual("ValueError: unknown op 'clear'", answers[1]["error"])  # 3b
+            self.assertFalse(answers[2]["ok"])  # 3c
+            self.assertTrue(answers[3]["error"].startswith("KeyError"))  # 3d
+            self.assertEqual({"id": 4, "ok": True, "result": False}, answers[4])  # 3e
+            good, bad = await asyncio.gather(client(address, [{"id": 5, "op": "post", "args": ["good", "hello"]}]),
+                                             client(address, [{"id": 6, "op": "post", "args": [["bad"], "x"]}]))
+            self.assertTrue(good[0]["ok"])  # 3f, a bad post in the same batch fails on its own
+            self.assertFalse(bad[0]["ok"])  # 3g
+            answers = await client(address, [{"id": 7, "op": "post", "args": ["Aaron", "x" * 100000]}])
+            self.assertEqual("Aaron,103", answers[0]["result"])  # 3h, lines over asyncio's 64 KiB default are fine
+            reader, writer = await asyncio.open_connection(*address)
+            writer.write(json.dumps({"id": 8, "op": "post", "args": ["Aaron", "x" * (2 << 20)]}).encode() + b"\n")
+            writer.write(json.dumps({"id": 9, "op": "delete_post", "args": ["Aaron,103"]}).encode() + b"\n")
+            answer = json.loads(await reader.readline())
+            self.assertEqual((None, False), (answer["id"], answer["ok"]))  # 3i, lines over the limit are refused
+            answer = json.loads(await reader.readline())
+            self.assertEqual({"id": 9, "ok": True, "result": True}, answer)  # 3j, and skipped
+            writer.close()
+            await server.close()
+
+            # (4) Should post_many fail, the posts of the batch are retried one at a time
+            class BrokenBatches(DiscordDestroyer):
+                __slots__ = []
+
+                def post_many(self, posts):
+                    raise RuntimeError("batch failed")
+
+            server = DiscordDestroyerServer(BrokenBatches(), batch_interval=0.005)
+            address = await server.start()
+            answers = await client(address, [{"id": i, "op": "post", "args": ["Aaron", f"post {i}"]} for i in range(3)])
+            self.assertEqual(["Aaron,1", "Aaron,2", "Aaron,3"], [answer["result"] for answer in answers])  # 4a
+            self.assertEqual(1, server.batches)  # 4b
+            await server.close()
+
+            # (5) max_batch=1 applies every request on its own, here over a Unix socket
+            if os.name == "posix":
+                with tempfile.TemporaryDirectory() as directory:
+                    server = DiscordDestroyerServer(max_batch=1)
+                    address = await server.start(path=os.path.join(directory, "server.sock"))
+                    answers = await client(address, [{"id": i, "op": "post", "args": ["Aaron", "hi"]}
+                                                     for i in range(5)])
+                    self.assertEqual([f"Aaron,{i + 1}" for i in range(5)], [answer["result"] for answer in answers])  # 5a
+                    self.assertEqual(5, server.batches)  # 5b
+                    await server.close()
+
+        asyncio.run(scenario())
+
     def test_readme_xml_validity(self):
         path = "feedback.xml"
         xml_doc = minidom.parse(path)